@@ -1,55 +1,173 @@
 import asyncio
+import functools
+import hmac
 import logging
 import re
-from typing import Dict, Optional
+import secrets
+from contextlib import closing
+from typing import Dict, Optional, List, Set, Callable, FrozenSet
 
 from container_app_conf.formatter.toml import TomlFormatter
 from requests import HTTPError
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove
+from telegram.error import BadRequest
 from telegram.ext import CommandHandler, filters, MessageHandler, CallbackQueryHandler, \
     ApplicationBuilder, ContextTypes
 from telegram_click.argument import Argument, Flag, Selection
 from telegram_click.decorator import command
 from telegram_click.error_handler import DefaultErrorHandler
 
-from keel_telegram_bot import util
+from keel_telegram_bot.budget import bounded_budget, current_budget, BudgetExceededError
+from keel_telegram_bot.bot.outbox import Outbox, OutboxFlusher, OutboxEntry
 from keel_telegram_bot.bot.permissions import CONFIG_ADMINS, CONFIGURED_CHAT_ID
+from keel_telegram_bot.bot.rate_limiter import RateLimiter
+from keel_telegram_bot.bot.refresh import CoalescingRefresher
 from keel_telegram_bot.bot.reply_keyboard_handler import ReplyKeyboardHandler
+from keel_telegram_bot.bot.update_processor import SerializingUpdateProcessor
 from keel_telegram_bot.client.api_client import KeelApiClient
 from keel_telegram_bot.client.approval import Approval
+from keel_telegram_bot.client.index import SnapshotIndexCache
+from keel_telegram_bot.client.resilience import KeelUnavailableError
 from keel_telegram_bot.client.resource import Resource
-from keel_telegram_bot.client.tracked_image import TrackedImage
-from keel_telegram_bot.client.types import SemverPolicy, Policy, PollSchedule, SemverPolicyType, Trigger
+from keel_telegram_bot.client.types import Policy, PollSchedule, Trigger
+from keel_telegram_bot.cluster.shard import ShardCoordinator
 from keel_telegram_bot.config import Config
 from keel_telegram_bot.stats import *
-from keel_telegram_bot.util import send_message, approval_to_str, resource_to_str, tracked_image_to_str
+from keel_telegram_bot.util import send_message, split_message, approval_to_str, resource_to_str, tracked_image_to_str, \
+    group_approvals_by_state, identifier_without_version, create_identifier_matcher, run_concurrently, \
+    filter_resources, filter_tracked_images, image_repository, RESOURCE_INDEX_KEYS, TRACKED_IMAGE_INDEX_KEYS, \
+    deadline_remaining_bucket, take_and_count
 
 LOGGER = logging.getLogger(__name__)
 
+# approval fields that are reflected in notification messages, apart from the remaining time
+APPROVAL_MESSAGE_FIELDS = ("votesRequired", "votesReceived", "archived", "rejected", "rawDeadline")
+
+
+def command_budget(name: str):
+    """
+    Applies the configured overall latency budget to a command handler of the KeelTelegramBot,
+    which is propagated to all downstream keel and telegram calls as a shrinking timeout.
+    The handler is cancelled once the budget is used up.
+    Needs to be applied below the @command decorator, so errors are handled outside of the budget.
+    :param name: command name
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            async with bounded_budget(name, self._config.TELEGRAM_COMMAND_TIMEOUT.value.total_seconds()):
+                return await func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def selection_budget(name: str, seconds: float, callback: Callable) -> Callable:
+    """
+    Applies a latency budget of its own to the callback of a reply keyboard selection,
+    which runs on a later update, outside of the budget of the command that offered the selection.
+    :param name: command name
+    :param seconds: the total budget in seconds
+    :param callback: the selection callback
+    :return: the wrapped callback
+    """
+
+    @functools.wraps(callback)
+    async def wrapper(*args, **kwargs):
+        if current_budget() is not None:
+            # selected right away (f.ex. a perfect match), within the budget of the command
+            return await callback(*args, **kwargs)
+        async with bounded_budget(name, seconds):
+            return await callback(*args, **kwargs)
+
+    return wrapper
+
 
 class CustomErrorHandler(DefaultErrorHandler):
 
     def __init__(self):
         super().__init__(silent_denial=True, print_error=True)
 
+    async def on_execution_error(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                 exception: Exception) -> bool:
+        if isinstance(exception, BudgetExceededError):
+            COMMAND_BUDGET_EXCEEDED_COUNTER.labels(command=exception.name).inc()
+            message = update.effective_message
+            await send_message(context.bot, message.chat_id,
+                               ":hourglass: The command took too long and was cancelled, please try again later.",
+                               reply_to=message.message_id)
+            return True
+
+        if isinstance(exception, KeelUnavailableError):
+            message = update.effective_message
+            await send_message(context.bot, message.chat_id,
+                               ":warning: Keel is currently unavailable, please try again later.",
+                               reply_to=message.message_id)
+            return True
+
+        return await super().on_execution_error(update, context, exception)
+
 
 class KeelTelegramBot:
     """
     The main entry class of the keel telegram bot
     """
 
-    def __init__(self, config: Config, api_client: KeelApiClient):
+    def __init__(self, config: Config, api_client: KeelApiClient, shard_coordinator: Optional[ShardCoordinator] = None):
         """
         Creates an instance.
         :param config: configuration object
+        :param api_client: keel api client
+        :param shard_coordinator: only sends approval notifications to chats assigned to this replica, if set
         """
         self._config = config
         self._api_client = api_client
+        self._shard_coordinator = shard_coordinator
         self._message_map = {}
+        # approval ids with registered messages, by identifier without version
+        self._tracked_approval_ids = {}
+        # last known state of approvals with registered messages, by approval id
+        self._approvals: Dict[str, Approval] = {}
+        # remaining time until the deadline shown in the messages of an approval, by approval id
+        self._rendered_deadlines: Dict[str, int] = {}
+        # secondary indexes of the most recent resource and tracked image snapshots
+        self._resource_index = SnapshotIndexCache(RESOURCE_INDEX_KEYS)
+        self._tracked_image_index = SnapshotIndexCache(TRACKED_IMAGE_INDEX_KEYS)
 
         self._response_handler = ReplyKeyboardHandler()
-
-        self._app = ApplicationBuilder().token(self._config.TELEGRAM_BOT_TOKEN.value).build()
+        # approval ids whose messages need to be updated after inline keyboard clicks
+        self._message_refresher = CoalescingRefresher(self._refresh_messages, delay=MESSAGE_REFRESH_DELAY)
+
+        # notifications are queued and delivered in the background, so they are neither lost nor block the caller
+        self._outbox = Outbox(self._get_outbox_file())
+        self._rate_limiter = RateLimiter(rate=TELEGRAM_MESSAGES_PER_SECOND, burst=TELEGRAM_MESSAGES_PER_SECOND)
+        self._outbox_flusher = OutboxFlusher(
+            self._outbox, self._deliver_outbox_entry,
+            rate_limiter=self._rate_limiter,
+            batch_size=OUTBOX_BATCH_SIZE,
+            max_attempts=OUTBOX_MAX_ATTEMPTS,
+            retry_backoff=OUTBOX_RETRY_BACKOFF,
+            retry_backoff_max=OUTBOX_RETRY_BACKOFF_MAX,
+            poll_interval=OUTBOX_POLL_INTERVAL,
+        )
+        self._outbox_flusher_task = None
+        if shard_coordinator is not None:
+            shard_coordinator.add_listener(self._on_members_changed)
+
+        self._webhook_secret_token = None
+        builder = ApplicationBuilder().token(self._config.TELEGRAM_BOT_TOKEN.value)
+        # updates of different chats are processed concurrently, the order within a chat is kept
+        builder = builder.concurrent_updates(SerializingUpdateProcessor(
+            max_concurrent_updates=self._config.TELEGRAM_CONCURRENT_UPDATES.value,
+            max_pending_updates=MAX_PENDING_UPDATES,
+        ))
+        if self.webhook_path is not None:
+            # updates are pushed to the webserver, no need for an updater
+            self._webhook_secret_token = self._config.TELEGRAM_WEBHOOK_SECRET_TOKEN.value or secrets.token_urlsafe(32)
+            builder = builder.updater(None)
+        self._app = builder.build()
 
         handler_groups = {
             0: [CallbackQueryHandler(callback=self._inline_keyboard_click_callback)],
@@ -78,6 +196,15 @@ class KeelTelegramBot:
                 CommandHandler(COMMAND_DELETE,
                                filters=(~ filters.REPLY) & (~ filters.FORWARDED),
                                callback=self._delete_callback),
+                CommandHandler(COMMAND_APPROVE_ALL,
+                               filters=(~ filters.REPLY) & (~ filters.FORWARDED),
+                               callback=self._approve_all_callback),
+                CommandHandler(COMMAND_REJECT_ALL,
+                               filters=(~ filters.REPLY) & (~ filters.FORWARDED),
+                               callback=self._reject_all_callback),
+                CommandHandler(COMMAND_DELETE_ALL,
+                               filters=(~ filters.REPLY) & (~ filters.FORWARDED),
+                               callback=self._delete_all_callback),
                 CommandHandler(COMMAND_STATS,
                                filters=(~ filters.REPLY) & (~ filters.FORWARDED),
                                callback=self._stats_callback),
@@ -111,10 +238,37 @@ class KeelTelegramBot:
             for handler in handlers:
                 self._app.add_handler(handler, group=group)
 
+    def _get_outbox_file(self) -> str:
+        """
+        :return: path of the outbox database, ":memory:" if notifications don't need to survive a restart
+        """
+        if self._config.TELEGRAM_OUTBOX_FILE.value is not None:
+            return self._config.get_replica_file(self._config.TELEGRAM_OUTBOX_FILE)
+        if self._config.MONITOR_CHECKPOINT_FILE.value is not None:
+            # the checkpoint marks approvals as notified right after queueing them
+            LOGGER.warning("Notifications that are queued when the bot stops are lost, "
+                           "because no outbox file is configured")
+        return ":memory:"
+
+    def _on_members_changed(self, members: FrozenSet[str]):
+        # the rate limit of telegram applies to the bot token, which all replicas share
+        count = max(1, len(members))
+        self._rate_limiter.set_rate(TELEGRAM_MESSAGES_PER_SECOND / count,
+                                    burst=max(1, TELEGRAM_MESSAGES_PER_SECOND // count))
+
     @property
     def bot(self):
         return self._app.bot
 
+    @property
+    def webhook_path(self) -> Optional[str]:
+        """
+        :return: path of the webserver to receive updates on, None if updates are received by polling
+        """
+        if self._config.TELEGRAM_WEBHOOK_URL.value is None:
+            return None
+        return self._config.TELEGRAM_WEBHOOK_PATH.value
+
     async def start(self):
         """
         Starts up the bot.
@@ -122,14 +276,41 @@ class KeelTelegramBot:
         await self._app.initialize()
         LOGGER.debug(f"Using bot id '{self._app.bot.id}' ({self._app.bot.name})")
         await self._app.start()
-        await self._app.updater.start_polling()
+        self._outbox_flusher_task = asyncio.create_task(self._outbox_flusher.run())
+        if self.webhook_path is None:
+            await self._app.updater.start_polling()
+            return
+
+        url = self._config.TELEGRAM_WEBHOOK_URL.value.rstrip("/") + self.webhook_path
+        LOGGER.info(f"Receiving updates via webhook on {url}")
+        await self.bot.set_webhook(url, secret_token=self._webhook_secret_token, allowed_updates=Update.ALL_TYPES)
+
+    def is_valid_webhook_secret_token(self, token: Optional[str]) -> bool:
+        """
+        :param token: secret token sent along with a webhook update
+        :return: True if the token matches the one registered with telegram
+        """
+        if self._webhook_secret_token is None or token is None:
+            return False
+        return hmac.compare_digest(token.encode("utf-8"), self._webhook_secret_token.encode("utf-8"))
+
+    async def on_webhook_update(self, data: dict):
+        """
+        Dispatches an update received via webhook to the update handlers
+        :param data: update json
+        """
+        update = Update.de_json(data, self.bot)
+        await self._app.update_queue.put(update)
 
     def stop(self):
         """
         Shuts down the bot.
         """
         loop = asyncio.get_event_loop()
+        if self._outbox_flusher_task is not None:
+            self._outbox_flusher_task.cancel()
         loop.run_until_complete(self._app.shutdown())
+        self._outbox.close()
 
     @COMMAND_TIME_START.time()
     async def _start_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -158,46 +339,66 @@ class KeelTelegramBot:
                  Argument(name=["limit", "l"], description="Limit the number of entries", type=int,
                           example="10", optional=True, default=10),
                  Flag(name=["tracked", "t"], description="Only list tracked resources"),
+                 Argument(name=["namespace", "n"], description="Only list resources in this namespace",
+                          example="default", optional=True),
+                 Argument(name=["kind", "k"], description="Only list resources of this kind",
+                          example="deployment", optional=True),
+                 Argument(name=["policy", "p"], description="Only list resources with this policy type",
+                          example="glob", optional=True),
+                 Argument(name=["image", "i"], description="Only list resources running this image repository",
+                          example="library/nginx", optional=True),
              ],
              error_handler=CustomErrorHandler(),
              permissions=CONFIGURED_CHAT_ID & CONFIG_ADMINS)
+    @command_budget(COMMAND_LIST_RESOURCES[0])
     async def _list_resources_callback(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE,
         glob: Optional[str],
         limit: int,
         tracked: bool,
+        namespace: Optional[str],
+        kind: Optional[str],
+        policy: Optional[str],
+        image: Optional[str],
     ) -> None:
         """
         Lists all available resources
         :param update: the chat update object
         :param context: telegram context
         :param glob: (optional) filter glob
+        :param namespace: (optional) namespace
+        :param kind: (optional) resource kind
+        :param policy: (optional) policy type
+        :param image: (optional) image repository
         """
         bot = context.bot
         message = update.effective_message
         chat_id = update.effective_chat.id
 
-        def filter_resources_by(resources: List[Resource], glob: Optional[str], tracked: bool) -> List[Resource]:
-            result = resources
-            if glob is not None:
-                result = list(filter(
-                    lambda x: re.search(glob, x.name) or re.search(glob, x.namespace) or re.search(glob,
-                                                                                                   x.policy.value) or any(
-                        list(map(lambda y: re.search(glob, y), x.images))), resources))
+        if (self._config.KEEL_STREAMING.value and self._resource_index.current is None
+                and all(x is None for x in (namespace, kind, policy, image))):
+            # only keep the listed resources in memory, while counting the others
+            def list_streamed():
+                with closing(self._api_client.iter_resources()) as items:
+                    return take_and_count(items, lambda x: filter_resources(x, glob, tracked, limit))
 
-            if tracked:
-                result = list(filter(lambda x: x.policy != SemverPolicy(SemverPolicyType.NNone), result))
-
-            # apply limit
-            result = result[:limit]
-
-            return result
-
-        items = self._api_client.get_resources()
-        filtered_items = filter_resources_by(items, glob, tracked)
+            filtered_items, total = await asyncio.to_thread(list_streamed)
+            summary = f"({len(filtered_items)} of {total} resources)"
+        else:
+            # the snapshot (and its index) is kept in memory anyway, once it was fetched
+            items = await asyncio.to_thread(self._api_client.get_resources)
+            candidates = self._resource_index.get(items).lookup(
+                namespace=namespace,
+                kind=kind.casefold() if kind is not None else None,
+                policy=policy.casefold() if policy is not None else None,
+                image=image_repository(image) if image is not None else None,
+            )
+            filtered_items = filter_resources(candidates, glob, tracked, limit)
+            summary = f"({len(filtered_items)} of {len(items)} resources)"
 
         formatted_message = "\n\n".join(
             list(map(lambda x: resource_to_str(x), filtered_items))
+            + [summary]
         )
 
         await send_message(bot, chat_id, formatted_message, reply_to=message.message_id)
@@ -210,43 +411,60 @@ class KeelTelegramBot:
                           example="	deployment/myimage", optional=True),
                  Argument(name=["limit", "l"], description="Limit the number of entries", type=int,
                           example="10", optional=True, default=10),
+                 Argument(name=["namespace", "n"], description="Only list images tracked in this namespace",
+                          example="default", optional=True),
+                 Argument(name=["policy", "p"], description="Only list images with this policy type",
+                          example="glob", optional=True),
+                 Argument(name=["image", "i"], description="Only list this image repository",
+                          example="library/nginx", optional=True),
              ],
              error_handler=CustomErrorHandler(),
              permissions=CONFIGURED_CHAT_ID & CONFIG_ADMINS)
+    @command_budget(COMMAND_LIST_TRACKED[0])
     async def _list_tracked_callback(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE,
         glob: Optional[str],
         limit: int,
+        namespace: Optional[str],
+        policy: Optional[str],
+        image: Optional[str],
     ) -> None:
         """
         List tracked images
         :param update: the chat update object
         :param context: telegram context
         :param glob: (optional) filter glob
+        :param namespace: (optional) namespace
+        :param policy: (optional) policy type
+        :param image: (optional) image repository
         """
         bot = context.bot
         message = update.effective_message
         chat_id = update.effective_chat.id
 
-        def filter_tracked_images_by(images: List[TrackedImage], glob: Optional[str]) -> List[TrackedImage]:
-            result = images
-            if glob is not None:
-                result = list(filter(
-                    lambda x: re.search(glob, x.image) or
-                              re.search(glob, x.namespace) or
-                              re.search(glob, x.policy.value)
-                ))
-
-                # apply limit
-                result = result[:limit]
+        if (self._config.KEEL_STREAMING.value and self._tracked_image_index.current is None
+                and all(x is None for x in (namespace, policy, image))):
+            # only keep the listed images in memory, while counting the others
+            def list_streamed():
+                with closing(self._api_client.iter_tracked_images()) as items:
+                    return take_and_count(items, lambda x: filter_tracked_images(x, glob, limit))
 
-            return result
-
-        items = self._api_client.get_tracked_images()
-        filtered_items = filter_tracked_images_by(items, glob)
+            filtered_items, total = await asyncio.to_thread(list_streamed)
+            summary = f"({len(filtered_items)} of {total} tracked images)"
+        else:
+            # the snapshot (and its index) is kept in memory anyway, once it was fetched
+            items = await asyncio.to_thread(self._api_client.get_tracked_images)
+            candidates = self._tracked_image_index.get(items).lookup(
+                namespace=namespace,
+                policy=policy.casefold() if policy is not None else None,
+                image=image_repository(image) if image is not None else None,
+            )
+            filtered_items = filter_tracked_images(candidates, glob, limit)
+            summary = f"({len(filtered_items)} of {len(items)} tracked images)"
 
         formatted_message = "\n\n".join(
             list(map(lambda x: tracked_image_to_str(x), filtered_items))
+            + [summary]
         )
 
         await send_message(bot, chat_id, formatted_message, reply_to=message.message_id)
@@ -263,6 +481,7 @@ class KeelTelegramBot:
              ],
              error_handler=CustomErrorHandler(),
              permissions=CONFIGURED_CHAT_ID & CONFIG_ADMINS)
+    @command_budget(COMMAND_LIST_APPROVALS[0])
     async def _list_approvals_callback(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE,
         limit: int,
@@ -274,16 +493,12 @@ class KeelTelegramBot:
         message = update.effective_message
         chat_id = update.effective_chat.id
 
-        items = self._api_client.get_approvals()
-        items = list(filter(lambda x: not self._is_filtered_for(chat_id, x.identifier), items))
-
-        rejected_items = list(filter(lambda x: x.rejected, items))
-        archived_items = list(filter(lambda x: x.archived, items))
-        pending_items = list(filter(
-            lambda x: x not in archived_items and x not in rejected_items
-                      and x.votesReceived < x.votesRequired, items))
-        approved_items = list(
-            filter(lambda x: x not in rejected_items and x not in archived_items and x not in pending_items, items))
+        items = await asyncio.to_thread(self._api_client.get_approvals)
+        groups = group_approvals_by_state(items, lambda x: not self._is_filtered_for(chat_id, x.identifier))
+        rejected_items = groups.rejected
+        archived_items = groups.archived
+        pending_items = groups.pending
+        approved_items = groups.approved
 
         rejected_items_limited = rejected_items[:limit]
         archived_items_limited = archived_items[:limit]
@@ -295,27 +510,27 @@ class KeelTelegramBot:
             lines.append("\n".join([
                 f"<b>=== Archived ({len(archived_items_limited)}/{len(archived_items)}) ===</b>",
                 "",
-                "\n\n".join(list(map(lambda x: "> " + approval_to_str(x), archived_items)))
+                "\n\n".join(list(map(lambda x: "> " + approval_to_str(x), archived_items_limited)))
             ]).strip())
 
         if approved:
             lines.append("\n".join([
                 f"<b>=== Approved ({len(approved_items_limited)}/{len(approved_items)}) ===</b>",
                 "",
-                "\n\n".join(list(map(lambda x: "> " + approval_to_str(x), approved_items))),
+                "\n\n".join(list(map(lambda x: "> " + approval_to_str(x), approved_items_limited))),
             ]).strip())
 
         if rejected:
             lines.append("\n".join([
-                f"<b>=== Rejected ({len(rejected_items_limited)}{len(rejected_items)}) ===</b>",
+                f"<b>=== Rejected ({len(rejected_items_limited)}/{len(rejected_items)}) ===</b>",
                 "",
-                "\n\n".join(list(map(lambda x: "> " + approval_to_str(x), rejected_items))),
+                "\n\n".join(list(map(lambda x: "> " + approval_to_str(x), rejected_items_limited))),
             ]).strip())
 
         lines.append("\n".join([
             f"<b>=== Pending ({len(pending_items_limited)}/{len(pending_items)}) ===</b>",
             "",
-            "\n\n".join(list(map(lambda x: "> " + approval_to_str(x), pending_items))),
+            "\n\n".join(list(map(lambda x: "> " + approval_to_str(x), pending_items_limited))),
         ]))
 
         text = "\n\n".join(lines).strip()
@@ -339,6 +554,7 @@ class KeelTelegramBot:
              ],
              error_handler=CustomErrorHandler(),
              permissions=CONFIGURED_CHAT_ID & CONFIG_ADMINS)
+    @command_budget(COMMAND_UPDATE[0])
     async def _update_callback(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE,
         identifier: str,
@@ -366,44 +582,49 @@ class KeelTelegramBot:
             chat_id = update.effective_chat.id
 
             if count is not None:
-                self._api_client.set_required_approvals_count(
+                await asyncio.to_thread(
+                    self._api_client.set_required_approvals_count,
                     identifier=item.identifier,
                     votes_required=count,
                 )
 
             if policy is not None:
-                self._api_client.set_policy(
+                await asyncio.to_thread(
+                    self._api_client.set_policy,
                     identifier=item.identifier,
                     policy=policy,
                 )
 
             if schedule is not None:
-                self._api_client.set_schedule(
+                await asyncio.to_thread(
+                    self._api_client.set_schedule,
                     identifier=item.identifier,
                     schedule=schedule,
                     trigger=trigger,
                 )
             else:
                 if trigger is not None:
-                    self._api_client.set_trigger(
+                    await asyncio.to_thread(
+                        self._api_client.set_trigger,
                         identifier=item.identifier,
                         trigger=trigger,
                     )
 
-            resource = self._api_client.get_resource(identifier=item.identifier)
+            resource = await asyncio.to_thread(self._api_client.get_resource, identifier=item.identifier)
             resource_lines = resource_to_str(resource)
             text = resource_lines
 
             await send_message(bot, chat_id, text, reply_to=message.message_id,
                                menu=ReplyKeyboardRemove(selective=True))
 
-        items = self._api_client.get_resources()
+        items = await asyncio.to_thread(self._api_client.get_resources)
         items = list(filter(lambda x: not self._is_filtered_for(chat_id, x.identifier), items))
 
         # then fuzzy match to "identifier"
         await self._response_handler.await_user_selection(
             update, context, identifier, choices=items, key=lambda x: x.identifier,
-            callback=execute
+            callback=selection_budget(
+                COMMAND_UPDATE[0], self._config.TELEGRAM_COMMAND_TIMEOUT.value.total_seconds(), execute)
         )
 
     @COMMAND_TIME_APPROVE.time()
@@ -416,6 +637,7 @@ class KeelTelegramBot:
              ],
              error_handler=CustomErrorHandler(),
              permissions=CONFIGURED_CHAT_ID & CONFIG_ADMINS)
+    @command_budget(COMMAND_APPROVE[0])
     async def _approve_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
                                 identifier: str, voter: Optional[str]) -> None:
         """
@@ -431,12 +653,12 @@ class KeelTelegramBot:
             message = update.effective_message
             chat_id = update.effective_chat.id
 
-            self._api_client.approve(item.id, item.identifier, voter)
+            await asyncio.to_thread(self._api_client.approve, item.id, item.identifier, voter)
             text = f"Approved {item.identifier}"
             await send_message(bot, chat_id, text, reply_to=message.message_id,
                                menu=ReplyKeyboardRemove(selective=True))
 
-        items = self._api_client.get_approvals(rejected=False, archived=False)
+        items = await asyncio.to_thread(self._api_client.get_approvals, rejected=False, archived=False)
         items = list(filter(lambda x: not self._is_filtered_for(chat_id, x.identifier), items))
 
         # compare to the "id" first
@@ -448,7 +670,8 @@ class KeelTelegramBot:
         # then fuzzy match to "identifier"
         await self._response_handler.await_user_selection(
             update, context, identifier, choices=items, key=lambda x: x.identifier,
-            callback=execute,
+            callback=selection_budget(
+                COMMAND_APPROVE[0], self._config.TELEGRAM_COMMAND_TIMEOUT.value.total_seconds(), execute),
         )
 
     @COMMAND_TIME_REJECT.time()
@@ -461,6 +684,7 @@ class KeelTelegramBot:
              ],
              error_handler=CustomErrorHandler(),
              permissions=CONFIGURED_CHAT_ID & CONFIG_ADMINS)
+    @command_budget(COMMAND_REJECT[0])
     async def _reject_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
                                identifier: str, voter: Optional[str]) -> None:
         """
@@ -477,12 +701,12 @@ class KeelTelegramBot:
             message = update.effective_message
             chat_id = update.effective_chat.id
 
-            self._api_client.reject(item.id, item.identifier, voter)
+            await asyncio.to_thread(self._api_client.reject, item.id, item.identifier, voter)
             text = f"Rejected {item.identifier}"
             await send_message(bot, chat_id, text, reply_to=message.message_id,
                                menu=ReplyKeyboardRemove(selective=True))
 
-        items = self._api_client.get_approvals(rejected=False, archived=False)
+        items = await asyncio.to_thread(self._api_client.get_approvals, rejected=False, archived=False)
         items = list(filter(lambda x: not self._is_filtered_for(chat_id, x.identifier), items))
 
         # compare to the "id" first
@@ -494,7 +718,8 @@ class KeelTelegramBot:
         # then fuzzy match to "identifier"
         await self._response_handler.await_user_selection(
             update, context, identifier, choices=items, key=lambda x: x.identifier,
-            callback=execute,
+            callback=selection_budget(
+                COMMAND_REJECT[0], self._config.TELEGRAM_COMMAND_TIMEOUT.value.total_seconds(), execute),
         )
 
     @COMMAND_TIME_DELETE.time()
@@ -507,6 +732,7 @@ class KeelTelegramBot:
              ],
              error_handler=CustomErrorHandler(),
              permissions=CONFIGURED_CHAT_ID & CONFIG_ADMINS)
+    @command_budget(COMMAND_DELETE[0])
     async def _delete_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
                                identifier: str, voter: Optional[str]) -> None:
         """
@@ -521,12 +747,12 @@ class KeelTelegramBot:
             message = update.effective_message
             chat_id = update.effective_chat.id
 
-            self._api_client.delete(item.id, item.identifier, voter)
+            await asyncio.to_thread(self._api_client.delete, item.id, item.identifier, voter)
             text = f"Deleted {item.identifier}"
             await send_message(bot, chat_id, text, reply_to=message.message_id,
                                menu=ReplyKeyboardRemove(selective=True))
 
-        items = self._api_client.get_approvals()
+        items = await asyncio.to_thread(self._api_client.get_approvals)
         items = list(filter(lambda x: not self._is_filtered_for(chat_id, x.identifier), items))
 
         # compare to the "id" first
@@ -538,9 +764,144 @@ class KeelTelegramBot:
         # then fuzzy match to "identifier"
         await self._response_handler.await_user_selection(
             update, context, identifier, choices=items, key=lambda x: x.identifier,
-            callback=execute,
+            callback=selection_budget(
+                COMMAND_DELETE[0], self._config.TELEGRAM_COMMAND_TIMEOUT.value.total_seconds(), execute),
+        )
+
+    @COMMAND_TIME_APPROVE_ALL.time()
+    @command(name=COMMAND_APPROVE_ALL,
+             description="Approve all pending items matching a pattern",
+             arguments=[
+                 Argument(name=["pattern", "p"], description="Identifier glob, matches all pending items if omitted",
+                          example="deployment/default/*", optional=True),
+                 Flag(name=["regex", "e"], description="Interpret the pattern as a regular expression"),
+                 Argument(name=["voter", "v"], description="Name of voter", example="john", optional=True),
+             ],
+             error_handler=CustomErrorHandler(),
+             permissions=CONFIGURED_CHAT_ID & CONFIG_ADMINS)
+    @command_budget(COMMAND_APPROVE_ALL[0])
+    async def _approve_all_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                    pattern: Optional[str], regex: bool, voter: Optional[str]) -> None:
+        """
+        Approve all pending items matching a pattern
+        """
+        items = await asyncio.to_thread(self._api_client.get_approvals, rejected=False, archived=False)
+        items = group_approvals_by_state(items).pending
+        await self._run_bulk_approval_action(
+            update, context, items, pattern, regex, voter,
+            action="approve", action_past="Approved", func=self._api_client.approve,
+        )
+
+    @COMMAND_TIME_REJECT_ALL.time()
+    @command(name=COMMAND_REJECT_ALL,
+             description="Reject all pending items matching a pattern",
+             arguments=[
+                 Argument(name=["pattern", "p"], description="Identifier glob, matches all pending items if omitted",
+                          example="deployment/default/*", optional=True),
+                 Flag(name=["regex", "e"], description="Interpret the pattern as a regular expression"),
+                 Argument(name=["voter", "v"], description="Name of voter", example="john", optional=True),
+             ],
+             error_handler=CustomErrorHandler(),
+             permissions=CONFIGURED_CHAT_ID & CONFIG_ADMINS)
+    @command_budget(COMMAND_REJECT_ALL[0])
+    async def _reject_all_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                   pattern: Optional[str], regex: bool, voter: Optional[str]) -> None:
+        """
+        Reject all pending items matching a pattern
+        """
+        items = await asyncio.to_thread(self._api_client.get_approvals, rejected=False, archived=False)
+        items = group_approvals_by_state(items).pending
+        await self._run_bulk_approval_action(
+            update, context, items, pattern, regex, voter,
+            action="reject", action_past="Rejected", func=self._api_client.reject,
         )
 
+    @COMMAND_TIME_DELETE_ALL.time()
+    @command(name=COMMAND_DELETE_ALL,
+             description="Delete all archived or rejected items matching a pattern",
+             arguments=[
+                 Argument(name=["pattern", "p"],
+                          description="Identifier glob, matches all archived or rejected items if omitted",
+                          example="deployment/default/*", optional=True),
+                 Flag(name=["regex", "e"], description="Interpret the pattern as a regular expression"),
+                 Argument(name=["voter", "v"], description="Name of voter", example="john", optional=True),
+             ],
+             error_handler=CustomErrorHandler(),
+             permissions=CONFIGURED_CHAT_ID & CONFIG_ADMINS)
+    @command_budget(COMMAND_DELETE_ALL[0])
+    async def _delete_all_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                   pattern: Optional[str], regex: bool, voter: Optional[str]) -> None:
+        """
+        Delete all archived or rejected items matching a pattern
+        """
+        items = await asyncio.to_thread(self._api_client.get_approvals)
+        items = [x for x in items if x.archived or x.rejected]
+        await self._run_bulk_approval_action(
+            update, context, items, pattern, regex, voter,
+            action="delete", action_past="Deleted", func=self._api_client.delete,
+        )
+
+    async def _run_bulk_approval_action(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE, items: List[Approval],
+        pattern: Optional[str], regex: bool, voter: Optional[str],
+        action: str, action_past: str, func: Callable[[str, str, str], None],
+    ):
+        """
+        Runs an approval action for all items matching the given pattern concurrently,
+        replies with a single aggregated result and updates the affected messages once
+        :param update: the chat update object
+        :param context: telegram context
+        :param items: candidate approvals
+        :param pattern: identifier glob (or regular expression), all candidates are used if None
+        :param regex: whether to interpret the pattern as a regular expression
+        :param voter: name of voter, defaults to the name of the user
+        :param action: name of the action, used for metrics
+        :param action_past: past tense of the action, used in the reply
+        :param func: api client function to call with (id, identifier, voter)
+        """
+        bot = context.bot
+        message = update.effective_message
+        chat_id = update.effective_chat.id
+
+        if voter is None:
+            voter = update.effective_user.full_name
+        if not voter:
+            voter = update.effective_user.name
+
+        matches = create_identifier_matcher(pattern, regex)
+        items = [x for x in items if matches(x.identifier) and not self._is_filtered_for(chat_id, x.identifier)]
+        if len(items) <= 0:
+            await send_message(bot, chat_id, "No matching items found", reply_to=message.message_id)
+            return
+
+        async def execute(item: Approval):
+            # the api client is blocking, run requests in worker threads
+            await asyncio.to_thread(func, item.id, item.identifier, voter)
+            KEEL_APPROVAL_ACTION_COUNTER.labels(action=action, identifier=item.identifier).inc()
+
+        results = await run_concurrently(execute, items, limit=BULK_ACTION_CONCURRENCY)
+        failed = [(item, ex) for item, ex in results if ex is not None]
+        for item, ex in failed:
+            LOGGER.warning("Failed to %s %s: %s", action, item.identifier, ex)
+
+        lines = [f"{action_past} {len(results) - len(failed)}/{len(results)} items"]
+        lines += [f"  {item.identifier}: {self._format_bulk_error(ex)}" for item, ex in failed]
+        await send_message(bot, chat_id, "\n".join(lines), reply_to=message.message_id)
+
+        # only the affected messages are refreshed, coalesced with other pending refreshes
+        for item in items:
+            self._message_refresher.mark_dirty(item.id)
+
+    @staticmethod
+    def _format_bulk_error(ex: Exception) -> str:
+        if isinstance(ex, HTTPError) and ex.response is not None:
+            return ex.response.content.decode('utf-8').strip()
+        if isinstance(ex, KeelUnavailableError):
+            return "Keel is currently unavailable"
+        if isinstance(ex, BudgetExceededError):
+            return "Cancelled, the command took too long"
+        return str(ex)
+
     @COMMAND_TIME_STATS.time()
     @command(
         name=COMMAND_STATS,
@@ -548,12 +909,13 @@ class KeelTelegramBot:
         error_handler=CustomErrorHandler(),
         permissions=CONFIG_ADMINS,
     )
+    @command_budget(COMMAND_STATS)
     async def _stats_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         bot = context.bot
         message = update.effective_message
         chat_id = update.effective_chat.id
 
-        stats = self._api_client.get_stats()
+        stats = await asyncio.to_thread(self._api_client.get_stats)
 
         text = f"{stats}"
         await send_message(bot, chat_id, text, reply_to=message.message_id)
@@ -582,43 +944,76 @@ class KeelTelegramBot:
             f"{message}",
         ])
 
-        for chat_id in self._config.TELEGRAM_CHAT_IDS.value:
+        for chat_id in self._config.derived.ordered_chat_ids:
 
             if self._is_filtered_for(chat_id, identifier):
                 continue
 
-            await send_message(
-                self.bot, chat_id,
-                text, parse_mode="HTML",
-                menu=None
-            )
+            self._outbox.enqueue(OUTBOX_KIND_NOTIFICATION, {
+                "chat_id": chat_id,
+                "text": text,
+            })
+        self._outbox_flusher.notify()
 
     async def on_new_pending_approval(self, item: Approval):
         """
-        Handles new pending approvals by sending a message
-        including an inline keyboard to all configured chat ids
+        Handles new pending approvals by queueing a message
+        including an inline keyboard for all configured chat ids
         :param item: new pending approval
         """
         identifier = item.identifier
         text = approval_to_str(item)
         menu = self.create_approval_notification_menu(item)
 
-        for chat_id in self._config.TELEGRAM_CHAT_IDS.value:
+        for chat_id in self._config.derived.ordered_chat_ids:
 
             if self._is_filtered_for(chat_id, identifier):
                 LOGGER.debug(f"Skipping new pending approval for chat '{chat_id}' due to filters")
                 continue
 
-            LOGGER.debug(f"Sending pending approval message to '{chat_id}'")
-            try:
-                response = await send_message(
-                    self.bot, chat_id,
-                    text, parse_mode="HTML",
-                    menu=menu
-                )
-                self._register_message(response.chat_id, response.message_id, item.id, item.identifier)
-            except Exception as ex:
-                LOGGER.exception(ex)
+            if self._shard_coordinator is not None and not self._shard_coordinator.owns_chat(chat_id):
+                # sent by the replica this chat is assigned to, which is also the only one able to edit it later
+                continue
+
+            LOGGER.debug(f"Queueing pending approval message to '{chat_id}'")
+            self._outbox.enqueue(OUTBOX_KIND_APPROVAL, {
+                "chat_id": chat_id,
+                "text": text,
+                "menu": menu.to_dict(),
+                "approval_id": item.id,
+                "approval_identifier": item.identifier,
+            })
+            self._approvals[item.id] = item
+            self._rendered_deadlines[item.id] = deadline_remaining_bucket(item.deadline)
+        self._outbox_flusher.notify()
+
+    async def _deliver_outbox_entry(self, entry: OutboxEntry):
+        """
+        Sends a message queued in the outbox
+        :param entry: the outbox entry
+        """
+        payload = entry.payload
+        menu = None
+        if payload.get("menu") is not None:
+            menu = InlineKeyboardMarkup.de_json(payload["menu"], self.bot)
+
+        # long messages are sent in multiple parts, only the last one has the inline keyboard
+        parts = split_message(payload["text"])
+        sent_parts = payload.get("sent_parts", 0)
+        for index in range(sent_parts, len(parts)):
+            last = index == len(parts) - 1
+            response = await send_message(
+                self.bot, payload["chat_id"],
+                parts[index], parse_mode="HTML",
+                menu=menu if last else None
+            )
+            if not last:
+                # don't send the parts that were delivered already again, if a later part fails
+                self._outbox.update_payload(entry.id, {**payload, "sent_parts": index + 1})
+            elif entry.kind == OUTBOX_KIND_APPROVAL:
+                # messages can only be updated once they have been sent
+                self._register_message(response.chat_id, response.message_id,
+                                       payload["approval_id"], payload["approval_identifier"])
 
     @command(
         name=COMMAND_CONFIG,
@@ -690,7 +1085,7 @@ class KeelTelegramBot:
         if update.effective_user is not None:
             username = update.effective_user.username
 
-        user_is_admin = username in self._config.TELEGRAM_ADMIN_USERNAMES.value
+        user_is_admin = username in self._config.derived.admin_usernames
         if user_is_admin:
             await self._help_callback(update, context)
             return
@@ -726,23 +1121,41 @@ class KeelTelegramBot:
             matches = re.search(r"^Identifier: (.*)", message_text, flags=re.MULTILINE)
             approval_identifier = matches.group(1)
 
+            approval = self._approvals.get(approval_id)
             if data == BUTTON_DATA_APPROVE:
-                self._api_client.approve(approval_id, approval_identifier, from_user.full_name)
+                await asyncio.to_thread(self._api_client.approve, approval_id, approval_identifier,
+                                        from_user.full_name)
                 answer_text = f"Approved '{approval_identifier}'"
                 KEEL_APPROVAL_ACTION_COUNTER.labels(action="approve", identifier=approval_identifier).inc()
+                if approval is not None:
+                    approval = approval.with_vote(from_user.full_name)
             elif data == BUTTON_DATA_REJECT:
-                self._api_client.reject(approval_id, approval_identifier, from_user.full_name)
+                await asyncio.to_thread(self._api_client.reject, approval_id, approval_identifier,
+                                        from_user.full_name)
                 answer_text = f"Rejected '{approval_identifier}'"
                 KEEL_APPROVAL_ACTION_COUNTER.labels(action="reject", identifier=approval_identifier).inc()
+                if approval is not None:
+                    approval = approval.with_rejection(from_user.full_name)
             else:
                 await bot.answer_callback_query(query_id, text="Unknown button")
                 return
 
             await context.bot.answer_callback_query(query_id, text=answer_text)
-            await self.update_messages()
+            if approval is not None:
+                # show the expected result in the clicked message right away,
+                # the refresh updates the messages in all chats once keel reflects it
+                message = update.effective_message
+                try:
+                    await self._edit_approval_message(message.chat_id, message.message_id, approval)
+                except Exception as ex:
+                    LOGGER.exception(ex)
+            self._message_refresher.mark_dirty(approval_id)
         except HTTPError as e:
             LOGGER.error(e)
             await bot.answer_callback_query(query_id, text=f"{e.response.content.decode('utf-8')}")
+        except KeelUnavailableError as e:
+            LOGGER.error(e)
+            await bot.answer_callback_query(query_id, text="Keel is currently unavailable")
         except Exception as e:
             LOGGER.error(e)
             await bot.answer_callback_query(query_id, text=f"Unknwon error")
@@ -782,12 +1195,72 @@ class KeelTelegramBot:
         """
         key = f"{approval_id}_{approval_identifier}"
         self._message_map.setdefault(key, {}).setdefault(chat_id, set()).add(message_id)
+        self._tracked_approval_ids.setdefault(identifier_without_version(approval_identifier), set()).add(approval_id)
 
-    async def update_messages(self):
+    def get_tracked_approval_ids(self, identifier: str) -> Set[str]:
         """
-        Fetch approvals and update existing approval messages accordingly
+        Returns the ids of approvals with registered messages matching the given identifier
+        :param identifier: resource or approval identifier, the version is ignored
+        :return: set of approval ids
         """
-        approvals = self._api_client.get_approvals()
+        return set(self._tracked_approval_ids.get(identifier_without_version(identifier), ()))
+
+    def forget_messages(self, approvals: List[Approval]):
+        """
+        Stops tracking the messages of approvals, which do not exist anymore
+        :param approvals: removed approvals
+        """
+        for approval in approvals:
+            key = f"{approval.id}_{approval.identifier}"
+            self._message_map.pop(key, None)
+            self._approvals.pop(approval.id, None)
+            self._rendered_deadlines.pop(approval.id, None)
+            self._tracked_approval_ids.get(identifier_without_version(approval.identifier), set()).discard(approval.id)
+
+    def needs_deadline_update(self, approval: Approval) -> bool:
+        """
+        :param approval: the current state of an approval
+        :return: True if the approval has messages and the remaining time shown in them is outdated
+        """
+        rendered = self._rendered_deadlines.get(approval.id)
+        if rendered is None or approval.archived or approval.rejected:
+            return False
+        # expired approvals are updated until their messages are closed
+        return rendered <= 0 or rendered != deadline_remaining_bucket(approval.deadline)
+
+    async def close_messages(self, approvals: List[Approval]):
+        """
+        Updates the messages of approvals, which can't be voted on anymore, one last time
+        without an inline keyboard and stops tracking them
+        :param approvals: removed or expired approvals
+        """
+        for approval in approvals:
+            key = f"{approval.id}_{approval.identifier}"
+            # removed approvals might be records of a checkpoint, fall back to the last known state
+            state = approval if isinstance(approval, Approval) else self._approvals.get(approval.id)
+            for chat_id, message_ids in list(self._message_map.get(key, {}).items()):
+                for message_id in list(message_ids):
+                    try:
+                        if state is None:
+                            await self.bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id)
+                        else:
+                            await self.bot.edit_message_text(
+                                approval_to_str(state),
+                                chat_id=chat_id,
+                                message_id=message_id,
+                                parse_mode="HTML",
+                            )
+                    except Exception as ex:
+                        LOGGER.exception(ex)
+        self.forget_messages(approvals)
+
+    async def update_messages(self, approvals: Optional[List[Approval]] = None):
+        """
+        Update existing approval messages
+        :param approvals: the approvals to update messages for, all approvals are fetched if None
+        """
+        if approvals is None:
+            approvals = await asyncio.to_thread(self._api_client.get_approvals)
 
         for approval in approvals:
 
@@ -801,40 +1274,76 @@ class KeelTelegramBot:
             approval_identifier = approval.identifier
             key = f"{approval_id}_{approval_identifier}"
 
-            chats = self._message_map.get(key, {})
-            failed_messages = set()
-            for chat_id, message_ids in chats.items():
+            # messages are registered by the outbox flusher on the event loop of the bot, while this
+            # might run on the one of the monitor, so iterate over copies
+            chats = list(self._message_map.get(key, {}).items())
+            if len(chats) > 0:
+                self._approvals[approval_id] = approval
+                self._rendered_deadlines[approval_id] = deadline_remaining_bucket(approval.deadline)
+            for chat_id, message_ids in chats:
 
                 if self._is_filtered_for(chat_id, approval_identifier):
                     continue
 
-                for message_id in message_ids:
+                failed_messages = set()
+                for message_id in list(message_ids):
                     try:
-                        approval_str = approval_to_str(approval)
-                        menu = self.create_approval_notification_menu(approval)
-                        await self.bot.edit_message_text(
-                            approval_str,
-                            chat_id=chat_id,
-                            message_id=message_id,
-                            parse_mode="HTML",
-                            reply_markup=menu
-                        )
+                        await self._edit_approval_message(chat_id, message_id, approval)
+                    except BadRequest as ex:
+                        if TELEGRAM_MESSAGE_NOT_MODIFIED in ex.message:
+                            # f.ex. the clicked message, which already shows the expected result
+                            continue
+                        failed_messages.add(message_id)
+                        LOGGER.exception(ex)
                     except Exception as ex:
                         failed_messages.add(message_id)
                         LOGGER.exception(ex)
 
-                for failure in failed_messages:
-                    message_ids.remove(failure)
+                message_ids.difference_update(failed_messages)
+
+    async def _edit_approval_message(self, chat_id: str | int, message_id: int, approval: Approval):
+        """
+        Shows the given state of an approval in one of its messages
+        :param chat_id: chat of the message
+        :param message_id: the message
+        :param approval: the approval
+        """
+        await self.bot.edit_message_text(
+            approval_to_str(approval),
+            chat_id=chat_id,
+            message_id=message_id,
+            parse_mode="HTML",
+            reply_markup=self.create_approval_notification_menu(approval)
+        )
+
+    async def _refresh_messages(self, approval_ids: Set[str]):
+        """
+        Updates the messages of the given approvals, unless they already reflect keel's state
+        :param approval_ids: ids of the approvals to update messages for
+        """
+        approvals = await asyncio.to_thread(self._api_client.get_approvals)
+        approvals = [x for x in approvals if x.id in approval_ids and not self._is_displayed(x)]
+        await self.update_messages(approvals)
+
+    def _is_displayed(self, approval: Approval) -> bool:
+        """
+        :param approval: the current state of an approval
+        :return: True if the messages of this approval already reflect the given state
+        """
+        known = self._approvals.get(approval.id)
+        if known is None:
+            return False
+        return all(getattr(known, field) == getattr(approval, field) for field in APPROVAL_MESSAGE_FIELDS)
 
     def _is_filtered_for(self, chat_id: str | int, identifier: str) -> bool:
-        chat_ids: List[str] = self._config.TELEGRAM_CHAT_IDS.value
-        filter_config: List[Dict] = self._config.TELEGRAM_FILTERS.value
+        derived = self._config.derived
 
-        chat_unknown = str(chat_id) not in chat_ids
-        filter_doesnt_match = util._is_filtered_for(filter_config, str(chat_id), identifier)
+        chat_unknown = str(chat_id) not in derived.chat_ids
+        filter_doesnt_match = derived.is_filtered_for(chat_id, identifier)
 
         result = chat_unknown or filter_doesnt_match
         LOGGER.debug(
-            f"Filtered identifier '{identifier}' for chat {chat_id} because: chat_unknown: {chat_unknown}, filter_doesnt_match: {filter_doesnt_match}, result: {result}")
+            "Filtered identifier '%s' for chat %s because: chat_unknown: %s, filter_doesnt_match: %s, result: %s",
+            identifier, chat_id, chat_unknown, filter_doesnt_match, result)
 
         return result
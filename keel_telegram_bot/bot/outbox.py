@@ -0,0 +1,294 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Awaitable, List, Iterable, Optional
+
+from telegram.error import RetryAfter, BadRequest, Forbidden
+
+from keel_telegram_bot.bot.rate_limiter import RateLimiter
+from keel_telegram_bot.stats import OUTBOX_PENDING_GAUGE, OUTBOX_SENT_COUNTER, OUTBOX_RETRY_COUNTER, \
+    OUTBOX_DEAD_LETTER_COUNTER
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OutboxEntry:
+    id: int
+    kind: str
+    payload: dict
+    attempts: int
+    last_error: Optional[str] = None
+
+
+class Outbox:
+    """
+    Persists outgoing messages in a SQLite database until they have been delivered,
+    so they survive errors and restarts. Messages that can't be delivered are moved
+    to a dead-letter table.
+    """
+
+    def __init__(self, file_path: str, clock: Callable[[], float] = time.time):
+        """
+        :param file_path: path of the database file, ":memory:" to keep messages in memory only
+        :param clock: wall clock
+        :raises ValueError: if the database file is in use by another process
+        """
+        self._clock = clock
+        # enqueued from the monitor thread, delivered from the event loop
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(file_path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            # entries are not claimed by the process delivering them, so an outbox must not be shared by replicas,
+            # which is enforced by holding an exclusive lock on the database while it is open
+            self._connection.execute("PRAGMA locking_mode=EXCLUSIVE")
+            try:
+                self._connection.execute("BEGIN EXCLUSIVE")
+                self._connection.execute("COMMIT")
+            except sqlite3.OperationalError as ex:
+                self._connection.close()
+                raise ValueError(f"Outbox {file_path} is in use by another process, "
+                                 f"each replica needs an outbox file of its own") from ex
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, last_error TEXT)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS dead_letters ("
+                "id INTEGER PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL, failed_at REAL NOT NULL, last_error TEXT)"
+            )
+        OUTBOX_PENDING_GAUGE.set(len(self))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def enqueue(self, kind: str, payload: dict) -> int:
+        """
+        Appends a message to the outbox
+        :param kind: type of the message, determines how it is delivered
+        :param payload: json serializable message data
+        :return: id of the entry
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO outbox (kind, payload, next_attempt_at) VALUES (?, ?, ?)",
+                (kind, json.dumps(payload), self._clock()),
+            )
+        OUTBOX_PENDING_GAUGE.inc()
+        return cursor.lastrowid
+
+    def get_due(self, limit: int) -> List[OutboxEntry]:
+        """
+        :param limit: maximum number of entries
+        :return: the oldest entries that are due for (another) delivery attempt
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, kind, payload, attempts, last_error FROM outbox "
+                "WHERE next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (self._clock(), limit),
+            ).fetchall()
+        return [OutboxEntry(row[0], row[1], json.loads(row[2]), row[3], row[4]) for row in rows]
+
+    def complete(self, entry_ids: Iterable[int]):
+        """
+        Removes delivered entries
+        :param entry_ids: ids of the delivered entries
+        """
+        entry_ids = [(x,) for x in entry_ids]
+        if len(entry_ids) <= 0:
+            return
+        with self._lock:
+            with self._transaction():
+                self._connection.executemany("DELETE FROM outbox WHERE id = ?", entry_ids)
+        OUTBOX_PENDING_GAUGE.dec(len(entry_ids))
+
+    def reschedule(self, entry_id: int, error: str, delay: float, count_attempt: bool = True):
+        """
+        Schedules another delivery attempt
+        :param entry_id: id of the entry
+        :param error: reason of the failed attempt
+        :param delay: number of seconds to wait before the next attempt
+        :param count_attempt: whether the failed attempt counts towards the maximum number of attempts
+        """
+        with self._lock:
+            self._connection.execute(
+                "UPDATE outbox SET attempts = attempts + ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (1 if count_attempt else 0, self._clock() + delay, error, entry_id),
+            )
+
+    def update_payload(self, entry_id: int, payload: dict):
+        """
+        Replaces the message data of an entry, f.ex. to record the progress of a partial delivery
+        :param entry_id: id of the entry
+        :param payload: json serializable message data
+        """
+        with self._lock:
+            self._connection.execute("UPDATE outbox SET payload = ? WHERE id = ?", (json.dumps(payload), entry_id))
+
+    def dead_letter(self, entry_id: int, error: str):
+        """
+        Moves an entry, which can't be delivered, to the dead-letter table
+        :param entry_id: id of the entry
+        :param error: reason of the last failed attempt
+        """
+        with self._lock:
+            with self._transaction():
+                self._connection.execute(
+                    "INSERT INTO dead_letters (id, kind, payload, attempts, failed_at, last_error) "
+                    "SELECT id, kind, payload, attempts + 1, ?, ? FROM outbox WHERE id = ?",
+                    (self._clock(), error, entry_id),
+                )
+                self._connection.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+        OUTBOX_PENDING_GAUGE.dec()
+
+    def get_dead_letters(self, limit: int = 100) -> List[OutboxEntry]:
+        """
+        :param limit: maximum number of entries
+        :return: the most recent entries that could not be delivered
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, kind, payload, attempts, last_error FROM dead_letters ORDER BY failed_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [OutboxEntry(row[0], row[1], json.loads(row[2]), row[3], row[4]) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        self._connection.execute("BEGIN")
+        try:
+            yield
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+
+class OutboxFlusher:
+    """
+    Delivers the messages of an outbox in batches, within the rate limit,
+    retrying failed messages with an exponential backoff.
+    Messages are delivered at least once, a crash right after sending a message
+    causes it to be sent again after the restart.
+    """
+
+    def __init__(self, outbox: Outbox, deliver: Callable[[OutboxEntry], Awaitable[None]], rate_limiter: RateLimiter,
+                 batch_size: int, max_attempts: int, retry_backoff: float, retry_backoff_max: float,
+                 poll_interval: float):
+        """
+        :param outbox: the outbox to deliver
+        :param deliver: function sending a single entry
+        :param rate_limiter: limits the rate of delivery attempts
+        :param batch_size: maximum number of entries fetched and completed at once
+        :param max_attempts: number of failed attempts after which an entry is dead-lettered
+        :param retry_backoff: seconds to wait before the first retry, doubled on each attempt
+        :param retry_backoff_max: maximum number of seconds to wait before a retry
+        :param poll_interval: seconds between checks for entries that are due for a retry
+        """
+        self._outbox = outbox
+        self._deliver = deliver
+        self._rate_limiter = rate_limiter
+        self._batch_size = batch_size
+        self._max_attempts = max_attempts
+        self._retry_backoff = retry_backoff
+        self._retry_backoff_max = retry_backoff_max
+        self._poll_interval = poll_interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def notify(self):
+        """
+        Signals that new entries have been enqueued, may be called from any thread
+        """
+        if self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # the event loop is closed
+            pass
+
+    async def run(self):
+        """
+        Delivers entries until cancelled
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                count = await self.flush()
+            except Exception as ex:
+                LOGGER.exception(ex)
+                count = 0
+            if count >= self._batch_size:
+                # there might be more
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def flush(self) -> int:
+        """
+        Tries to deliver a single batch of entries that are due
+        :return: number of entries in the batch
+        """
+        entries = self._outbox.get_due(self._batch_size)
+        delivered = []
+        try:
+            for entry in entries:
+                await self._rate_limiter.acquire()
+                try:
+                    await self._deliver(entry)
+                    delivered.append(entry.id)
+                    OUTBOX_SENT_COUNTER.labels(kind=entry.kind).inc()
+                except RetryAfter as ex:
+                    retry_after = ex.retry_after
+                    if isinstance(retry_after, timedelta):
+                        retry_after = retry_after.total_seconds()
+                    LOGGER.warning(f"Rate limited by telegram, pausing for {retry_after}s")
+                    # flood control applies to all messages, it is not a failure of this entry
+                    self._rate_limiter.pause(retry_after)
+                    self._outbox.reschedule(entry.id, str(ex), delay=retry_after, count_attempt=False)
+                    OUTBOX_RETRY_COUNTER.labels(kind=entry.kind).inc()
+                    # the remaining entries are attempted again once the pause is over
+                    break
+                except (BadRequest, Forbidden) as ex:
+                    # retrying won't help, f.ex. the chat doesn't exist or the bot was removed from it
+                    LOGGER.error(f"Failed to deliver outbox entry {entry.id}, giving up: {ex}")
+                    self._outbox.dead_letter(entry.id, str(ex))
+                    OUTBOX_DEAD_LETTER_COUNTER.labels(kind=entry.kind).inc()
+                except Exception as ex:
+                    self._on_failure(entry, ex)
+        finally:
+            self._outbox.complete(delivered)
+        return len(entries)
+
+    def _on_failure(self, entry: OutboxEntry, ex: Exception):
+        attempts = entry.attempts + 1
+        if attempts >= self._max_attempts:
+            LOGGER.error(f"Failed to deliver outbox entry {entry.id} after {attempts} attempts, giving up: {ex}")
+            self._outbox.dead_letter(entry.id, str(ex))
+            OUTBOX_DEAD_LETTER_COUNTER.labels(kind=entry.kind).inc()
+            return
+
+        delay = min(self._retry_backoff * 2 ** (attempts - 1), self._retry_backoff_max)
+        LOGGER.warning(f"Failed to deliver outbox entry {entry.id} (attempt {attempts}), retrying in {delay}s: {ex}")
+        self._outbox.reschedule(entry.id, str(ex), delay=delay)
+        OUTBOX_RETRY_COUNTER.labels(kind=entry.kind).inc()
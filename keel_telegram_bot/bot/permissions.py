@@ -12,7 +12,7 @@ class _ConfigAdmins(Permission):
 
     async def evaluate(self, update: Update, context: CallbackContext) -> bool:
         from_user = update.effective_message.from_user
-        return from_user.username in self._config.TELEGRAM_ADMIN_USERNAMES.value
+        return from_user.username in self._config.derived.admin_usernames
 
 
 CONFIG_ADMINS = _ConfigAdmins()
@@ -25,7 +25,7 @@ class _ConfigChatId(Permission):
 
     async def evaluate(self, update: Update, context: CallbackContext) -> bool:
         chat_id = update.effective_message.chat_id
-        return str(chat_id) in self._config.TELEGRAM_CHAT_IDS.value
+        return str(chat_id) in self._config.derived.chat_ids
 
 
 CONFIGURED_CHAT_ID = _ConfigChatId()
@@ -0,0 +1,59 @@
+import asyncio
+import time
+from typing import Callable, Awaitable
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the rate of outgoing requests of a single consumer.
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        """
+        :param rate: number of requests per second
+        :param burst: number of requests that may be sent at once after being idle
+        :param clock: monotonic clock
+        :param sleep: function to wait with
+        """
+        self._rate = rate
+        self._burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._updated_at = clock()
+        self._resume_at = 0.0
+
+    def set_rate(self, rate: float, burst: int):
+        """
+        Changes the limit, f.ex. when it is shared with a different number of consumers
+        :param rate: number of requests per second
+        :param burst: number of requests that may be sent at once after being idle
+        """
+        self._rate = rate
+        self._burst = burst
+        self._tokens = min(self._tokens, burst)
+
+    def pause(self, seconds: float):
+        """
+        Stops handing out tokens for the given time, f.ex. when being rate limited by the server
+        :param seconds: number of seconds to pause
+        """
+        self._resume_at = max(self._resume_at, self._clock() + seconds)
+
+    async def acquire(self):
+        """
+        Waits until the next request may be sent
+        """
+        while True:
+            now = self._clock()
+            if now < self._resume_at:
+                await self._sleep(self._resume_at - now)
+                continue
+
+            self._tokens = min(self._burst, self._tokens + (now - self._updated_at) * self._rate)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await self._sleep((1 - self._tokens) / self._rate)
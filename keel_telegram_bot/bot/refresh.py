@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from typing import Callable, Awaitable, Set, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CoalescingRefresher:
+    """
+    Collects keys that need to be refreshed and runs a single refresh for all of them
+    shortly after the first key has been marked, instead of refreshing once per trigger.
+    """
+
+    def __init__(self, callback: Callable[[Set[str]], Awaitable[None]], delay: float):
+        """
+        :param callback: async function to refresh the given set of keys
+        :param delay: seconds to wait for further keys before running the refresh
+        """
+        self._callback = callback
+        self._delay = delay
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> Set[str]:
+        return set(self._dirty)
+
+    def mark_dirty(self, key: str):
+        """
+        Marks a key for the next refresh, scheduling one if none is pending
+        :param key: the key to refresh
+        """
+        self._dirty.add(key)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self):
+        """
+        Waits for the pending refresh (if any) to finish
+        """
+        while self._task is not None and not self._task.done():
+            await self._task
+
+    async def _run(self):
+        await asyncio.sleep(self._delay)
+        keys, self._dirty = self._dirty, set()
+        try:
+            await self._callback(keys)
+        except Exception as ex:
+            LOGGER.exception(ex)
+
+        if len(self._dirty) > 0:
+            # keys marked while the refresh was running
+            self._task = asyncio.create_task(self._run())
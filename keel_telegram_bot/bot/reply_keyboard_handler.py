@@ -1,31 +1,113 @@
 import logging
-from typing import List, Any, Optional, Callable, Dict
+import time
+from collections import OrderedDict
+from typing import List, Any, Optional, Callable, Dict, Hashable
 
 from telegram import Update, ReplyKeyboardRemove, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import CallbackContext
 
-from keel_telegram_bot.const import CANCEL_KEYBOARD_COMMAND
+from keel_telegram_bot.const import CANCEL_KEYBOARD_COMMAND, REPLY_KEYBOARD_MAX_PENDING, REPLY_KEYBOARD_TIMEOUT
+from keel_telegram_bot.stats import AWAITING_RESPONSE_GAUGE
 from keel_telegram_bot.util import send_message, fuzzy_match
 
 LOGGER = logging.getLogger(__name__)
 
 
+class ExpiringStore:
+    """
+    Size bounded mapping, which evicts entries that have not been accessed for a while.
+    When the maximum size is exceeded, the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        """
+        :param max_size: maximum number of entries
+        :param ttl: seconds after which an entry that has not been accessed is evicted
+        :param clock: monotonic time source
+        """
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        # key -> (last access time, value), ordered by last access
+        self._entries: OrderedDict[Hashable, tuple] = OrderedDict()
+
+    def __len__(self) -> int:
+        self.evict_expired()
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        self.evict_expired()
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        :param key: the key
+        :return: the value of the given key, None if it doesn't exist (anymore)
+        """
+        self.evict_expired()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries[key] = (self._clock(), entry[1])
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Stores a value, evicting the least recently used entries if necessary
+        :param key: the key
+        :param value: the value
+        """
+        self.evict_expired()
+        self._entries[key] = (self._clock(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """
+        Removes a key
+        :param key: the key
+        :return: the removed value, None if it didn't exist
+        """
+        entry = self._entries.pop(key, None)
+        return None if entry is None else entry[1]
+
+    def evict_expired(self):
+        """
+        Removes all entries that have not been accessed within the ttl
+        """
+        oldest_allowed = self._clock() - self._ttl
+        while len(self._entries) > 0:
+            key, (accessed_at, _) = next(iter(self._entries.items()))
+            if accessed_at >= oldest_allowed:
+                break
+            LOGGER.debug("Evicting expired entry for {}".format(key))
+            self._entries.popitem(last=False)
+
+
 class ReplyKeyboardHandler:
-    # this map is used to remember from which users we
-    # are currently awaiting a response message
-    awaiting_response = {}
 
-    def __init__(self):
-        pass
+    def __init__(self, max_pending: int = REPLY_KEYBOARD_MAX_PENDING, timeout: float = REPLY_KEYBOARD_TIMEOUT,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param max_pending: maximum number of users we await a response from at the same time
+        :param timeout: seconds after which an unanswered selection is dropped
+        :param clock: monotonic time source
+        """
+        # this map is used to remember from which users we
+        # are currently awaiting a response message
+        self.awaiting_response = ExpiringStore(max_size=max_pending, ttl=timeout, clock=clock)
 
     async def on_message(self, update: Update, context: CallbackContext):
         user_id = update.effective_user.id
         text = update.effective_message.text
 
-        if user_id not in self.awaiting_response:
+        data = self.awaiting_response.get(user_id)
+        self._update_gauge()
+        if data is None:
             return
 
-        data = self.awaiting_response[user_id]
         if text not in data["valid_responses"]:
             return
 
@@ -33,6 +115,7 @@ class ReplyKeyboardHandler:
         try:
             await data["callback"](update, context, text, data["callback_data"])
             self.awaiting_response.pop(user_id)
+            self._update_gauge()
         except Exception as e:
             LOGGER.exception(e)
 
@@ -84,7 +167,8 @@ class ReplyKeyboardHandler:
             options=keyboard_texts,
             callback=self._on_user_selection,
             callback_data={
-                "choices": choices,
+                # only the offered candidates can be selected, no need to keep all choices
+                "choices": list(map(lambda x: x[0], fuzzy_matches)),
                 "key": key,
                 "callback": callback,
                 "callback_data": callback_data,
@@ -99,16 +183,16 @@ class ReplyKeyboardHandler:
         :param callback: function to call with callback data
         :param callback_data: data to pass to callback
         """
-        if user_id in self.awaiting_response:
+        if self.awaiting_response.pop(user_id) is not None:
             LOGGER.warning(
                 "Already awaiting response to a previous query from user {}, clearing old request.".format(user_id))
-            self.awaiting_response.pop(user_id)
 
-        self.awaiting_response[user_id] = {
+        self.awaiting_response.put(user_id, {
             "valid_responses": options,
             "callback": callback,
             "callback_data": callback_data
-        }
+        })
+        self._update_gauge()
 
     async def cancel_keyboard_callback(self, update: Update, context: CallbackContext):
         bot = context.bot
@@ -119,8 +203,11 @@ class ReplyKeyboardHandler:
         text = "Cancelled"
         await send_message(bot, chat_id, text, reply_to=message_id, menu=ReplyKeyboardRemove(selective=True))
 
-        if user_id in self.awaiting_response:
-            self.awaiting_response.pop(user_id)
+        self.awaiting_response.pop(user_id)
+        self._update_gauge()
+
+    def _update_gauge(self):
+        AWAITING_RESPONSE_GAUGE.set(len(self.awaiting_response))
 
     @staticmethod
     def build_reply_keyboard(items: List[str]) -> ReplyKeyboardMarkup:
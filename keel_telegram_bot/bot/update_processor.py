@@ -0,0 +1,108 @@
+import asyncio
+from typing import Awaitable, Any, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from keel_telegram_bot.stats import UPDATE_QUEUE_DEPTH_GAUGE
+
+
+def get_serialization_key(update: object) -> Optional[str]:
+    """
+    Determines the key of the conversation an update belongs to
+    :param update: the update to process
+    :return: the chat (or user, if there is no chat) the update belongs to, None if it can be processed in any order
+    """
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return f"chat:{update.effective_chat.id}"
+    if update.effective_user is not None:
+        return f"user:{update.effective_user.id}"
+    return None
+
+
+def get_routing_key(update: Update) -> Optional[str]:
+    """
+    Determines which replica is responsible for an update, when running multiple replicas
+    :param update: the update to process
+    :return: id of the chat (or user, if there is no chat) the update belongs to, None if any replica can process it
+    """
+    if update.effective_chat is not None:
+        return str(update.effective_chat.id)
+    if update.effective_user is not None:
+        return str(update.effective_user.id)
+    return None
+
+
+class _KeyState:
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # number of updates that are either waiting for or holding the lock
+        self.depth = 0
+
+
+class SerializingUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates of different chats concurrently, while updates of the same chat
+    are processed one after another, in the order they were received.
+    """
+
+    def __init__(self, max_concurrent_updates: int, max_pending_updates: int):
+        """
+        :param max_concurrent_updates: maximum number of updates that are processed at the same time
+        :param max_pending_updates: maximum number of updates that are processed or waiting for their
+                                    predecessor of the same chat
+        """
+        # the semaphore of the base class is acquired before an update waits for its chat,
+        # so it has to account for waiting updates too, otherwise a single busy chat could
+        # use up all slots and block every other chat
+        super().__init__(max(max_pending_updates, max_concurrent_updates))
+        self._concurrency = max_concurrent_updates
+        self._processing = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._keys: Dict[str, _KeyState] = {}
+
+    @property
+    def concurrency(self) -> int:
+        """
+        :return: maximum number of updates that are processed at the same time
+        """
+        return self._concurrency
+
+    def queue_depth(self, key: str) -> int:
+        """
+        :param key: serialization key
+        :return: number of updates of this key, which are processed or waiting to be processed
+        """
+        state = self._keys.get(key)
+        return state.depth if state is not None else 0
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = get_serialization_key(update)
+        if key is None:
+            async with self._processing:
+                await coroutine
+            return
+
+        state = self._keys.setdefault(key, _KeyState())
+        state.depth += 1
+        UPDATE_QUEUE_DEPTH_GAUGE.labels(key=key).set(state.depth)
+        try:
+            # asyncio.Lock wakes up waiters in FIFO order, which keeps the order of the updates
+            async with state.lock:
+                async with self._processing:
+                    await coroutine
+        finally:
+            state.depth -= 1
+            if state.depth <= 0:
+                del self._keys[key]
+                UPDATE_QUEUE_DEPTH_GAUGE.remove(key)
+            else:
+                UPDATE_QUEUE_DEPTH_GAUGE.labels(key=key).set(state.depth)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
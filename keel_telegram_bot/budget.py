@@ -0,0 +1,122 @@
+import asyncio
+import time
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional, Callable, Tuple, Dict
+
+_CURRENT_BUDGET: ContextVar[Optional["Budget"]] = ContextVar("budget", default=None)
+
+
+class BudgetExceededError(Exception):
+    """
+    Raised when an operation cannot be completed within the latency budget of its caller
+    """
+
+    def __init__(self, name: str):
+        super().__init__(f"Latency budget of '{name}' exceeded")
+        self.name = name
+
+
+class Budget:
+    """
+    An overall latency budget, shared by all downstream calls of an operation
+    """
+
+    def __init__(self, name: str, seconds: float, clock: Callable[[], float] = time.monotonic):
+        """
+        :param name: name of the operation, f.ex. the command
+        :param seconds: the total budget in seconds
+        :param clock: time source
+        """
+        self.name = name
+        self._clock = clock
+        self._deadline = clock() + seconds
+
+    def remaining(self) -> float:
+        """
+        :return: remaining seconds (may be negative)
+        """
+        return self._deadline - self._clock()
+
+    def check(self) -> float:
+        """
+        :return: remaining seconds
+        :raises BudgetExceededError: if the budget is used up
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise BudgetExceededError(self.name)
+        return remaining
+
+
+@contextmanager
+def budget(name: str, seconds: float):
+    """
+    Applies a latency budget to everything executed within this context
+    :param name: name of the operation
+    :param seconds: the total budget in seconds
+    """
+    token = _CURRENT_BUDGET.set(Budget(name, seconds))
+    try:
+        yield
+    finally:
+        _CURRENT_BUDGET.reset(token)
+
+
+@asynccontextmanager
+async def bounded_budget(name: str, seconds: float):
+    """
+    Like budget(), but also cancels the awaited operation once the budget is used up,
+    so calls that don't take a timeout (f.ex. worker threads) can't exceed it either
+    :param name: name of the operation
+    :param seconds: the total budget in seconds
+    :raises BudgetExceededError: if the operation was cancelled, because the budget is used up
+    """
+    with budget(name, seconds):
+        timeout = asyncio.timeout(seconds)
+        try:
+            async with timeout:
+                yield
+        except TimeoutError:
+            if timeout.expired():
+                raise BudgetExceededError(name) from None
+            raise
+
+
+def current_budget() -> Optional[Budget]:
+    """
+    :return: the budget of the current context, None if there is none
+    """
+    return _CURRENT_BUDGET.get()
+
+
+def limit_timeout(timeout: Tuple[float, float]) -> Tuple[float, float]:
+    """
+    Shrinks a (connect, read) timeout tuple to the remaining budget of the current context
+    :param timeout: the default timeout
+    :return: the timeout to use
+    :raises BudgetExceededError: if the budget is used up
+    """
+    current = current_budget()
+    if current is None:
+        return timeout
+    remaining = current.check()
+    return min(timeout[0], remaining), min(timeout[1], remaining)
+
+
+def telegram_timeouts() -> Dict[str, float]:
+    """
+    Creates timeout arguments for telegram bot api calls, based on the remaining budget of the current context
+    :return: keyword arguments, empty if there is no budget
+    :raises BudgetExceededError: if the budget is used up
+    """
+    current = current_budget()
+    if current is None:
+        return {}
+    remaining = current.check()
+    return {
+        "connect_timeout": remaining,
+        "read_timeout": remaining,
+        "write_timeout": remaining,
+        "pool_timeout": remaining,
+    }
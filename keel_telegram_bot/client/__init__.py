@@ -1,8 +1,60 @@
+import functools
+import re
+import sys
 from datetime import datetime, timedelta
+from typing import Optional, Dict, Iterable, Tuple, Callable, Any
 
 DATE_FORMAT = '%Y-%m-%d'
 
 
+def intern_str(value: Optional[str]) -> Optional[str]:
+    """
+    Interns a string value, so that equal values returned by the API share a single instance
+    :param value: the string to intern (may be None)
+    :return: the interned string
+    """
+    if value is None:
+        return None
+    return sys.intern(value)
+
+
+def intern_tuple(values: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Converts an iterable of strings to a tuple of interned strings
+    :param values: strings to intern
+    :return: tuple of interned strings
+    """
+    return tuple(map(intern_str, values))
+
+
+def intern_dict(data: Dict[str, str]) -> Dict[str, str]:
+    """
+    Interns all keys and string values of a dictionary
+    :param data: the dictionary to intern
+    :return: a new dictionary holding interned keys and values
+    """
+    return {
+        sys.intern(key): intern_str(value) if isinstance(value, str) else value
+        for key, value in data.items()
+    }
+
+
+def decode_lazy(instance: Any, cache_attribute: str, decoder: Callable[[Any], Any], raw_value: Any) -> Any:
+    """
+    Decodes a raw field value on first access and caches the result on the given (frozen) instance
+    :param instance: the model instance holding the cache attribute
+    :param cache_attribute: name of the attribute used to cache the decoded value
+    :param decoder: function to decode the raw value
+    :param raw_value: the raw value, as returned by the API
+    :return: the decoded value
+    """
+    value = getattr(instance, cache_attribute)
+    if value is None and raw_value is not None:
+        value = decoder(raw_value)
+        object.__setattr__(instance, cache_attribute, value)
+    return value
+
+
 def parse_api_datetime(formatted_datetime: str) -> datetime.date:
     """
     Parse a datetime from the API
@@ -17,39 +69,38 @@ def parse_api_date(formatted_date: str) -> datetime.date:
     return datetime.strptime(formatted_date, DATE_FORMAT).date()
 
 
+# Define time unit mappings to seconds for timedelta creation
+GOLANG_DURATION_UNITS = {
+    "ns": 1e-9,  # nanoseconds to seconds
+    "us": 1e-6,  # microseconds to seconds
+    "µs": 1e-6,  # microseconds to seconds (alternative µ symbol)
+    "ms": 1e-3,  # milliseconds to seconds
+    "s": 1,  # seconds
+    "m": 60,  # minutes to seconds
+    "h": 3600  # hours to seconds
+}
+
+# Regular expression to match the pattern (number + unit)
+GOLANG_DURATION_PATTERN = re.compile(r'(\d+\.?\d*)([a-zµ]+)')
+
+
+@functools.lru_cache(maxsize=128)
 def parse_golang_duration(value: str) -> timedelta:
     """
     Parses the golang specification for a duration.
+    Results are cached, since there usually are only a handful of distinct values.
     """
-    from datetime import timedelta
-    import re
-
-    # Define time unit mappings to seconds for timedelta creation
-    time_units = {
-        "ns": 1e-9,  # nanoseconds to seconds
-        "us": 1e-6,  # microseconds to seconds
-        "µs": 1e-6,  # microseconds to seconds (alternative µ symbol)
-        "ms": 1e-3,  # milliseconds to seconds
-        "s": 1,  # seconds
-        "m": 60,  # minutes to seconds
-        "h": 3600  # hours to seconds
-    }
-
-    def _parse_golang_duration(value: str) -> timedelta:
-        total_seconds = 0.0
-        sign = -1 if value.startswith('-') else 1
-
-        # Remove the sign if present
-        if value[0] in '+-':
-            value = value[1:]
+    total_seconds = 0.0
+    sign = -1 if value.startswith('-') else 1
 
-        # Regular expression to match the pattern (number + unit)
-        for number, unit in re.findall(r'(\d+\.?\d*)([a-zµ]+)', value):
-            total_seconds += float(number) * time_units[unit]
+    # Remove the sign if present
+    if value[0] in '+-':
+        value = value[1:]
 
-        return timedelta(seconds=sign * total_seconds)
+    for number, unit in GOLANG_DURATION_PATTERN.findall(value):
+        total_seconds += float(number) * GOLANG_DURATION_UNITS[unit]
 
-    return _parse_golang_duration(value)
+    return timedelta(seconds=sign * total_seconds)
 
 
 def timedelta_to_golang_duration(td: timedelta) -> str:
@@ -1,25 +1,35 @@
 import enum
+import hashlib
 import logging
+import time
 from collections import namedtuple
-from typing import List, Optional
+from urllib.parse import urlparse
+from typing import List, Optional, Callable, Dict, Tuple, Any, Iterator
 
 import requests
 from requests.auth import HTTPBasicAuth
+from urllib3.util.request import ACCEPT_ENCODING
 
+from keel_telegram_bot.budget import limit_timeout, current_budget, BudgetExceededError
 from keel_telegram_bot.client.approval import Approval
 from keel_telegram_bot.client.daily_stats import DailyStats
+from keel_telegram_bot.client.resilience import CircuitBreaker, KeelUnavailableError, backoff_delays
 from keel_telegram_bot.client.resource import Resource
+from keel_telegram_bot.client.stream import iter_json_array
 from keel_telegram_bot.client.tracked_image import TrackedImage
 from keel_telegram_bot.client.types import Action, Provider, Trigger, Policy, PollSchedule
-from keel_telegram_bot.const import REQUESTS_TIMEOUT
+from keel_telegram_bot.const import REQUESTS_TIMEOUT, REQUESTS_RETRIES, REQUESTS_RETRY_BACKOFF, \
+    REQUESTS_RETRY_BACKOFF_MAX, CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RESET_TIMEOUT, STREAM_CHUNK_SIZE
+from keel_telegram_bot.stats import KEEL_CIRCUIT_BREAKER_STATE, KEEL_UNCHANGED_PAYLOAD_COUNTER, \
+    KEEL_RESPONSE_WIRE_BYTES_COUNTER, KEEL_RESPONSE_DECODED_BYTES_COUNTER
 
 LOGGER = logging.getLogger(__name__)
 
 
-class HttpMethod(namedtuple('HttpMethod', 'name method'), enum.Enum):
-    GET = "get", requests.get
-    POST = "post", requests.post
-    PUT = "put", requests.put
+class HttpMethod(namedtuple('HttpMethod', 'name method idempotent'), enum.Enum):
+    GET = "get", requests.get, True
+    POST = "post", requests.post, False
+    PUT = "put", requests.put, False
 
 
 class KeelApiClient:
@@ -32,16 +42,30 @@ class KeelApiClient:
         self._port = port
         self._ssl = ssl
         self._auth = HTTPBasicAuth(user, password)
+        # gzip and deflate, as well as brotli and zstd if their decoders are installed
+        self._headers = {"Accept-Encoding": ACCEPT_ENCODING}
 
         self._base_url = f"{'https' if ssl else 'http'}://{host}:{port}"
 
+        self._circuit_breaker = CircuitBreaker(
+            failure_threshold=CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=CIRCUIT_BREAKER_RESET_TIMEOUT,
+            on_state_change=lambda state: KEEL_CIRCUIT_BREAKER_STATE.set(state.value),
+        )
+        # fingerprint of the raw response body and the decoded items, by url
+        self._snapshots: Dict[str, Tuple[bytes, List[Any]]] = {}
+
     def get_resources(self) -> List[Resource]:
         """
         Returns a list of all resources
         """
-        response = self._do_request(HttpMethod.GET, self._base_url + "/v1/resources")
-        result = [Resource.from_dict(resource) for resource in response]
-        return result
+        return self._get_snapshot("/v1/resources", Resource.from_dict)
+
+    def iter_resources(self) -> Iterator[Resource]:
+        """
+        Streams all resources, decoding them one at a time while the response is received
+        """
+        return self._iter_items("/v1/resources", Resource.from_dict)
 
     def get_resource(self, identifier: str) -> Optional[Resource]:
         """
@@ -57,9 +81,13 @@ class KeelApiClient:
         """
         Returns a list of all tracked images
         """
-        response = self._do_request(HttpMethod.GET, self._base_url + "/v1/tracked")
-        result = [TrackedImage.from_dict(tracked) for tracked in response]
-        return result
+        return self._get_snapshot("/v1/tracked", TrackedImage.from_dict)
+
+    def iter_tracked_images(self) -> Iterator[TrackedImage]:
+        """
+        Streams all tracked images, decoding them one at a time while the response is received
+        """
+        return self._iter_items("/v1/tracked", TrackedImage.from_dict)
 
     def get_tracked_image(self, namespace: str, image: str) -> Optional[TrackedImage]:
         """
@@ -144,8 +172,7 @@ class KeelApiClient:
         :param archived: True for archived, False for not archived, None for all
         :return: a list of all approvals matching criteria
         """
-        response = self._do_request(HttpMethod.GET, self._base_url + "/v1/approvals")
-        result = [Approval.from_dict(approval) for approval in response]
+        result = self._get_snapshot("/v1/approvals", Approval.from_dict)
 
         if rejected is not None:
             result = list(filter(lambda x: x.rejected == rejected, result))
@@ -154,6 +181,12 @@ class KeelApiClient:
 
         return result
 
+    def iter_approvals(self) -> Iterator[Approval]:
+        """
+        Streams all approvals, decoding them one at a time while the response is received
+        """
+        return self._iter_items("/v1/approvals", Approval.from_dict)
+
     def approve(self, id: str, identifier: str, voter: str) -> None:
         """
         Approve a pending approval
@@ -203,6 +236,53 @@ class KeelApiClient:
         result = self._do_request(HttpMethod.GET, self._base_url + "/v1/stats")
         return DailyStats.from_dict(result)
 
+    def _get_snapshot(self, path: str, factory: Callable[[dict], Any]) -> List[Any]:
+        """
+        Fetches a list of items. If the response body is byte-identical to the previous one,
+        the previously decoded items are returned instead of decoding them again.
+        The returned list is shared between calls and must not be modified.
+        :param path: api path
+        :param factory: function to create an item from its json representation
+        :return: list of items
+        """
+        url = self._base_url + path
+        response = self._send_request(HttpMethod.GET, url)
+        self._record_transfer(response, len(response.content))
+        fingerprint = hashlib.blake2b(response.content, digest_size=16).digest()
+
+        snapshot = self._snapshots.get(url)
+        if snapshot is not None and snapshot[0] == fingerprint:
+            KEEL_UNCHANGED_PAYLOAD_COUNTER.labels(endpoint=path).inc()
+            return snapshot[1]
+
+        items = [factory(item) for item in self._parse_response(response) or []]
+        self._snapshots[url] = (fingerprint, items)
+        return items
+
+    def _iter_items(self, path: str, factory: Callable[[dict], Any]) -> Iterator[Any]:
+        """
+        Streams a list of items, so only the items kept by the caller stay in memory.
+        The request is sent on first iteration, close the iterator to abort reading the response.
+        :param path: api path
+        :param factory: function to create an item from its json representation
+        :return: iterator over the items
+        """
+        response = self._send_request(HttpMethod.GET, self._base_url + path, stream=True)
+        decoded_bytes = 0
+
+        def chunks():
+            nonlocal decoded_bytes
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                decoded_bytes += len(chunk)
+                yield chunk
+
+        try:
+            for item in iter_json_array(chunks()):
+                yield factory(item)
+        finally:
+            self._record_transfer(response, decoded_bytes)
+            response.close()
+
     def _do_request(
         self,
         method: HttpMethod = HttpMethod.GET,
@@ -219,19 +299,98 @@ class KeelApiClient:
         :param json: request body
         :return: the response parsed as a json
         """
-        headers = []
-        url = self._create_request_url(url, params)
+        response = self._send_request(method, url, params, json)
+        self._record_transfer(response, len(response.content))
+        return self._parse_response(response)
 
-        response = method.method(url, headers=headers, auth=self._auth, json=json, timeout=REQUESTS_TIMEOUT)
+    @staticmethod
+    def _record_transfer(response: requests.Response, decoded_bytes: int):
+        """
+        Records the size of a response body on the wire (possibly compressed) and after decoding
+        :param response: the response, after (partially) reading its body
+        :param decoded_bytes: number of body bytes read after decoding
+        """
+        endpoint = urlparse(response.url).path
+        wire_bytes = response.raw.tell() if response.raw is not None else decoded_bytes
+        KEEL_RESPONSE_WIRE_BYTES_COUNTER.labels(endpoint=endpoint).inc(wire_bytes)
+        KEEL_RESPONSE_DECODED_BYTES_COUNTER.labels(endpoint=endpoint).inc(decoded_bytes)
 
-        if response.status_code >= 400:
-            LOGGER.debug("Request to %s returned status code %s: %s", url, response.status_code, response.text)
-        response.raise_for_status()
+    @staticmethod
+    def _parse_response(response: requests.Response) -> Optional[list | dict]:
+        """
+        :param response: a successful response
+        :return: the response body parsed as a json
+        """
         # some responses do not return data so we just ignore the body in that case
         if len(response.content) > 0 and response.content != b"null":
             return response.json()
         return None
 
+    def _send_request(
+        self,
+        method: HttpMethod = HttpMethod.GET,
+        url: str = "/",
+        params: dict = None,
+        json: dict = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """
+        Executes an http request based on the given parameters, retrying idempotent requests on failure
+
+        :param method: the method to use (GET, PUT, POST)
+        :param url: the url to use
+        :param params: query parameters that will be appended to the url
+        :param json: request body
+        :param stream: whether to defer downloading the response body until it is accessed
+        :return: the successful response
+        """
+        url = self._create_request_url(url, params)
+
+        # only idempotent requests are retried
+        retries = REQUESTS_RETRIES if method.idempotent else 0
+        delays = backoff_delays(retries, REQUESTS_RETRY_BACKOFF, REQUESTS_RETRY_BACKOFF_MAX)
+        while True:
+            timeout = limit_timeout(REQUESTS_TIMEOUT)
+            self._circuit_breaker.before_request()
+            try:
+                response = method.method(url, headers=self._headers, auth=self._auth, json=json, timeout=timeout,
+                                         stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                if isinstance(ex, requests.Timeout) and timeout != REQUESTS_TIMEOUT:
+                    # cut short by the budget of the caller, which says nothing about the health of keel
+                    self._circuit_breaker.on_cancel()
+                    raise BudgetExceededError(current_budget().name) from ex
+                self._circuit_breaker.on_failure()
+                delay = next(delays, None)
+                if delay is None:
+                    raise KeelUnavailableError(f"Keel is currently unavailable: {ex}") from ex
+            except BaseException:
+                # f.ex. an invalid request, which says nothing about the health of keel,
+                # but must not keep the half-open circuit waiting for the result of its probe forever
+                self._circuit_breaker.on_cancel()
+                raise
+            else:
+                if response.status_code < 500:
+                    self._circuit_breaker.on_success()
+                    break
+                self._circuit_breaker.on_failure()
+                delay = next(delays, None)
+                if delay is None:
+                    break
+                response.close()
+
+            budget = current_budget()
+            if budget is not None and budget.remaining() <= delay:
+                raise BudgetExceededError(budget.name)
+
+            LOGGER.debug(f"Request to {url} failed, retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+        if response.status_code >= 400:
+            LOGGER.debug("Request to %s returned status code %s: %s", url, response.status_code, response.text)
+        response.raise_for_status()
+        return response
+
     @staticmethod
     def _create_request_url(url: str, params: dict = None):
         """
@@ -1,15 +1,17 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from datetime import datetime
-from typing import List
+from typing import Tuple, Optional
 
-from keel_telegram_bot.client import parse_api_datetime
+from keel_telegram_bot.client import parse_api_datetime, intern_str, intern_tuple, decode_lazy
 from keel_telegram_bot.client.types import Provider
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Approval:
     """
     Approval data class
+
+    Date fields are kept in their raw API representation and only parsed on first access.
     """
     id: str
     archived: bool
@@ -22,11 +24,52 @@ class Approval:
     digest: str
     votesRequired: int
     votesReceived: int
-    voters: List[str]
+    voters: Tuple[str, ...]
     rejected: bool
-    deadline: datetime.date
-    createdAt: datetime.date
-    updatedAt: datetime.date
+    rawDeadline: str = field(repr=False)
+    rawCreatedAt: str = field(repr=False)
+    rawUpdatedAt: str = field(repr=False)
+
+    _deadline: Optional[datetime] = field(default=None, init=False, repr=False, compare=False)
+    _createdAt: Optional[datetime] = field(default=None, init=False, repr=False, compare=False)
+    _updatedAt: Optional[datetime] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def deadline(self) -> datetime.date:
+        return decode_lazy(self, "_deadline", parse_api_datetime, self.rawDeadline)
+
+    @property
+    def createdAt(self) -> datetime.date:
+        return decode_lazy(self, "_createdAt", parse_api_datetime, self.rawCreatedAt)
+
+    @property
+    def updatedAt(self) -> datetime.date:
+        return decode_lazy(self, "_updatedAt", parse_api_datetime, self.rawUpdatedAt)
+
+    def with_vote(self, voter: str) -> "Approval":
+        """
+        Applies the known effect of an approval vote locally, without asking keel
+        :param voter: name of the voter
+        :return: updated copy of this approval
+        """
+        if voter in self.voters:
+            return self
+        votes_received = self.votesReceived + 1
+        return replace(
+            self,
+            votesReceived=votes_received,
+            voters=self.voters + (voter,),
+            archived=self.archived or votes_received >= self.votesRequired,
+        )
+
+    def with_rejection(self, voter: str) -> "Approval":
+        """
+        Applies the known effect of a rejection locally, without asking keel
+        :param voter: name of the voter
+        :return: updated copy of this approval
+        """
+        voters = self.voters if voter in self.voters else self.voters + (voter,)
+        return replace(self, voters=voters, rejected=True)
 
     @staticmethod
     def from_dict(data: dict):
@@ -35,16 +78,16 @@ class Approval:
             archived=data["archived"],
             provider=Provider(data["provider"]),
             identifier=data["identifier"],
-            event=data["event"],
+            event=intern_str(data["event"]),
             message=data["message"],
-            currentVersion=data["currentVersion"],
-            newVersion=data["newVersion"],
+            currentVersion=intern_str(data["currentVersion"]),
+            newVersion=intern_str(data["newVersion"]),
             digest=data["digest"],
             votesRequired=data["votesRequired"],
             votesReceived=data["votesReceived"],
-            voters=data["voters"],
+            voters=intern_tuple(data["voters"] or ()),
             rejected=data["rejected"],
-            deadline=parse_api_datetime(data["deadline"]),
-            createdAt=parse_api_datetime(data["createdAt"]),
-            updatedAt=parse_api_datetime(data["updatedAt"]),
+            rawDeadline=data["deadline"],
+            rawCreatedAt=data["createdAt"],
+            rawUpdatedAt=data["updatedAt"],
         )
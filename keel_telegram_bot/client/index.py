@@ -0,0 +1,69 @@
+from typing import List, Dict, Callable, Iterable, Any, Optional
+
+
+class SnapshotIndex:
+    """
+    Secondary indexes over a snapshot of items, which allow to look up items by exact key values
+    instead of scanning the whole snapshot.
+    """
+
+    def __init__(self, items: List[Any], keys: Dict[str, Callable[[Any], Iterable[str]]]):
+        """
+        :param items: the snapshot to index, must not be modified afterwards
+        :param keys: functions returning the index values of an item, by index name
+        """
+        self.items = items
+        self._indexes: Dict[str, Dict[str, List[int]]] = {name: {} for name in keys}
+        for position, item in enumerate(items):
+            for name, key in keys.items():
+                index = self._indexes[name]
+                for value in set(key(item)):
+                    index.setdefault(value, []).append(position)
+
+    def lookup(self, **criteria: Optional[str]) -> List[Any]:
+        """
+        Returns all items matching all of the given criteria, criteria with a None value are ignored
+        :param criteria: index name -> value
+        :return: matching items, in the order of the snapshot
+        """
+        positions = None
+        for name, value in criteria.items():
+            if value is None:
+                continue
+            matches = self._indexes[name].get(value, ())
+            positions = set(matches) if positions is None else positions.intersection(matches)
+
+        if positions is None:
+            return self.items
+        return [self.items[position] for position in sorted(positions)]
+
+
+class SnapshotIndexCache:
+    """
+    Holds the index of the most recent snapshot, so it is only built once per snapshot
+    """
+
+    def __init__(self, keys: Dict[str, Callable[[Any], Iterable[str]]]):
+        """
+        :param keys: functions returning the index values of an item, by index name
+        """
+        self._keys = keys
+        self._index: Optional[SnapshotIndex] = None
+
+    @property
+    def current(self) -> Optional[SnapshotIndex]:
+        """
+        :return: the index of the most recent snapshot, None if none was indexed yet
+        """
+        return self._index
+
+    def get(self, items: List[Any]) -> SnapshotIndex:
+        """
+        :param items: the current snapshot
+        :return: the index of the given snapshot
+        """
+        index = self._index
+        if index is None or index.items is not items:
+            index = SnapshotIndex(items, self._keys)
+            self._index = index
+        return index
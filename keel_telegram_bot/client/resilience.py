@@ -0,0 +1,127 @@
+import enum
+import logging
+import random
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+
+class KeelUnavailableError(Exception):
+    """
+    Raised when Keel cannot be reached, or requests are rejected because the circuit breaker is open
+    """
+
+    def __init__(self, message: str = "Keel is currently unavailable"):
+        super().__init__(message)
+
+
+class CircuitState(enum.Enum):
+    """
+    Enum for circuit breaker states, the value is exported as a metric
+    """
+    Closed = 0
+    HalfOpen = 1
+    Open = 2
+
+    def __str__(self):
+        return self.name
+
+
+class CircuitBreaker:
+    """
+    Rejects requests right away after a number of consecutive failures.
+    After the reset timeout, a single probe request is let through (half-open),
+    which either closes the circuit again, or keeps it open for another timeout.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float,
+                 on_state_change: Callable[[CircuitState], None] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param failure_threshold: number of consecutive failures that open the circuit
+        :param reset_timeout: seconds to wait before probing an open circuit
+        :param on_state_change: called with the new state whenever the state changes
+        :param clock: time source
+        """
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._on_state_change = on_state_change
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._state = CircuitState.Closed
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def before_request(self):
+        """
+        Must be called before each request
+        :raises KeelUnavailableError: if the request must not be executed
+        """
+        with self._lock:
+            if self._state == CircuitState.Open:
+                if self._clock() - self._opened_at < self._reset_timeout:
+                    raise KeelUnavailableError()
+                self._set_state(CircuitState.HalfOpen)
+
+            if self._state == CircuitState.HalfOpen:
+                if self._probe_in_flight:
+                    raise KeelUnavailableError()
+                self._probe_in_flight = True
+
+    def on_success(self):
+        """
+        Must be called when a request succeeded
+        """
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self._set_state(CircuitState.Closed)
+
+    def on_failure(self):
+        """
+        Must be called when a request failed because Keel is unavailable
+        """
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == CircuitState.HalfOpen or self._failures >= self._failure_threshold:
+                self._opened_at = self._clock()
+                self._set_state(CircuitState.Open)
+
+    def on_cancel(self):
+        """
+        Must be called when a request was aborted for reasons unrelated to the availability of Keel
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _set_state(self, state: CircuitState):
+        if self._state == state:
+            return
+        LOGGER.info(f"Circuit breaker state changed: {self._state} -> {state}")
+        self._state = state
+        if self._on_state_change is not None:
+            self._on_state_change(state)
+
+
+def backoff_delays(retries: int, base: float, maximum: float,
+                   rand: Optional[Callable[[], float]] = None) -> Iterator[float]:
+    """
+    Yields jittered ("full jitter") exponential backoff delays
+    :param retries: number of delays to yield
+    :param base: delay of the first retry (before jitter)
+    :param maximum: upper bound for a single delay
+    :param rand: random number generator in [0, 1)
+    :return: delays in seconds
+    """
+    rand = rand if rand is not None else random.random
+    for attempt in range(retries):
+        yield rand() * min(maximum, base * (2 ** attempt))
@@ -1,26 +1,41 @@
-from typing import List, Dict
+from typing import Tuple, Dict, Optional
 
+import attr
 from attr import dataclass
 
+from keel_telegram_bot.client import intern_str, intern_tuple, intern_dict, decode_lazy
 from keel_telegram_bot.client.k8s_status import K8SStatus
 from keel_telegram_bot.client.types import Provider, Policy
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Resource:
     """
     Resource data class
+
+    The policy and status are kept in their raw API representation and only decoded on first access.
     """
     provider: Provider
     identifier: str
     name: str
     namespace: str
     kind: str
-    policy: Policy
-    images: List[str]
+    raw_policy: str = attr.ib(repr=False)
+    images: Tuple[str, ...]
     labels: Dict[str, str]
     annotations: Dict[str, str]
-    status: K8SStatus
+    raw_status: dict = attr.ib(repr=False)
+
+    _policy: Optional[Policy] = attr.ib(default=None, init=False, repr=False, eq=False)
+    _status: Optional[K8SStatus] = attr.ib(default=None, init=False, repr=False, eq=False)
+
+    @property
+    def policy(self) -> Policy:
+        return decode_lazy(self, "_policy", Policy.from_value, self.raw_policy)
+
+    @property
+    def status(self) -> K8SStatus:
+        return decode_lazy(self, "_status", K8SStatus.from_dict, self.raw_status)
 
     @staticmethod
     def from_dict(data: dict):
@@ -28,11 +43,11 @@ class Resource:
             provider=Provider.from_value(data["provider"]),
             identifier=data["identifier"],
             name=data["name"],
-            namespace=data["namespace"],
-            kind=data["kind"],
-            policy=Policy.from_value(data["policy"]),
-            images=data["images"],
-            labels=data["labels"],
-            annotations=data["annotations"],
-            status=K8SStatus.from_dict(data["status"]),
+            namespace=intern_str(data["namespace"]),
+            kind=intern_str(data["kind"]),
+            raw_policy=intern_str(data["policy"]),
+            images=intern_tuple(data["images"]),
+            labels=intern_dict(data["labels"]),
+            annotations=intern_dict(data["annotations"]),
+            raw_status=data["status"],
         )
@@ -0,0 +1,91 @@
+import codecs
+import json
+import re
+from typing import Iterable, Iterator, Any
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Incrementally decodes a JSON array, yielding its elements one at a time.
+    Only the current chunk and the element that is being decoded are held in memory.
+    A "null" document is treated like an empty array.
+    :param chunks: UTF-8 encoded document, split into chunks of arbitrary size
+    :return: iterator over the decoded array elements
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    position = 0
+    eof = False
+    # one of: start, first, value, separator, done
+    expect = "start"
+
+    def read_more() -> bool:
+        nonlocal buffer, position, eof
+        if eof:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            text = text_decoder.decode(b"", final=True)
+        else:
+            text = text_decoder.decode(chunk)
+        buffer = buffer[position:] + text
+        position = 0
+        return True
+
+    while True:
+        position = _WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            if read_more():
+                continue
+            if expect == "done":
+                return
+            raise ValueError("Unexpected end of JSON array")
+
+        if expect == "done":
+            raise ValueError(f"Unexpected data after JSON array at: {buffer[position:position + 20]!r}")
+
+        char = buffer[position]
+        if expect == "start":
+            if char == "[":
+                position += 1
+                expect = "first"
+            elif buffer.startswith("null", position):
+                position += 4
+                expect = "done"
+            elif len(buffer) - position < 4 and "null".startswith(buffer[position:]) and read_more():
+                continue
+            else:
+                raise ValueError(f"Expected a JSON array at: {buffer[position:position + 20]!r}")
+            continue
+
+        if char == "]" and expect in ("first", "separator"):
+            position += 1
+            expect = "done"
+            continue
+
+        if expect == "separator":
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' at: {buffer[position:position + 20]!r}")
+            position += 1
+            expect = "value"
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # the element is not complete yet
+            if read_more():
+                continue
+            raise
+        if end == len(buffer) and read_more():
+            # an element must be followed by "," or "]", it might still continue (f.ex. a number)
+            continue
+
+        position = end
+        expect = "separator"
+        yield item
@@ -1,28 +1,38 @@
+from typing import Optional
+
+import attr
 from attr import dataclass
 
+from keel_telegram_bot.client import intern_str, decode_lazy
 from keel_telegram_bot.client.types import Trigger, Policy, PollSchedule
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TrackedImage:
     image: str
     trigger: Trigger
     poll_schedule: PollSchedule
     provider: str
     namespace: str
-    policy: Policy
+    raw_policy: str = attr.ib(repr=False)
     registry: str
 
+    _policy: Optional[Policy] = attr.ib(default=None, init=False, repr=False, eq=False)
+
+    @property
+    def policy(self) -> Policy:
+        return decode_lazy(self, "_policy", Policy.from_value, self.raw_policy)
+
     @staticmethod
     def from_dict(d: dict):
         return TrackedImage(
             image=d["image"],
             trigger=Trigger.from_value(d["trigger"]),
-            poll_schedule=d["pollSchedule"],
-            provider=d["provider"],
-            namespace=d["namespace"],
-            policy=Policy.from_value(d["policy"]),
-            registry=d["registry"],
+            poll_schedule=intern_str(d["pollSchedule"]),
+            provider=intern_str(d["provider"]),
+            namespace=intern_str(d["namespace"]),
+            raw_policy=intern_str(d["policy"]),
+            registry=intern_str(d["registry"]),
         )
 
     def to_dict(self):
@@ -1,5 +1,6 @@
 import abc
 import enum
+import functools
 import re
 from abc import ABC
 from datetime import timedelta
@@ -17,9 +18,11 @@ class PollSchedule:
         self.interval = interval
 
     @staticmethod
+    @functools.lru_cache(maxsize=128)
     def from_value(value: str):
         """
-        Get the enum from a value
+        Get the enum from a value.
+        Instances are shared between equal values, so they must not be modified.
         :param value: the value to convert
         :return: the enum
         """
@@ -35,6 +38,12 @@ class PollSchedule:
     def __str__(self):
         return f"@every {self.value}"
 
+    def __eq__(self, other):
+        return isinstance(other, PollSchedule) and self.interval == other.interval
+
+    def __hash__(self):
+        return hash(self.interval)
+
 
 class Action(enum.Enum):
     """
@@ -102,9 +111,11 @@ class Trigger(enum.Enum):
 class Policy(ABC):
 
     @staticmethod
+    @functools.lru_cache(maxsize=128)
     def from_value(value: str):
         """
-        Get the enum from a value
+        Get the enum from a value.
+        Instances are shared between equal values, so they must not be modified.
         :param value: the value to convert
         :return: the enum
         """
@@ -121,10 +132,23 @@ class Policy(ABC):
     def value(self):
         return self.__str__()
 
+    @property
+    def type_name(self) -> str:
+        """
+        :return: name of the policy type, without its parameters (f.ex. "glob" for "glob:1.*")
+        """
+        return self.__str__()
+
     @abc.abstractmethod
     def __str__(self):
         raise NotImplementedError()
 
+    def __eq__(self, other):
+        return type(self) is type(other) and str(self) == str(other)
+
+    def __hash__(self):
+        return hash((type(self), str(self)))
+
 
 class NeverPolicy(Policy):
     """
@@ -164,7 +188,7 @@ class SemverPolicy(Policy):
         """
         for policy in SemverPolicyType:
             if policy.value.lower() == value.lower():
-                return policy
+                return SemverPolicy(policy)
         return SemverPolicy(SemverPolicyType.NNone)
 
     def __str__(self):
@@ -179,6 +203,10 @@ class GlobPolicy(Policy):
     def __init__(self, pattern: str):
         self._pattern = pattern
 
+    @property
+    def type_name(self) -> str:
+        return "glob"
+
     def __str__(self):
         return f"glob:{self._pattern}"
 
@@ -191,5 +219,9 @@ class RegexPolicy(Policy):
     def __init__(self, pattern: re.Pattern):
         self._pattern = pattern
 
+    @property
+    def type_name(self) -> str:
+        return "regexp"
+
     def __str__(self):
         return f"regexp:{self._pattern.pattern}"
@@ -0,0 +1,109 @@
+import logging
+import threading
+import time
+from typing import Callable, List
+
+from keel_telegram_bot.cluster.lease import LeaseBackend
+from keel_telegram_bot.monitoring import RegularIntervalWorker
+from keel_telegram_bot.stats import LEADER_GAUGE, LEADER_TRANSITION_COUNTER
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LeaderElector(RegularIntervalWorker):
+    """
+    Competes for a lease with other replicas and keeps renewing it while holding it.
+    If the leader dies, another replica takes over at most
+    lease_duration + renew_interval seconds later.
+    """
+
+    def __init__(self, backend: LeaseBackend, name: str, identity: str, lease_duration: float,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param backend: storage of the lease
+        :param name: name of the lease, shared by all replicas
+        :param identity: unique identity of this replica
+        :param lease_duration: number of seconds a lease is valid without being renewed
+        :param clock: monotonic clock, used to step down if the lease could not be renewed in time
+        """
+        # renew often enough to survive a failed attempt before the lease expires
+        super().__init__(lease_duration / 3)
+        self._backend = backend
+        self._name = name
+        self._identity = identity
+        self._lease_duration = lease_duration
+        self._clock = clock
+        self._valid_until = None
+        # leadership state that was reported last
+        self._leading = False
+        self._leader_lock = threading.Lock()
+        self._listeners: List[Callable[[bool], None]] = []
+
+    @property
+    def identity(self) -> str:
+        return self._identity
+
+    def add_listener(self, listener: Callable[[bool], None]):
+        """
+        Registers a function that is called (from a worker thread) whenever this replica
+        becomes the leader or stops being the leader
+        :param listener: function receiving the new leadership state
+        """
+        self._listeners.append(listener)
+
+    @property
+    def is_leader(self) -> bool:
+        """
+        :return: True if this replica currently holds the lease
+        """
+        with self._leader_lock:
+            return self._valid_until is not None and self._clock() < self._valid_until
+
+    def stop(self):
+        super().stop()
+        with self._leader_lock:
+            self._valid_until = None
+        if self._leading:
+            # let another replica take over right away, instead of waiting for the lease to expire
+            try:
+                self._backend.release(self._name, self._identity)
+            except Exception as ex:
+                LOGGER.exception(ex)
+            self._on_leadership_changed(False)
+
+    def try_acquire(self) -> bool:
+        """
+        Tries to acquire (or renew) the lease right away
+        :return: True if this replica is the leader now
+        """
+        # the lease is valid from the time of the request, not the response
+        started_at = self._clock()
+        try:
+            acquired = self._backend.try_acquire(self._name, self._identity, self._lease_duration)
+            with self._leader_lock:
+                self._valid_until = started_at + self._lease_duration if acquired else None
+        except Exception as ex:
+            # keep leading until the current lease expires, the next attempt might succeed
+            LOGGER.warning(f"Failed to acquire lease '{self._name}': {ex}")
+
+        leader = self.is_leader
+        if leader != self._leading:
+            self._on_leadership_changed(leader)
+        return leader
+
+    def _on_leadership_changed(self, leader: bool):
+        self._leading = leader
+        if leader:
+            LOGGER.info(f"Replica '{self._identity}' became the leader")
+        else:
+            LOGGER.info(f"Replica '{self._identity}' is not the leader anymore")
+        LEADER_GAUGE.set(1 if leader else 0)
+        LEADER_TRANSITION_COUNTER.labels(leader=str(leader).lower()).inc()
+        for listener in self._listeners:
+            try:
+                listener(leader)
+            except Exception as ex:
+                LOGGER.exception(ex)
+
+    async def _run(self):
+        self.try_acquire()
@@ -0,0 +1,107 @@
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+
+class LeaseBackend(ABC):
+    """
+    Storage for named leases, which are held by at most one holder at a time.
+    Implementations for a cluster (f.ex. Kubernetes Lease objects) need to make
+    acquire() atomic across all replicas.
+    """
+
+    @abstractmethod
+    def try_acquire(self, name: str, holder: str, duration: float) -> bool:
+        """
+        Acquires a lease, or renews it if it is already held by the given holder
+        :param name: name of the lease
+        :param holder: identity of the replica trying to acquire the lease
+        :param duration: number of seconds the lease is valid without being renewed
+        :return: True if the lease is held by the given holder now
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def release(self, name: str, holder: str):
+        """
+        Releases a lease, if it is held by the given holder
+        :param name: name of the lease
+        :param holder: identity of the replica releasing the lease
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_holder(self, name: str) -> Optional[str]:
+        """
+        :param name: name of the lease
+        :return: the current holder of the lease, None if the lease is free or expired
+        """
+        raise NotImplementedError()
+
+
+class SqliteLeaseBackend(LeaseBackend):
+    """
+    Stores leases in a SQLite database, for replicas running on a single node
+    (or sharing a volume that supports file locking).
+    """
+
+    def __init__(self, file_path: str, clock: Callable[[], float] = time.time):
+        """
+        :param file_path: path of the database file
+        :param clock: wall clock, shared by all replicas using the database
+        """
+        self._file_path = file_path
+        self._clock = clock
+        connection = self._connect()
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # a new connection per operation, workers run in different threads
+        return sqlite3.connect(self._file_path, timeout=5, isolation_level=None)
+
+    def try_acquire(self, name: str, holder: str, duration: float) -> bool:
+        now = self._clock()
+        connection = self._connect()
+        try:
+            # take the write lock right away, so reading and updating the lease is atomic
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != holder and row[1] > now:
+                connection.execute("ROLLBACK")
+                return False
+            connection.execute(
+                "INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)",
+                (name, holder, now + duration),
+            )
+            connection.execute("COMMIT")
+            return True
+        except Exception:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def release(self, name: str, holder: str):
+        connection = self._connect()
+        try:
+            connection.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+        finally:
+            connection.close()
+
+    def get_holder(self, name: str) -> Optional[str]:
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT holder FROM leases WHERE name = ? AND expires_at > ?", (name, self._clock())
+            ).fetchone()
+        finally:
+            connection.close()
+        return row[0] if row is not None else None
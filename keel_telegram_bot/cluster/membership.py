@@ -0,0 +1,87 @@
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, List
+
+
+class MembershipBackend(ABC):
+    """
+    Keeps track of the replicas that are currently alive, based on regular heartbeats.
+    """
+
+    @abstractmethod
+    def heartbeat(self, member: str, timeout: float):
+        """
+        Registers a member, or extends its registration
+        :param member: identity of the replica
+        :param timeout: number of seconds after which the member is considered dead without another heartbeat
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def leave(self, member: str):
+        """
+        Removes a member right away
+        :param member: identity of the replica
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_members(self) -> List[str]:
+        """
+        :return: identities of all replicas that are alive, sorted by name
+        """
+        raise NotImplementedError()
+
+
+class SqliteMembershipBackend(MembershipBackend):
+    """
+    Stores heartbeats in a SQLite database, for replicas running on a single node
+    (or sharing a volume that supports file locking).
+    """
+
+    def __init__(self, file_path: str, clock: Callable[[], float] = time.time):
+        """
+        :param file_path: path of the database file
+        :param clock: wall clock, shared by all replicas using the database
+        """
+        self._file_path = file_path
+        self._clock = clock
+        connection = self._connect()
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS members (name TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+            )
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # a new connection per operation, workers run in different threads
+        return sqlite3.connect(self._file_path, timeout=5, isolation_level=None)
+
+    def heartbeat(self, member: str, timeout: float):
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO members (name, expires_at) VALUES (?, ?)",
+                (member, self._clock() + timeout),
+            )
+        finally:
+            connection.close()
+
+    def leave(self, member: str):
+        connection = self._connect()
+        try:
+            connection.execute("DELETE FROM members WHERE name = ?", (member,))
+        finally:
+            connection.close()
+
+    def get_members(self) -> List[str]:
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT name FROM members WHERE expires_at > ? ORDER BY name", (self._clock(),)
+            ).fetchall()
+        finally:
+            connection.close()
+        return [row[0] for row in rows]
@@ -0,0 +1,93 @@
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional
+
+
+class QueueBackend(ABC):
+    """
+    Named queues shared by all replicas, to hand over work to the replica that is responsible for it.
+    Implementations for a cluster need to make take() atomic across all replicas.
+    """
+
+    @abstractmethod
+    def put(self, name: str, key: Optional[str], payload: dict):
+        """
+        Appends an entry to a queue
+        :param name: name of the queue
+        :param key: determines which replica is responsible for the entry, None if any replica is
+        :param payload: json serializable entry data
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def take(self, name: str, limit: int, accept: Callable[[Optional[str]], bool]) -> List[dict]:
+        """
+        Removes the oldest entries a replica is responsible for from a queue
+        :param name: name of the queue
+        :param limit: maximum number of entries
+        :param accept: function returning whether the calling replica is responsible for an entry with the given key
+        :return: payloads of the removed entries, in the order they were added
+        """
+        raise NotImplementedError()
+
+
+class SqliteQueueBackend(QueueBackend):
+    """
+    Stores queues in a SQLite database, for replicas running on a single node
+    (or sharing a volume that supports file locking).
+    """
+
+    def __init__(self, file_path: str, max_age: float, clock: Callable[[], float] = time.time):
+        """
+        :param file_path: path of the database file
+        :param max_age: number of seconds after which entries nobody took are dropped
+        :param clock: wall clock, shared by all replicas using the database
+        """
+        self._file_path = file_path
+        self._max_age = max_age
+        self._clock = clock
+        connection = self._connect()
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS queue_entries ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, key TEXT, payload TEXT NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # a new connection per operation, workers run in different threads
+        return sqlite3.connect(self._file_path, timeout=5, isolation_level=None)
+
+    def put(self, name: str, key: Optional[str], payload: dict):
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT INTO queue_entries (name, key, payload, created_at) VALUES (?, ?, ?, ?)",
+                (name, key, json.dumps(payload), self._clock()),
+            )
+        finally:
+            connection.close()
+
+    def take(self, name: str, limit: int, accept: Callable[[Optional[str]], bool]) -> List[dict]:
+        connection = self._connect()
+        try:
+            # take the write lock right away, so no other replica takes the same entries
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM queue_entries WHERE created_at <= ?", (self._clock() - self._max_age,))
+            rows = connection.execute(
+                "SELECT id, key, payload FROM queue_entries WHERE name = ? ORDER BY id", (name,)
+            ).fetchall()
+            rows = list(filter(lambda x: accept(x[1]), rows))[:limit]
+            connection.executemany("DELETE FROM queue_entries WHERE id = ?", [(row[0],) for row in rows])
+            connection.execute("COMMIT")
+        except Exception:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        return [json.loads(row[2]) for row in rows]
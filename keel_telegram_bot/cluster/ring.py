@@ -0,0 +1,42 @@
+import bisect
+import hashlib
+from typing import Iterable, Optional, FrozenSet
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Assigns keys to members using consistent hashing, so only the keys of a joining
+    or leaving member are reassigned when the membership changes.
+    """
+
+    def __init__(self, members: Iterable[str], virtual_nodes: int):
+        """
+        :param members: names of the members
+        :param virtual_nodes: number of points per member on the ring, more points spread the keys more evenly
+        """
+        self._members = frozenset(members)
+        points = sorted(
+            (_hash(f"{member}#{i}"), member)
+            for member in self._members
+            for i in range(virtual_nodes)
+        )
+        self._hashes = [x[0] for x in points]
+        self._owners = [x[1] for x in points]
+
+    @property
+    def members(self) -> FrozenSet[str]:
+        return self._members
+
+    def get_owner(self, key: str) -> Optional[str]:
+        """
+        :param key: the key to look up
+        :return: the member owning the given key, None if there are no members
+        """
+        if len(self._hashes) <= 0:
+            return None
+        index = bisect.bisect_right(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
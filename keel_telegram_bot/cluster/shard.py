@@ -0,0 +1,115 @@
+import logging
+import time
+from typing import FrozenSet, Callable, List
+
+from keel_telegram_bot.cluster.membership import MembershipBackend
+from keel_telegram_bot.cluster.ring import HashRing
+from keel_telegram_bot.const import HASH_RING_VIRTUAL_NODES
+from keel_telegram_bot.monitoring import RegularIntervalWorker
+from keel_telegram_bot.stats import SHARD_MEMBERS_GAUGE, SHARD_REBALANCE_COUNTER
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ShardCoordinator(RegularIntervalWorker):
+    """
+    Announces this replica to the others and distributes chats among all live replicas.
+    Replicas see membership changes at slightly different times, so a chat might be
+    served by two (or no) replicas for up to one heartbeat interval while rebalancing.
+    """
+
+    def __init__(self, backend: MembershipBackend, identity: str, heartbeat_timeout: float,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param backend: storage of the membership
+        :param identity: unique identity of this replica
+        :param heartbeat_timeout: number of seconds after which a replica without heartbeat loses its chats
+        :param clock: monotonic clock, used to decide when the membership has converged
+        """
+        # send heartbeats often enough to survive a failed attempt
+        super().__init__(heartbeat_timeout / 3)
+        self._backend = backend
+        self._identity = identity
+        self._heartbeat_timeout = heartbeat_timeout
+        self._clock = clock
+        # time of the first successful heartbeat of this replica
+        self._joined_at = None
+        self._converged = False
+        self._listeners: List[Callable[[FrozenSet[str]], None]] = []
+        # this replica serves all chats until it knows about the others
+        self._ring = HashRing([identity], HASH_RING_VIRTUAL_NODES)
+
+    @property
+    def identity(self) -> str:
+        return self._identity
+
+    @property
+    def members(self) -> FrozenSet[str]:
+        return self._ring.members
+
+    @property
+    def is_converged(self) -> bool:
+        """
+        :return: True once this replica has seen the heartbeats of all live replicas, before that
+                 it might consider itself the owner of chats, which are assigned to others
+        """
+        return self._converged
+
+    def add_listener(self, listener: Callable[[FrozenSet[str]], None]):
+        """
+        Registers a function that is called (from a worker thread) whenever the membership changes
+        :param listener: function receiving the identities of all live replicas
+        """
+        self._listeners.append(listener)
+
+    def owns_chat(self, chat_id: str | int) -> bool:
+        """
+        :param chat_id: chat id
+        :return: True if this replica is responsible for sending and editing messages in the given chat
+        """
+        return self._ring.get_owner(str(chat_id)) == self._identity
+
+    def stop(self):
+        super().stop()
+        try:
+            # hand over the chats right away, instead of waiting for the heartbeat to time out
+            self._backend.leave(self._identity)
+        except Exception as ex:
+            LOGGER.exception(ex)
+
+    def refresh(self):
+        """
+        Sends a heartbeat and updates the assignment of chats, if the membership has changed
+        """
+        try:
+            self._backend.heartbeat(self._identity, self._heartbeat_timeout)
+            members = set(self._backend.get_members())
+        except Exception as ex:
+            # keep the current assignment, the next attempt might succeed
+            LOGGER.warning(f"Failed to update cluster membership: {ex}")
+            return
+
+        members.add(self._identity)
+        now = self._clock()
+        if self._joined_at is None:
+            self._joined_at = now
+        elif now - self._joined_at >= self._interval:
+            # every live replica has sent a heartbeat since this one joined
+            self._converged = True
+
+        if members == self._ring.members:
+            return
+
+        LOGGER.info(f"Cluster membership changed: {sorted(members)}")
+        # swapped as a whole, readers in other threads see either the old or the new assignment
+        self._ring = HashRing(members, HASH_RING_VIRTUAL_NODES)
+        SHARD_MEMBERS_GAUGE.set(len(members))
+        SHARD_REBALANCE_COUNTER.inc()
+        for listener in self._listeners:
+            try:
+                listener(self._ring.members)
+            except Exception as ex:
+                LOGGER.exception(ex)
+
+    async def _run(self):
+        self.refresh()
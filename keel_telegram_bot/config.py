@@ -1,5 +1,10 @@
 import logging
+import os
 import re
+import socket
+import threading
+from dataclasses import dataclass
+from typing import FrozenSet, Dict, Tuple, Pattern, Optional
 
 import voluptuous
 from container_app_conf import ConfigBase
@@ -9,11 +14,14 @@ from container_app_conf.entry.int import IntConfigEntry
 from container_app_conf.entry.list import ListConfigEntry
 from container_app_conf.entry.string import StringConfigEntry
 from container_app_conf.entry.timedelta import TimeDeltaConfigEntry
+from container_app_conf.source import FilesystemSource
 from container_app_conf.source.env_source import EnvSource
 from container_app_conf.source.toml_source import TomlSource
 from container_app_conf.source.yaml_source import YamlSource
 from voluptuous import Schema
 
+from keel_telegram_bot.const import MAX_PENDING_UPDATES
+
 NODE_MAIN = "keel-telegram-bot"
 
 NODE_TELEGRAM = "telegram"
@@ -23,15 +31,69 @@ NODE_HOST = "host"
 NODE_WEBHOOK = "webhook"
 
 NODE_FILTERS = "filters"
+NODE_OUTBOX = "outbox"
+
+NODE_MONITOR = "monitor"
+NODE_CHECKPOINT = "checkpoint"
+
+NODE_CLUSTER = "cluster"
+NODE_LEASE = "lease"
+NODE_MEMBERSHIP = "membership"
 
 NODE_STATS = "stats"
 NODE_ENABLED = "enabled"
 NODE_PORT = "port"
 
+# placeholder in file paths, which is replaced by the identity of the replica
+IDENTITY_PLACEHOLDER = "{identity}"
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DerivedConfig:
+    """
+    Lookup structures derived from the configuration, built once per (re)load
+    """
+    admin_usernames: FrozenSet[str]
+    chat_ids: FrozenSet[str]
+    # configured chat ids in the order of the configuration, to send notifications to
+    ordered_chat_ids: Tuple[str, ...]
+    # compiled identifier filters, by chat id
+    filters: Dict[str, Tuple[Pattern, ...]]
+
+    @staticmethod
+    def from_config(config: "Config") -> "DerivedConfig":
+        filters = {}
+        for item in config.TELEGRAM_FILTERS.value or []:
+            chat_id = str(item["chat_id"])
+            filters[chat_id] = filters.get(chat_id, ()) + (re.compile(item["identifier"]),)
+
+        return DerivedConfig(
+            admin_usernames=frozenset(config.TELEGRAM_ADMIN_USERNAMES.value),
+            chat_ids=frozenset(map(str, config.TELEGRAM_CHAT_IDS.value)),
+            ordered_chat_ids=tuple(map(str, config.TELEGRAM_CHAT_IDS.value)),
+            filters=filters,
+        )
+
+    def is_filtered_for(self, chat_id: str | int, identifier: str) -> bool:
+        """
+        :param chat_id: chat id
+        :param identifier: approval or resource identifier
+        :return: True if any of the filters of the given chat doesn't match the identifier
+        """
+        patterns = self.filters.get(str(chat_id), ())
+        return any(pattern.search(identifier) is None for pattern in patterns)
+
 
 class Config(ConfigBase):
 
     def __new__(cls, *args, **kwargs):
+        instance = cls._instances.get(cls, None)
+        if instance is not None and hasattr(instance, "derived"):
+            # the configuration is only loaded once, use reload() to pick up changes
+            return instance
+
         yaml_source = YamlSource(NODE_MAIN)
         toml_source = TomlSource(NODE_MAIN)
         data_sources = [
@@ -39,7 +101,90 @@ class Config(ConfigBase):
             yaml_source,
             toml_source
         ]
-        return super(Config, cls).__new__(cls, data_sources=data_sources)
+        instance = super(Config, cls).__new__(cls, data_sources=data_sources)
+        instance._reload_lock = threading.Lock()
+        instance.derived = DerivedConfig.from_config(instance)
+        return instance
+
+    def reload(self) -> bool:
+        """
+        Reloads the configuration from all data sources. Nothing is changed if the new configuration is invalid.
+        Values that are only read on startup (f.ex. the bot token or keel connection) still require a restart.
+        :return: True if the configuration was reloaded, False otherwise
+        """
+        with self._reload_lock:
+            try:
+                # load into a separate instance first, to keep the current values if validation fails
+                candidate = ConfigBase.__new__(type(self), data_sources=self.data_sources, singleton=False,
+                                               validate=False)
+                # the instance starts with copies of the current values, entries that were removed from
+                # all data sources have to fall back to their defaults
+                for entry in candidate._config_entries.values():
+                    entry._value = entry.default
+                candidate.load_config(validate=True)
+                derived = DerivedConfig.from_config(candidate)
+            except Exception as ex:
+                LOGGER.error(f"Invalid configuration, keeping the current one: {ex}")
+                return False
+
+            # swapped as a whole, values that are read while handling messages are only taken from this snapshot,
+            # so they are never seen half-applied
+            self.derived = derived
+            for name, entry in self._config_entries.items():
+                entry.value = getattr(candidate, name).value
+            LOGGER.info("Configuration reloaded")
+            return True
+
+    def validate(self):
+        super().validate()
+        concurrent_updates = self.TELEGRAM_CONCURRENT_UPDATES.value
+        if not 1 <= concurrent_updates <= MAX_PENDING_UPDATES:
+            raise ValueError(f"concurrent_updates must be between 1 and {MAX_PENDING_UPDATES}: {concurrent_updates}")
+
+        clustered = self.CLUSTER_LEASE_FILE.value is not None or self.CLUSTER_MEMBERSHIP_FILE.value is not None
+        if clustered and (self.TELEGRAM_WEBHOOK_URL.value is None or self.TELEGRAM_WEBHOOK_SECRET_TOKEN.value is None):
+            # telegram only allows a single client to poll for updates, and each replica registers the webhook
+            raise ValueError("Running multiple replicas requires a telegram webhook url and secret_token")
+
+        checkpoint_file = self.MONITOR_CHECKPOINT_FILE.value
+        if (self.CLUSTER_MEMBERSHIP_FILE.value is not None and checkpoint_file is not None
+                and IDENTITY_PLACEHOLDER not in checkpoint_file):
+            # each replica notifies different chats, a shared checkpoint would mark approvals as notified
+            # in the chats of the other replicas as well
+            raise ValueError(f"With a membership file, the checkpoint file must contain {IDENTITY_PLACEHOLDER}, "
+                             f"so every replica uses a checkpoint of its own")
+
+        per_replica_files = filter(lambda x: x is not None and IDENTITY_PLACEHOLDER in x,
+                                   [checkpoint_file, self.TELEGRAM_OUTBOX_FILE.value])
+        if any(per_replica_files) and self.CLUSTER_IDENTITY.value is None:
+            # the default identity contains the process id, which changes on restart
+            raise ValueError(f"Using {IDENTITY_PLACEHOLDER} in file paths requires a cluster identity, "
+                             f"which is stable across restarts")
+
+    @property
+    def identity(self) -> str:
+        """
+        :return: unique name of this replica
+        """
+        return self.CLUSTER_IDENTITY.value or f"{socket.gethostname()}-{os.getpid()}"
+
+    def get_replica_file(self, entry: StringConfigEntry) -> Optional[str]:
+        """
+        :param entry: a config entry containing a file path
+        :return: the configured path, with the identity placeholder replaced by the identity of this replica
+        """
+        if entry.value is None:
+            return None
+        return entry.value.replace(IDENTITY_PLACEHOLDER, self.identity)
+
+    def get_config_files(self) -> Tuple[str, ...]:
+        """
+        :return: paths of the config files that are currently in use
+        """
+        # noinspection PyProtectedMember
+        paths = map(lambda x: x._find_config_file(), filter(lambda x: isinstance(x, FilesystemSource),
+                                                            self.data_sources))
+        return tuple(filter(lambda x: x is not None, paths))
 
     LOG_LEVEL = StringConfigEntry(
         description="Log level",
@@ -91,6 +236,80 @@ class Config(ConfigBase):
         ]
     )
 
+    TELEGRAM_COMMAND_TIMEOUT = TimeDeltaConfigEntry(
+        description="Overall latency budget of a bot command, including all calls to keel and telegram",
+        key_path=[
+            NODE_MAIN,
+            NODE_TELEGRAM,
+            "command_timeout"
+        ],
+        default="30s",
+    )
+
+    TELEGRAM_CONCURRENT_UPDATES = IntConfigEntry(
+        description="Maximum number of telegram updates that are processed at the same time, "
+                    "updates of the same chat are always processed one after another",
+        key_path=[
+            NODE_MAIN,
+            NODE_TELEGRAM,
+            "concurrent_updates"
+        ],
+        default=8,
+    )
+
+    TELEGRAM_OUTBOX_FILE = StringConfigEntry(
+        description="SQLite database to keep notifications in until they are delivered (should be located on a "
+                    "persistent volume), which can't be shared by multiple replicas. "
+                    f"{IDENTITY_PLACEHOLDER} is replaced by the cluster identity. "
+                    "Notifications are kept in memory only if not set.",
+        key_path=[
+            NODE_MAIN,
+            NODE_TELEGRAM,
+            NODE_OUTBOX,
+            "file"
+        ],
+        example="/data/outbox.sqlite",
+        default=None,
+    )
+
+    TELEGRAM_WEBHOOK_URL = StringConfigEntry(
+        description="Public base URL of the webserver, which telegram sends updates to. "
+                    "Updates are received by polling if not set.",
+        key_path=[
+            NODE_MAIN,
+            NODE_TELEGRAM,
+            NODE_WEBHOOK,
+            "url"
+        ],
+        example="https://keel-telegram-bot.example.com",
+        default=None,
+    )
+
+    TELEGRAM_WEBHOOK_PATH = StringConfigEntry(
+        description="Path of the webserver to receive telegram updates on",
+        key_path=[
+            NODE_MAIN,
+            NODE_TELEGRAM,
+            NODE_WEBHOOK,
+            "path"
+        ],
+        regex=re.compile(r"^/.+"),
+        default="/telegram",
+    )
+
+    TELEGRAM_WEBHOOK_SECRET_TOKEN = StringConfigEntry(
+        description="Secret token telegram has to send along with every update, a random one is generated if not set",
+        key_path=[
+            NODE_MAIN,
+            NODE_TELEGRAM,
+            NODE_WEBHOOK,
+            "secret_token"
+        ],
+        regex=re.compile(r"^[A-Za-z0-9_-]{1,256}$"),
+        default=None,
+        secret=True,
+    )
+
     KEEL_HOST = StringConfigEntry(
         description="Hostname of the keel HTTP endpoint",
         key_path=[
@@ -144,17 +363,133 @@ class Config(ConfigBase):
         secret=True
     )
 
+    KEEL_STREAMING = BoolConfigEntry(
+        description="Whether list commands should decode keel responses incrementally, "
+                    "keeping only the listed items in memory instead of the whole response",
+        key_path=[
+            NODE_MAIN,
+            NODE_KEEL,
+            "streaming"
+        ],
+        default=False
+    )
+
     MONITOR_INTERVAL = TimeDeltaConfigEntry(
         description="Interval to check for new pending approvals",
         key_path=[
             NODE_MAIN,
-            "monitor",
+            NODE_MONITOR,
             "interval"
         ],
         default="1m",
         required=True,
     )
 
+    MONITOR_INTERVAL_MIN = TimeDeltaConfigEntry(
+        description="Lower bound of the adaptive monitor interval, used while approvals are pending "
+                    "or right after a webhook notification was received",
+        key_path=[
+            NODE_MAIN,
+            NODE_MONITOR,
+            "interval_min"
+        ],
+        default="10s",
+    )
+
+    MONITOR_INTERVAL_MAX = TimeDeltaConfigEntry(
+        description="Upper bound of the adaptive monitor interval, used when nothing has changed for a while",
+        key_path=[
+            NODE_MAIN,
+            NODE_MONITOR,
+            "interval_max"
+        ],
+        default="10m",
+    )
+
+    MONITOR_CHECKPOINT_FILE = StringConfigEntry(
+        description="File to persist the last seen approvals in, so restarts neither miss nor replay approvals. "
+                    f"{IDENTITY_PLACEHOLDER} is replaced by the cluster identity, which is required with a "
+                    "membership file. Disabled if not set.",
+        key_path=[
+            NODE_MAIN,
+            NODE_MONITOR,
+            NODE_CHECKPOINT,
+            "file"
+        ],
+        example="/data/monitor-checkpoint.json",
+        default=None,
+    )
+
+    MONITOR_CHECKPOINT_INTERVAL = TimeDeltaConfigEntry(
+        description="Minimum interval between two checkpoint writes",
+        key_path=[
+            NODE_MAIN,
+            NODE_MONITOR,
+            NODE_CHECKPOINT,
+            "interval"
+        ],
+        default="1m",
+    )
+
+    CLUSTER_IDENTITY = StringConfigEntry(
+        description="Unique name of this replica, defaults to the hostname and process id",
+        key_path=[
+            NODE_MAIN,
+            NODE_CLUSTER,
+            "identity"
+        ],
+        example="keel-telegram-bot-0",
+        default=None,
+    )
+
+    CLUSTER_LEASE_FILE = StringConfigEntry(
+        description="SQLite database shared by all replicas, to elect the one sending approval notifications. "
+                    "Leader election is disabled if not set.",
+        key_path=[
+            NODE_MAIN,
+            NODE_CLUSTER,
+            NODE_LEASE,
+            "file"
+        ],
+        example="/data/lease.sqlite",
+        default=None,
+    )
+
+    CLUSTER_LEASE_DURATION = TimeDeltaConfigEntry(
+        description="Time after which another replica takes over if the leader stops renewing its lease",
+        key_path=[
+            NODE_MAIN,
+            NODE_CLUSTER,
+            NODE_LEASE,
+            "duration"
+        ],
+        default="15s",
+    )
+
+    CLUSTER_MEMBERSHIP_FILE = StringConfigEntry(
+        description="SQLite database shared by all replicas, to distribute the configured chats among them. "
+                    "Sharding is disabled if not set.",
+        key_path=[
+            NODE_MAIN,
+            NODE_CLUSTER,
+            NODE_MEMBERSHIP,
+            "file"
+        ],
+        example="/data/membership.sqlite",
+        default=None,
+    )
+
+    CLUSTER_HEARTBEAT_TIMEOUT = TimeDeltaConfigEntry(
+        description="Time after which the chats of a replica are reassigned if it stops sending heartbeats",
+        key_path=[
+            NODE_MAIN,
+            NODE_CLUSTER,
+            NODE_MEMBERSHIP,
+            "heartbeat_timeout"
+        ],
+        default="15s",
+    )
+
     TELEGRAM_FILTERS = ListConfigEntry(
         description="Per chat-id filter to apply to the list of approvals",
         key_path=[
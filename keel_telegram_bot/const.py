@@ -1,5 +1,59 @@
 REQUESTS_TIMEOUT = (5, 5)
+# number of bytes to read at once when streaming responses from keel
+STREAM_CHUNK_SIZE = 64 * 1024
+# number of retries for idempotent requests to keel
+REQUESTS_RETRIES = 3
+# backoff (in seconds) before the first retry, doubled on each attempt
+REQUESTS_RETRY_BACKOFF = 0.5
+REQUESTS_RETRY_BACKOFF_MAX = 4
+# number of consecutive failures after which requests to keel are rejected right away
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+# seconds to wait before probing keel again
+CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+# maximum number of concurrent keel requests of bulk approval commands
+BULK_ACTION_CONCURRENCY = 4
+# seconds to wait for further inline keyboard clicks before updating approval messages
+MESSAGE_REFRESH_DELAY = 1
+# maximum number of users with a pending reply keyboard selection
+REPLY_KEYBOARD_MAX_PENDING = 100
+# seconds after which an unanswered reply keyboard selection is dropped
+REPLY_KEYBOARD_TIMEOUT = 10 * 60
+# seconds between two checks for changes of the config file
+CONFIG_RELOAD_INTERVAL = 10
+# maximum number of telegram updates that are processed or waiting for an earlier update of the same chat
+MAX_PENDING_UPDATES = 256
+# number of points per replica on the hash ring used to distribute chats
+HASH_RING_VIRTUAL_NODES = 64
+# name of the lease held by the replica that sends approval notifications
+LEADER_LEASE_NAME = "keel-telegram-bot-leader"
+# name of the shared queue, which hands over keel notifications received by followers to the leader
+KEEL_NOTIFICATION_QUEUE = "keel-notifications"
+# name of the shared queue, which hands over telegram updates to the replica responsible for their chat
+TELEGRAM_UPDATE_QUEUE = "telegram-updates"
+# seconds between two checks of the shared queues for entries this replica is responsible for
+CLUSTER_QUEUE_POLL_INTERVAL = 0.25
+# maximum number of shared queue entries taken at once
+CLUSTER_QUEUE_BATCH_SIZE = 20
+# seconds after which shared queue entries nobody took are dropped
+CLUSTER_QUEUE_MAX_AGE = 5 * 60
 TELEGRAM_CAPTION_LENGTH_LIMIT = 200
+TELEGRAM_MESSAGE_LENGTH_LIMIT = 4096
+# part of the error returned by telegram, when an edit would not change a message
+TELEGRAM_MESSAGE_NOT_MODIFIED = "Message is not modified"
+# maximum number of notifications sent per second, telegram allows about 30
+TELEGRAM_MESSAGES_PER_SECOND = 25
+# number of outbox entries delivered (and removed from the outbox) at once
+OUTBOX_BATCH_SIZE = 20
+# number of failed delivery attempts after which an outbox entry is moved to the dead letters
+OUTBOX_MAX_ATTEMPTS = 8
+# backoff (in seconds) before the first retry of an outbox entry, doubled on each attempt
+OUTBOX_RETRY_BACKOFF = 1
+OUTBOX_RETRY_BACKOFF_MAX = 5 * 60
+# seconds between two checks for outbox entries that are due for a retry
+OUTBOX_POLL_INTERVAL = 1
+# outbox entry kinds
+OUTBOX_KIND_APPROVAL = "approval"
+OUTBOX_KIND_NOTIFICATION = "notification"
 
 # Commands
 COMMAND_START = "start"
@@ -10,6 +64,9 @@ COMMAND_UPDATE = ["update"]
 COMMAND_APPROVE = ["approve", "a"]
 COMMAND_REJECT = ["reject", "r"]
 COMMAND_DELETE = ["delete", "d"]
+COMMAND_APPROVE_ALL = ["approve_all", "aa"]
+COMMAND_REJECT_ALL = ["reject_all", "ra"]
+COMMAND_DELETE_ALL = ["delete_all", "da"]
 COMMAND_CHATID = "chatid"
 
 COMMAND_STATS = 'stats'
@@ -27,3 +84,5 @@ BUTTON_DATA_REJECT = "r"
 
 # webserver
 ENDPOINT_WEBHOOK = "/"
+# header containing the secret token of telegram webhook updates
+TELEGRAM_SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
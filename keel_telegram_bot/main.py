@@ -1,6 +1,7 @@
 import asyncio
 import logging
 import os
+import signal
 import sys
 
 from container_app_conf.formatter.toml import TomlFormatter
@@ -8,7 +9,14 @@ from prometheus_client import start_http_server
 
 from keel_telegram_bot.bot import KeelTelegramBot
 from keel_telegram_bot.client.api_client import KeelApiClient
+from keel_telegram_bot.cluster.leader import LeaderElector
+from keel_telegram_bot.cluster.lease import SqliteLeaseBackend
+from keel_telegram_bot.cluster.membership import SqliteMembershipBackend
+from keel_telegram_bot.cluster.queue import SqliteQueueBackend
+from keel_telegram_bot.cluster.shard import ShardCoordinator
 from keel_telegram_bot.config import Config
+from keel_telegram_bot.const import CONFIG_RELOAD_INTERVAL, LEADER_LEASE_NAME, CLUSTER_QUEUE_MAX_AGE
+from keel_telegram_bot.monitoring.config_reloader import ConfigReloader
 from keel_telegram_bot.monitoring.monitor import Monitor
 from keel_telegram_bot.webserver import WebsocketServer
 
@@ -42,15 +50,48 @@ def main():
         config.KEEL_PASSWORD.value,
     )
 
-    bot = KeelTelegramBot(config, api_client)
-    monitor = Monitor(config, api_client, bot)
-    server = WebsocketServer(config, bot)
-
-    tasks = asyncio.gather(
+    identity = config.identity
+    leader_elector = None
+    if config.CLUSTER_LEASE_FILE.value is not None:
+        leader_elector = LeaderElector(
+            backend=SqliteLeaseBackend(config.CLUSTER_LEASE_FILE.value),
+            name=LEADER_LEASE_NAME,
+            identity=identity,
+            lease_duration=config.CLUSTER_LEASE_DURATION.value.total_seconds(),
+        )
+    shard_coordinator = None
+    if config.CLUSTER_MEMBERSHIP_FILE.value is not None:
+        shard_coordinator = ShardCoordinator(
+            backend=SqliteMembershipBackend(config.CLUSTER_MEMBERSHIP_FILE.value),
+            identity=identity,
+            heartbeat_timeout=config.CLUSTER_HEARTBEAT_TIMEOUT.value.total_seconds(),
+        )
+
+    queue = None
+    cluster_file = config.CLUSTER_LEASE_FILE.value or config.CLUSTER_MEMBERSHIP_FILE.value
+    if cluster_file is not None:
+        # hands over work to the replica responsible for it
+        queue = SqliteQueueBackend(cluster_file, max_age=CLUSTER_QUEUE_MAX_AGE)
+
+    bot = KeelTelegramBot(config, api_client, shard_coordinator)
+    # with sharding, every replica monitors approvals to notify its own chats
+    monitor = Monitor(config, api_client, bot, leader_elector if shard_coordinator is None else None,
+                      shard_coordinator)
+    server = WebsocketServer(config, bot, monitor, leader_elector, queue, shard_coordinator)
+    config_reloader = ConfigReloader(config, CONFIG_RELOAD_INTERVAL)
+    loop.add_signal_handler(signal.SIGHUP, config_reloader.reload)
+
+    workers = [
         bot.start(),
         monitor.start(),
         server.start(),
-    )
+        config_reloader.start(),
+    ]
+    if leader_elector is not None:
+        workers.append(leader_elector.start())
+    if shard_coordinator is not None:
+        workers.append(shard_coordinator.start())
+    tasks = asyncio.gather(*workers)
 
     loop.run_until_complete(tasks)
     loop.run_forever()
@@ -1,6 +1,7 @@
 import asyncio
 import logging
 import threading
+import time
 
 LOGGER = logging.getLogger(__name__)
 
@@ -13,6 +14,9 @@ class RegularIntervalWorker:
     def __init__(self, interval: float):
         self._interval = interval
         self._timer = None
+        self._next_run_at = None
+        self._running = False
+        self._lock = threading.RLock()
 
     async def start(self):
         """
@@ -32,31 +36,70 @@ class RegularIntervalWorker:
         """
         Stops the worker
         """
-        if self._timer is not None:
-            self._timer.cancel()
-        self._timer = None
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
 
-    def _schedule_next_run(self, interval: int = None):
+    def _schedule_next_run(self, interval: float = None):
         """
         Schedules the next run
+        :param interval: seconds until the next run, defaults to the value of _next_interval()
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            interval = interval if interval is not None else self._next_interval()
+            self._next_run_at = time.monotonic() + interval
+            self._timer = threading.Timer(interval, self._worker_job)
+            self._timer.start()
+
+    def _schedule_run_within(self, interval: float):
+        """
+        Makes sure the next run happens within the given interval, without delaying an earlier scheduled run
+        :param interval: maximum number of seconds until the next run
+        """
+        with self._lock:
+            if self._timer is None or self._running:
+                # not started, or the current run will schedule the next one when it is done
+                return
+            if self._next_run_at <= time.monotonic() + interval:
+                return
+            self._schedule_next_run(interval)
+
+    def _schedule_run_in(self, interval: float):
+        """
+        Moves the next run to the given number of seconds from now, even if it was scheduled earlier
+        :param interval: number of seconds until the next run
+        """
+        with self._lock:
+            if self._timer is None or self._running:
+                # not started, or the current run will schedule the next one when it is done
+                return
+            self._schedule_next_run(interval)
+
+    def _next_interval(self) -> float:
+        """
+        Determines the number of seconds until the next run. Override this method for a dynamic interval.
         """
-        if self._timer is not None:
-            self._timer.cancel()
-        interval = interval if interval is not None else self._interval
-        self._timer = threading.Timer(interval, self._worker_job)
-        self._timer.start()
+        return self._interval
 
     def _worker_job(self):
         """
         The regularly executed task. Override this method.
         """
+        with self._lock:
+            self._running = True
         try:
             loop = asyncio.new_event_loop()
             loop.run_until_complete(self._run())
         except Exception as e:
             LOGGER.error(e, exc_info=True)
         finally:
-            self._schedule_next_run()
+            with self._lock:
+                self._running = False
+                if self._timer is not None:
+                    self._schedule_next_run()
 
     async def _run(self):
         """
@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Iterable, List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+# increase this when the file format changes in an incompatible way
+CHECKPOINT_VERSION = 2
+
+
+class MonitorCheckpoint:
+    """
+    Persists the last snapshot seen by a monitor to a local file,
+    so it can be resumed after a restart.
+    """
+
+    def __init__(self, file_path: str, fields: Iterable[str], write_interval: float):
+        """
+        :param file_path: path of the checkpoint file
+        :param fields: item attributes to persist in addition to the item id and identifier
+        :param write_interval: minimum number of seconds between two (non-forced) writes
+        """
+        self._file_path = file_path
+        self._fields = tuple(fields)
+        self._write_interval = write_interval
+        self._records = None
+        self._dirty = False
+        self._last_write = 0.0
+
+    def load(self) -> Optional[List[SimpleNamespace]]:
+        """
+        Loads the persisted snapshot
+        :return: list of records with an "id", "identifier" and all persisted fields, None if there is no usable checkpoint
+        """
+        try:
+            with open(self._file_path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            LOGGER.debug(f"No monitor checkpoint found at {self._file_path}")
+            return None
+        except Exception as ex:
+            LOGGER.warning(f"Ignoring unreadable monitor checkpoint {self._file_path}: {ex}")
+            return None
+
+        if data.get("version") != CHECKPOINT_VERSION:
+            LOGGER.warning(f"Ignoring monitor checkpoint with unsupported version: {data.get('version')}")
+            return None
+
+        self._records = data["items"]
+        return list(map(self._to_record, self._records))
+
+    def update(self, items: Iterable):
+        """
+        Updates the snapshot in memory, call flush() to persist it
+        :param items: the current snapshot
+        """
+        self._records = list(map(self._to_dict, items))
+        self._dirty = True
+
+    def flush(self, force: bool = False):
+        """
+        Atomically writes the current snapshot to disk, if it has changed since the last write
+        and the write interval has passed
+        :param force: write immediately, regardless of the write interval
+        """
+        if not self._dirty:
+            return
+        if not force and time.monotonic() - self._last_write < self._write_interval:
+            return
+
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "items": self._records,
+        }
+
+        directory = os.path.dirname(os.path.abspath(self._file_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".checkpoint-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self._file_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+        self._dirty = False
+        self._last_write = time.monotonic()
+
+    def _to_dict(self, item) -> dict:
+        result = {field: getattr(item, field) for field in self._fields}
+        result["id"] = item.id
+        # needed to forget the messages of approvals that were removed while the bot was down
+        result["identifier"] = item.identifier
+        return result
+
+    @staticmethod
+    def _to_record(data: dict) -> SimpleNamespace:
+        # json has no tuples, convert lists back to match the original item attributes
+        values = {k: tuple(v) if isinstance(v, list) else v for k, v in data.items()}
+        return SimpleNamespace(**values)
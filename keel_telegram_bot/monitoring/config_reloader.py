@@ -0,0 +1,47 @@
+import logging
+import os
+from typing import Dict, Optional
+
+from keel_telegram_bot.config import Config
+from keel_telegram_bot.monitoring import RegularIntervalWorker
+from keel_telegram_bot.stats import CONFIG_RELOAD_COUNTER
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ConfigReloader(RegularIntervalWorker):
+    """
+    Reloads the configuration when one of its files has changed
+    """
+
+    def __init__(self, config: Config, interval: float):
+        super().__init__(interval)
+        self._config = config
+        self._file_states = self._get_file_states()
+
+    def reload(self):
+        """
+        Reloads the configuration right away, f.ex. when receiving SIGHUP
+        """
+        with self._lock:
+            self._file_states = self._get_file_states()
+            result = self._config.reload()
+        CONFIG_RELOAD_COUNTER.labels(result="success" if result else "failure").inc()
+
+    def _get_file_states(self) -> Dict[str, Optional[int]]:
+        """
+        :return: modification time of all config files, by path
+        """
+        result = {}
+        for path in self._config.get_config_files():
+            try:
+                result[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                result[path] = None
+        return result
+
+    async def _run(self):
+        if self._get_file_states() == self._file_states:
+            return
+        LOGGER.debug("Config file change detected")
+        self.reload()
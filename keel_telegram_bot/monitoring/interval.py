@@ -0,0 +1,82 @@
+import time
+from typing import Callable
+
+
+class AdaptiveInterval:
+    """
+    Determines the polling interval of a worker based on recent activity.
+
+    The minimum interval is used while there is something going on (pending items or a recent external activity
+    signal). Otherwise the base interval is used, until nothing has changed for a number of consecutive runs,
+    after which the interval is increased exponentially up to the maximum.
+    Runs with pending items or recent activity don't count as idle.
+    """
+
+    def __init__(self, base: float, minimum: float, maximum: float,
+                 activity_window: float, idle_runs: int = 5, backoff_factor: float = 2.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param base: interval (in seconds) to use when there is no reason to poll faster or slower
+        :param minimum: lower bound of the interval
+        :param maximum: upper bound of the interval
+        :param activity_window: number of seconds to poll quickly after an activity signal
+        :param idle_runs: number of consecutive runs without changes before backing off
+        :param backoff_factor: factor to increase the interval by on each idle run while backing off
+        :param clock: time source
+        """
+        self._minimum = minimum
+        self._maximum = max(minimum, maximum)
+        self._base = min(max(base, self._minimum), self._maximum)
+        self._activity_window = activity_window
+        self._idle_runs = idle_runs
+        self._backoff_factor = backoff_factor
+        self._clock = clock
+
+        self._current = self._base
+        self._unchanged_runs = 0
+        self._last_activity = None
+
+    @property
+    def current(self) -> float:
+        """
+        :return: the current interval in seconds
+        """
+        return self._current
+
+    @property
+    def minimum(self) -> float:
+        return self._minimum
+
+    def on_activity(self) -> float:
+        """
+        Signals external activity (e.g. a webhook), which suggests that changes are about to happen
+        :return: the new interval
+        """
+        self._last_activity = self._clock()
+        self._unchanged_runs = 0
+        self._current = self._minimum
+        return self._current
+
+    def on_run(self, changed: bool, pending: bool) -> float:
+        """
+        Updates the interval after a run
+        :param changed: whether the run detected any changes
+        :param pending: whether there are pending items that are likely to change soon
+        :return: the new interval
+        """
+        recently_active = self._last_activity is not None \
+                          and self._clock() - self._last_activity < self._activity_window
+
+        if changed or pending or recently_active:
+            self._unchanged_runs = 0
+        else:
+            self._unchanged_runs += 1
+
+        if pending or recently_active:
+            self._current = self._minimum
+        elif self._unchanged_runs < self._idle_runs:
+            self._current = self._base
+        else:
+            self._current = min(max(self._current, self._base) * self._backoff_factor, self._maximum)
+
+        return self._current
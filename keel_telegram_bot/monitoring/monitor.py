@@ -1,45 +1,272 @@
 import logging
+import time
+from typing import Optional, List, Dict, Set
 
 from keel_telegram_bot.bot import KeelTelegramBot
 from keel_telegram_bot.client.api_client import KeelApiClient
+from keel_telegram_bot.client.approval import Approval
+from keel_telegram_bot.cluster.leader import LeaderElector
+from keel_telegram_bot.cluster.shard import ShardCoordinator
 from keel_telegram_bot.config import Config
 from keel_telegram_bot.monitoring import RegularIntervalWorker
-from keel_telegram_bot.stats import APPROVAL_WATCHER_TIME, NEW_PENDING_APPROVAL_COUNTER
-from keel_telegram_bot.util import filter_new_by_key
+from keel_telegram_bot.monitoring.checkpoint import MonitorCheckpoint
+from keel_telegram_bot.monitoring.interval import AdaptiveInterval
+from keel_telegram_bot.stats import APPROVAL_WATCHER_TIME, NEW_PENDING_APPROVAL_COUNTER, MONITOR_INTERVAL_GAUGE
+from keel_telegram_bot.util import diff_by_key, deadline_remaining_bucket, identifier_without_version
 
 LOGGER = logging.getLogger(__name__)
 
+# approval fields that are reflected in notification messages
+APPROVAL_DIFF_FIELDS = ("votesRequired", "votesReceived", "voters", "archived", "rejected", "rawDeadline")
+
+# number of seconds to poll with the minimum interval after a webhook notification was received
+ACTIVITY_WINDOW_SECONDS = 120
+# number of seconds without further webhook notifications to wait for before refreshing
+NOTIFICATION_DEBOUNCE_SECONDS = 1
+# maximum number of seconds to delay a refresh while webhook notifications keep arriving
+NOTIFICATION_MAX_DELAY_SECONDS = 5
+
 
 class Monitor(RegularIntervalWorker):
 
-    def __init__(self, config: Config, api_client: KeelApiClient, bot: KeelTelegramBot):
+    def __init__(self, config: Config, api_client: KeelApiClient, bot: KeelTelegramBot,
+                 leader_elector: Optional[LeaderElector] = None,
+                 shard_coordinator: Optional[ShardCoordinator] = None):
+        """
+        :param config: configuration object
+        :param api_client: keel api client
+        :param bot: the bot to notify
+        :param leader_elector: only notifies while this replica is the leader, if set
+        :param shard_coordinator: only notifies once the assignment of chats has converged, if set
+        """
         interval_seconds = config.MONITOR_INTERVAL.value.total_seconds()
         super().__init__(interval_seconds)
         self._config = config
         self._api_client = api_client
         self._bot = bot
         self._old = None
+        # identifiers of webhook notifications received since the last run
+        self._notified_identifiers = set()
+        # when the first of the pending webhook notifications was received
+        self._first_notification_at = None
+        # when the next complete poll of all approvals is due, runs before only refresh notified approvals
+        self._poll_due_at = 0.0
+        # whether notified approvals were refreshed since the last complete poll
+        self._refreshed_since_poll = False
+        self._leader_elector = leader_elector
+        self._shard_coordinator = shard_coordinator
+        # whether the last run was skipped, because another replica is the leader
+        self._following = False
+        if leader_elector is not None:
+            leader_elector.add_listener(self._on_leadership_changed)
+
+        self._adaptive_interval = AdaptiveInterval(
+            base=interval_seconds,
+            minimum=config.MONITOR_INTERVAL_MIN.value.total_seconds(),
+            maximum=config.MONITOR_INTERVAL_MAX.value.total_seconds(),
+            activity_window=ACTIVITY_WINDOW_SECONDS,
+        )
+        MONITOR_INTERVAL_GAUGE.set(self._adaptive_interval.current)
+
+        self._checkpoint = None
+        if config.MONITOR_CHECKPOINT_FILE.value is not None:
+            self._checkpoint = MonitorCheckpoint(
+                file_path=config.get_replica_file(config.MONITOR_CHECKPOINT_FILE),
+                fields=APPROVAL_DIFF_FIELDS,
+                write_interval=config.MONITOR_CHECKPOINT_INTERVAL.value.total_seconds(),
+            )
+            self._old = self._checkpoint.load()
+
+    def stop(self):
+        super().stop()
+        if self._checkpoint is not None:
+            self._checkpoint.flush(force=True)
+
+    def notify_activity(self):
+        """
+        Signals that Keel is active (e.g. a webhook notification was received),
+        which switches to the minimum polling interval for a while
+        """
+        interval = self._adaptive_interval.on_activity()
+        MONITOR_INTERVAL_GAUGE.set(interval)
+        self._schedule_run_within(interval)
+
+    def on_notification(self, identifier: str):
+        """
+        Schedules a refresh of the approvals affected by a webhook notification, once no further notifications
+        arrived for NOTIFICATION_DEBOUNCE_SECONDS, but at most NOTIFICATION_MAX_DELAY_SECONDS after the first one
+        :param identifier: identifier of the notification
+        """
+        self.notify_activity()
+        with self._lock:
+            now = time.monotonic()
+            if len(self._notified_identifiers) == 0:
+                self._first_notification_at = now
+            self._notified_identifiers.add(identifier)
+            delay = min(NOTIFICATION_DEBOUNCE_SECONDS,
+                        self._first_notification_at + NOTIFICATION_MAX_DELAY_SECONDS - now)
+            self._schedule_run_in(max(0.0, delay))
+
+    def _on_leadership_changed(self, leader: bool):
+        if leader:
+            # take over right away
+            self._schedule_run_within(0)
+
+    def _next_interval(self) -> float:
+        with self._lock:
+            if len(self._notified_identifiers) > 0:
+                # notifications arrived during the last run
+                return NOTIFICATION_DEBOUNCE_SECONDS
+            if self._refreshed_since_poll:
+                # refreshing notified approvals doesn't postpone the next complete poll
+                return max(0.0, min(self._adaptive_interval.current, self._poll_due_at - time.monotonic()))
+        return self._adaptive_interval.current
+
+    def _on_run_finished(self, approvals: List[Approval], changed: bool, polled: bool = True):
+        pending = any(map(lambda x: not x.rejected and not x.archived and x.votesReceived < x.votesRequired,
+                          approvals))
+        interval = self._adaptive_interval.on_run(changed=changed, pending=pending)
+        MONITOR_INTERVAL_GAUGE.set(interval)
+        if polled:
+            self._poll_due_at = time.monotonic() + interval
+        self._refreshed_since_poll = not polled
 
     @APPROVAL_WATCHER_TIME.time()
     async def _run(self):
         """
         Called repeatedly
         """
-        active = self._api_client.get_approvals(rejected=False, archived=False)
+        if self._shard_coordinator is not None and not self._shard_coordinator.is_converged:
+            # until all replicas know about each other, each one considers itself the owner of every chat
+            LOGGER.debug("Waiting for the cluster membership to converge")
+            return
 
-        try:
-            # update existing messages
-            await self._bot.update_messages()
-        except Exception as ex:
-            LOGGER.exception(ex)
+        with self._lock:
+            notified_identifiers = self._notified_identifiers
+            self._notified_identifiers = set()
+
+        if self._leader_elector is not None and not self._leader_elector.is_leader:
+            # the leader polls and notifies, messages sent by it can't be updated by this replica anyway
+            self._following = True
+            return
+        if self._following:
+            # continue where the previous leader left off, if it shared its checkpoint
+            self._following = False
+            self._old = self._checkpoint.load() if self._checkpoint is not None else None
+
+        approvals = self._api_client.get_approvals()
+
+        if self._old is not None and len(notified_identifiers) > 0 and time.monotonic() < self._poll_due_at:
+            await self._refresh_notified(approvals, notified_identifiers)
+            return
 
         if self._old is None:
-            self._old = active
+            self._old = approvals
+            self._update_checkpoint(approvals, force=True)
+            self._on_run_finished(approvals, changed=False)
+            return
+
+        if approvals is self._old and len(notified_identifiers) == 0:
+            # the api client returns the previous snapshot if the response didn't change,
+            # but the remaining time shown in messages still counts down
+            await self._update_messages(approvals, outdated={}, removed=[])
+            self._update_checkpoint(None, force=False)
+            self._on_run_finished(approvals, changed=False)
             return
 
-        new_pending = filter_new_by_key(self._old, active, key=lambda x: x.id)
-        self._old = active
+        diff = diff_by_key(self._old, approvals, key=lambda x: x.id, fields=APPROVAL_DIFF_FIELDS)
+        self._old = approvals
 
+        # update messages of changed approvals, and those affected by webhook notifications
+        outdated = {change.new.id: change.new for change in diff.changed}
+        notified_ids = set().union(*map(self._bot.get_tracked_approval_ids, notified_identifiers))
+        for approval in approvals:
+            if approval.id in notified_ids:
+                outdated.setdefault(approval.id, approval)
+
+        await self._update_messages(approvals, outdated=outdated, removed=diff.removed)
+
+        new_pending = list(filter(lambda x: not x.rejected and not x.archived, diff.added))
         for item in new_pending:
             NEW_PENDING_APPROVAL_COUNTER.inc()
             await self._bot.on_new_pending_approval(item)
+
+        changed = len(diff.added) > 0 or len(diff.removed) > 0 or len(diff.changed) > 0
+        # persist notified approvals right away to avoid replaying them after a restart,
+        # other changes are written in batches
+        self._update_checkpoint(approvals if changed else None, force=len(new_pending) > 0)
+        self._on_run_finished(approvals, changed=changed)
+
+    async def _refresh_notified(self, approvals: List[Approval], notified_identifiers: Set[str]):
+        """
+        Only refreshes the approvals affected by webhook notifications,
+        all others are compared with the next complete poll
+        :param approvals: the current snapshot
+        :param notified_identifiers: identifiers of the webhook notifications
+        """
+        keys = set(map(identifier_without_version, notified_identifiers))
+
+        def is_affected(approval: Approval) -> bool:
+            return identifier_without_version(approval.identifier) in keys
+
+        old_affected = list(filter(is_affected, self._old))
+        affected = list(filter(is_affected, approvals))
+        diff = diff_by_key(old_affected, affected, key=lambda x: x.id, fields=APPROVAL_DIFF_FIELDS)
+        # keep the previous state of unaffected approvals, so their changes are picked up by the next poll
+        self._old = [x for x in self._old if not is_affected(x)] + affected
+
+        outdated = {change.new.id: change.new for change in diff.changed}
+        notified_ids = set().union(*map(self._bot.get_tracked_approval_ids, notified_identifiers))
+        for approval in affected:
+            if approval.id in notified_ids:
+                outdated.setdefault(approval.id, approval)
+
+        await self._update_messages(affected, outdated=outdated, removed=diff.removed)
+
+        new_pending = list(filter(lambda x: not x.rejected and not x.archived, diff.added))
+        for item in new_pending:
+            NEW_PENDING_APPROVAL_COUNTER.inc()
+            await self._bot.on_new_pending_approval(item)
+
+        changed = len(diff.added) > 0 or len(diff.removed) > 0 or len(diff.changed) > 0
+        self._update_checkpoint(self._old if changed else None, force=len(new_pending) > 0)
+        self._on_run_finished(approvals, changed=changed, polled=False)
+
+    async def _update_messages(self, approvals: List[Approval], outdated: Dict[str, Approval],
+                               removed: List[Approval]):
+        """
+        Updates the messages of outdated approvals and closes those, which can't be voted on anymore
+        :param approvals: the current snapshot
+        :param outdated: approvals whose messages need an update, by id
+        :param removed: approvals, which have been removed since the last run
+        """
+        for approval in approvals:
+            if self._bot.needs_deadline_update(approval):
+                outdated.setdefault(approval.id, approval)
+
+        expired = [x for x in outdated.values() if not x.archived and not x.rejected
+                   and deadline_remaining_bucket(x.deadline) <= 0]
+        expired_ids = set(map(lambda x: x.id, expired))
+        try:
+            await self._bot.update_messages([x for x in outdated.values() if x.id not in expired_ids])
+        except Exception as ex:
+            LOGGER.exception(ex)
+        try:
+            await self._bot.close_messages(list(removed) + expired)
+        except Exception as ex:
+            LOGGER.exception(ex)
+
+    def _update_checkpoint(self, approvals: Optional[List[Approval]], force: bool):
+        """
+        Updates the checkpoint (if enabled) and writes it, if necessary
+        :param approvals: the current snapshot, None if it didn't change
+        :param force: whether to write the checkpoint immediately
+        """
+        if self._checkpoint is None:
+            return
+        try:
+            if approvals is not None:
+                self._checkpoint.update(approvals)
+            self._checkpoint.flush(force=force)
+        except Exception as ex:
+            LOGGER.exception(ex)
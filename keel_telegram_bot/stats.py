@@ -1,6 +1,6 @@
 from typing import List
 
-from prometheus_client import Summary, Counter
+from prometheus_client import Summary, Counter, Gauge
 from prometheus_client.metrics import MetricWrapperBase
 
 from keel_telegram_bot.const import *
@@ -14,14 +14,54 @@ COMMAND_TIME_UPDATE = COMMAND_TIME.labels(command=COMMAND_UPDATE[0])
 COMMAND_TIME_APPROVE = COMMAND_TIME.labels(command=COMMAND_APPROVE[0])
 COMMAND_TIME_REJECT = COMMAND_TIME.labels(command=COMMAND_REJECT[0])
 COMMAND_TIME_DELETE = COMMAND_TIME.labels(command=COMMAND_DELETE[0])
+COMMAND_TIME_APPROVE_ALL = COMMAND_TIME.labels(command=COMMAND_APPROVE_ALL[0])
+COMMAND_TIME_REJECT_ALL = COMMAND_TIME.labels(command=COMMAND_REJECT_ALL[0])
+COMMAND_TIME_DELETE_ALL = COMMAND_TIME.labels(command=COMMAND_DELETE_ALL[0])
 COMMAND_TIME_STATS = COMMAND_TIME.labels(command=COMMAND_STATS)
 
+COMMAND_BUDGET_EXCEEDED_COUNTER = Counter('command_budget_exceeded',
+                                          'Counts commands that exceeded their overall latency budget', ['command'])
+
 WATCHER_TIME = Summary('watcher_processing_seconds', 'Time spent in a watcher', ['type'])
 APPROVAL_WATCHER_TIME = WATCHER_TIME.labels(type="approval")
 
+MONITOR_INTERVAL_GAUGE = Gauge('monitor_interval_seconds', 'Current polling interval of the approval monitor')
+
+AWAITING_RESPONSE_GAUGE = Gauge('reply_keyboard_awaiting_responses',
+                                'Number of users with a pending reply keyboard selection')
+
+UPDATE_QUEUE_DEPTH_GAUGE = Gauge('telegram_update_queue_depth',
+                                 'Number of telegram updates being processed or waiting, by chat or user', ['key'])
+
+LEADER_GAUGE = Gauge('leader', 'Whether this replica is the leader, which sends approval notifications')
+LEADER_TRANSITION_COUNTER = Counter('leader_transitions', 'Counts changes of the leadership of this replica',
+                                    ['leader'])
+
+SHARD_MEMBERS_GAUGE = Gauge('shard_members', 'Number of live replicas chats are distributed among')
+SHARD_REBALANCE_COUNTER = Counter('shard_rebalances', 'Counts reassignments of chats due to membership changes')
+
+OUTBOX_PENDING_GAUGE = Gauge('outbox_pending', 'Number of outgoing messages waiting to be delivered')
+OUTBOX_SENT_COUNTER = Counter('outbox_sent', 'Counts delivered outgoing messages', ['kind'])
+OUTBOX_RETRY_COUNTER = Counter('outbox_retries', 'Counts failed delivery attempts that are retried', ['kind'])
+OUTBOX_DEAD_LETTER_COUNTER = Counter('outbox_dead_letters', 'Counts outgoing messages that could not be delivered',
+                                     ['kind'])
+
+CONFIG_RELOAD_COUNTER = Counter('config_reloads', 'Counts configuration reloads', ['result'])
+
 NEW_PENDING_APPROVAL_COUNTER = Counter('keel_new_pending_approval',
                                        'Counts new pending approvals recognized by this bot')
 
+KEEL_CIRCUIT_BREAKER_STATE = Gauge('keel_circuit_breaker_state',
+                                   'State of the keel api circuit breaker (0: closed, 1: half-open, 2: open)')
+
+KEEL_UNCHANGED_PAYLOAD_COUNTER = Counter('keel_unchanged_payloads',
+                                        'Counts keel responses that were identical to the previous one', ['endpoint'])
+
+KEEL_RESPONSE_WIRE_BYTES_COUNTER = Counter('keel_response_wire_bytes',
+                                          'Bytes of keel response bodies received, before decompression', ['endpoint'])
+KEEL_RESPONSE_DECODED_BYTES_COUNTER = Counter('keel_response_decoded_bytes',
+                                             'Bytes of keel response bodies, after decompression', ['endpoint'])
+
 REST_TIME = Summary('rest_endpoint_processing_seconds', 'Time spent in a rest command handler', ['endpoint'])
 REST_TIME_WEBHOOK = REST_TIME.labels(endpoint=ENDPOINT_WEBHOOK)
 
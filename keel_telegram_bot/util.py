@@ -1,22 +1,25 @@
+import asyncio
+import fnmatch
 import functools
+import itertools
 import logging
 import operator
 import re
 from datetime import datetime, timezone, timedelta
-from typing import List, Any, Tuple, Dict, Callable
+from typing import List, Any, Tuple, Dict, Callable, Iterable, NamedTuple, Optional, Set, Awaitable
 
 from telegram import Bot, Message, LinkPreviewOptions
 from telegram._utils.types import ReplyMarkup
 
+from keel_telegram_bot.budget import telegram_timeouts
 from keel_telegram_bot.client.approval import Approval
 from keel_telegram_bot.client.resource import Resource
 from keel_telegram_bot.client.tracked_image import TrackedImage
-from keel_telegram_bot.config import Config
+from keel_telegram_bot.client.types import SemverPolicy, SemverPolicyType
+from keel_telegram_bot.const import TELEGRAM_MESSAGE_LENGTH_LIMIT
 
 LOGGER = logging.getLogger(__name__)
 
-CONFIG = Config()
-
 
 def _is_filtered_for(filters: List[Dict], chat_id: str, identifier: str) -> bool:
     for config in filters:
@@ -51,6 +54,19 @@ def format_for_single_line_log(text: str) -> str:
     return " ".join(text.split())
 
 
+def split_message(message: str) -> List[str]:
+    """
+    Replaces emoji aliases and splits a message into parts, which fit into a single telegram message
+    :param message: the message (may contain emoji aliases)
+    :return: message parts
+    """
+    from emoji import emojize
+
+    emojized_text = emojize(message, language='alias')
+    return [emojized_text[i:i + TELEGRAM_MESSAGE_LENGTH_LIMIT]
+            for i in range(0, len(emojized_text), TELEGRAM_MESSAGE_LENGTH_LIMIT)]
+
+
 async def send_message(
     bot: Bot, chat_id: str, message: str, parse_mode: str = None, reply_to: int = None,
     menu: ReplyMarkup = None,
@@ -66,20 +82,17 @@ async def send_message(
     :param menu: inline keyboard menu markup
     :param link_preview_options: link preview options
     """
-    from emoji import emojize
-
-    emojized_text = emojize(message, language='alias')
-
     # automatically split long messages
     messages = []
-    for i in range(0, len(emojized_text), 4096):
-        message_part = emojized_text[i:i + 4096]
+    for message_part in split_message(message):
 
         message = await bot.send_message(
             chat_id=chat_id, parse_mode=parse_mode, text=message_part,
             reply_to_message_id=reply_to,
             reply_markup=menu,
-            link_preview_options=link_preview_options
+            link_preview_options=link_preview_options,
+            # shrink timeouts to the remaining budget of the current command (if any)
+            **telegram_timeouts()
         )
         messages.append(message)
 
@@ -115,6 +128,216 @@ def fuzzy_match(term: str, choices: List[Any], limit: int = None, key=lambda x:
     return result
 
 
+def identifier_without_version(identifier: str) -> str:
+    """
+    Removes the version (tag) from an identifier, f.ex. "deployment/default/myapp:1.5.5" -> "deployment/default/myapp"
+    :param identifier: approval or resource identifier
+    :return: identifier without version
+    """
+    head, separator, tail = identifier.rpartition("/")
+    return head + separator + tail.split(":", 1)[0]
+
+
+def create_identifier_matcher(pattern: Optional[str], regex: bool = False) -> Callable[[str], bool]:
+    """
+    Creates a function that checks whether an identifier matches the given pattern
+    :param pattern: glob (or regular expression, if regex is True), matching all identifiers if None
+    :param regex: whether to interpret the pattern as a regular expression instead of a glob
+    :return: function returning True for matching identifiers
+    """
+    if pattern is None:
+        return lambda identifier: True
+
+    if regex:
+        compiled = re.compile(pattern)
+        return lambda identifier: compiled.search(identifier) is not None
+
+    compiled = re.compile(fnmatch.translate(pattern))
+    return lambda identifier: compiled.match(identifier) is not None
+
+
+async def run_concurrently(
+    func: Callable[[Any], Awaitable[Any]], items: Iterable[Any], limit: int
+) -> List[Tuple[Any, Optional[Exception]]]:
+    """
+    Runs the given function for each item, with at most "limit" invocations running at the same time
+    :param func: async function to call with each item
+    :param items: the items to process
+    :param limit: maximum number of concurrent invocations
+    :return: list of (item, exception) tuples in the order of items, exception is None on success
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item) -> Tuple[Any, Optional[Exception]]:
+        async with semaphore:
+            try:
+                await func(item)
+                return item, None
+            except Exception as ex:
+                return item, ex
+
+    return list(await asyncio.gather(*[run(item) for item in items]))
+
+
+def take(items: Iterable[Any], predicate: Optional[Callable[[Any], bool]], limit: Optional[int]) -> List[Any]:
+    """
+    Lazily filters the given items and stops as soon as enough items are found
+    :param items: the items to filter
+    :param predicate: filter function, all items match if None
+    :param limit: maximum number of items to return, unlimited if None
+    :return: the first (up to "limit") matching items
+    """
+    if predicate is not None:
+        items = filter(predicate, items)
+    return list(itertools.islice(items, limit))
+
+
+def take_and_count(items: Iterable[Any], select: Callable[[Iterable[Any]], List[Any]]) -> Tuple[List[Any], int]:
+    """
+    Selects items and counts all of them, without keeping the items that were not selected in memory
+    :param items: the items
+    :param select: function returning the items to keep, f.ex. a bound filter_resources
+    :return: the selected items and the total number of items
+    """
+    items = iter(items)
+    consumed = 0
+
+    def counted():
+        nonlocal consumed
+        for item in items:
+            consumed += 1
+            yield item
+
+    selected = select(counted())
+    remaining = sum(1 for _ in items)
+    return selected, consumed + remaining
+
+
+def filter_resources(resources: Iterable[Resource], pattern: Optional[str], tracked: bool,
+                     limit: Optional[int]) -> List[Resource]:
+    """
+    Returns the first resources matching the given criteria
+    :param resources: the resources to filter
+    :param pattern: (optional) regular expression matching the name, namespace, any image or policy
+    :param tracked: whether to only return tracked resources
+    :param limit: maximum number of resources to return
+    :return: matching resources
+    """
+    compiled = re.compile(pattern) if pattern is not None else None
+    untracked = SemverPolicy(SemverPolicyType.NNone)
+
+    def matches(x: Resource) -> bool:
+        if tracked and x.policy == untracked:
+            return False
+        if compiled is None:
+            return True
+        return (compiled.search(x.name) is not None
+                or compiled.search(x.namespace) is not None
+                or any(compiled.search(image) is not None for image in x.images)
+                or compiled.search(x.policy.value) is not None)
+
+    return take(resources, matches, limit)
+
+
+def filter_tracked_images(images: Iterable[TrackedImage], pattern: Optional[str],
+                          limit: Optional[int]) -> List[TrackedImage]:
+    """
+    Returns the first tracked images matching the given criteria
+    :param images: the tracked images to filter
+    :param pattern: (optional) regular expression matching the image, namespace or policy
+    :param limit: maximum number of tracked images to return
+    :return: matching tracked images
+    """
+    if pattern is None:
+        return take(images, None, limit)
+
+    compiled = re.compile(pattern)
+    return take(images, lambda x: (compiled.search(x.image) is not None
+                                   or compiled.search(x.namespace) is not None
+                                   or compiled.search(x.policy.value) is not None), limit)
+
+
+def image_repository(image: str) -> str:
+    """
+    Normalizes an image reference to its repository, without registry, tag or digest,
+    f.ex. "quay.io/metallb/speaker:v0.14.5" -> "metallb/speaker"
+    :param image: image reference
+    :return: image repository
+    """
+    image = image.split("@", 1)[0]
+    head, separator, tail = image.rpartition("/")
+    image = head + separator + tail.split(":", 1)[0]
+
+    first, separator, rest = image.partition("/")
+    if separator and ("." in first or ":" in first or first == "localhost"):
+        # the first component is a registry host
+        image = rest
+    return image
+
+
+# secondary indexes of resources, values are normalized like the user input they are looked up with
+RESOURCE_INDEX_KEYS = {
+    "namespace": lambda x: (x.namespace,),
+    "kind": lambda x: (x.kind.casefold(),),
+    "policy": lambda x: (x.policy.type_name,),
+    "image": lambda x: map(image_repository, x.images),
+}
+
+# secondary indexes of tracked images, values are normalized like the user input they are looked up with
+TRACKED_IMAGE_INDEX_KEYS = {
+    "namespace": lambda x: (x.namespace,),
+    "policy": lambda x: (x.policy.type_name,),
+    "image": lambda x: (image_repository(x.image),),
+}
+
+
+class Change(NamedTuple):
+    """
+    An item that is present in both snapshots, but differs in at least one field
+    """
+    old: Any
+    new: Any
+    fields: Set[str]
+
+
+class SnapshotDiff(NamedTuple):
+    """
+    Difference between two snapshots of a list of items
+    """
+    added: List[Any]
+    removed: List[Any]
+    changed: List[Change]
+
+
+def diff_by_key(a: Iterable, b: Iterable, key: Callable, fields: Iterable[str] = ()) -> SnapshotDiff:
+    """
+    Compares two snapshots in a single pass over each of them,
+    using the key function to determine a unique identifier for list items
+    :param a: "old" snapshot
+    :param b: "new" snapshot
+    :param key: function to map list items to a unique identifier
+    :param fields: names of the attributes to compare for items present in both snapshots
+    :return: added, removed and changed items, in the order of their snapshot
+    """
+    fields = tuple(fields)
+    old_items = {key(item): item for item in a}
+
+    added = []
+    changed = []
+    for new_item in b:
+        old_item = old_items.pop(key(new_item), None)
+        if old_item is None:
+            added.append(new_item)
+            continue
+
+        changed_fields = {field for field in fields if getattr(old_item, field) != getattr(new_item, field)}
+        if len(changed_fields) > 0:
+            changed.append(Change(old=old_item, new=new_item, fields=changed_fields))
+
+    removed = list(old_items.values())
+    return SnapshotDiff(added=added, removed=removed, changed=changed)
+
+
 def filter_new_by_key(a: List, b: List, key: Callable) -> List:
     """
     Returns a list of all items, that are new in b when compared to a,
@@ -124,14 +347,47 @@ def filter_new_by_key(a: List, b: List, key: Callable) -> List:
     :param key: function to map list items to a unique identifier
     :return: new list items
     """
-    a_ids = set(map(key, a))
-    b_ids = set(map(key, b))
-    new_ids = b_ids - a_ids
+    return diff_by_key(a, b, key).added
+
+
+class ApprovalGroups(NamedTuple):
+    """
+    Approvals grouped by their state
+    """
+    pending: List[Approval]
+    approved: List[Approval]
+    rejected: List[Approval]
+    archived: List[Approval]
+
+
+def group_approvals_by_state(
+    items: Iterable[Approval], predicate: Optional[Callable[[Approval], bool]] = None
+) -> ApprovalGroups:
+    """
+    Groups approvals by their state in a single pass.
+    Rejected and archived are not exclusive, an item can be part of both groups.
+    Items that are neither rejected nor archived are either pending (votes missing) or approved.
+    :param items: the approvals to group
+    :param predicate: optional filter, items for which it returns False are skipped
+    :return: grouped approvals, preserving the original order within each group
+    """
+    result = ApprovalGroups(pending=[], approved=[], rejected=[], archived=[])
+    for item in items:
+        if predicate is not None and not predicate(item):
+            continue
+
+        if item.rejected:
+            result.rejected.append(item)
+        if item.archived:
+            result.archived.append(item)
+        if item.rejected or item.archived:
+            continue
+
+        if item.votesReceived < item.votesRequired:
+            result.pending.append(item)
+        else:
+            result.approved.append(item)
 
-    result = []
-    for id in new_ids:
-        item_in_b = list(filter(lambda x: key(x) == id, b))[0]
-        result.append(item_in_b)
     return result
 
 
@@ -149,7 +405,7 @@ def approval_to_str(data: Approval) -> str:
     deadline_diff = timedelta(seconds=(deadline.replace(microsecond=0) - now_utc).total_seconds())
 
     deadline_abs_str = deadline.strftime('%m/%d %H:%M:%S')
-    deadline_remaining_str = deadline_diff_to_str(deadline_diff)
+    deadline_remaining_str = deadline_diff_to_str(deadline_diff) if deadline_diff.total_seconds() > 0 else "expired"
 
     text = "\n".join([
         f"<b>{message}</b>",
@@ -203,6 +459,23 @@ def tracked_image_to_str(data: TrackedImage) -> str:
     return f"{data.provider}/{data.namespace}/{data.image} ({data.policy.value})"
 
 
+def deadline_remaining_bucket(deadline: datetime) -> int:
+    """
+    Rounds the remaining time until a deadline down to full days, hours or minutes, depending on how far
+    away it is. Used to decide when a displayed countdown is outdated enough to be worth an update.
+    :param deadline: the deadline
+    :return: rounded number of remaining seconds, 0 if the deadline has passed
+    """
+    remaining = (deadline - datetime.now(tz=timezone.utc)).total_seconds()
+    if remaining <= 0:
+        return 0
+    for unit in (86400, 3600, 60):
+        if remaining >= unit:
+            return int(remaining // unit * unit)
+    # less than a minute left
+    return 1
+
+
 def deadline_diff_to_str(deadline_diff) -> str:
     units = []
 
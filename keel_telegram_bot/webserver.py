@@ -1,14 +1,22 @@
 import asyncio
 import json
 import logging
+from typing import Optional
 
 import aiohttp
 from aiohttp import web
 from aiohttp.web_response import Response
+from telegram import Update
 
 from keel_telegram_bot.bot import KeelTelegramBot
+from keel_telegram_bot.bot.update_processor import get_routing_key
+from keel_telegram_bot.cluster.leader import LeaderElector
+from keel_telegram_bot.cluster.queue import QueueBackend
+from keel_telegram_bot.cluster.shard import ShardCoordinator
 from keel_telegram_bot.config import Config
-from keel_telegram_bot.const import ENDPOINT_WEBHOOK
+from keel_telegram_bot.const import ENDPOINT_WEBHOOK, TELEGRAM_SECRET_TOKEN_HEADER, KEEL_NOTIFICATION_QUEUE, \
+    CLUSTER_QUEUE_POLL_INTERVAL, CLUSTER_QUEUE_BATCH_SIZE, TELEGRAM_UPDATE_QUEUE
+from keel_telegram_bot.monitoring.monitor import Monitor
 
 LOGGER = logging.getLogger(__name__)
 routes = web.RouteTableDef()
@@ -16,10 +24,28 @@ routes = web.RouteTableDef()
 
 class WebsocketServer:
     bot = None
+    monitor = None
+    leader_elector = None
+    shard_coordinator = None
+    queue = None
 
-    def __init__(self, config: Config, bot: KeelTelegramBot):
+    def __init__(self, config: Config, bot: KeelTelegramBot, monitor: Monitor,
+                 leader_elector: Optional[LeaderElector] = None, queue: Optional[QueueBackend] = None,
+                 shard_coordinator: Optional[ShardCoordinator] = None):
+        """
+        :param config: configuration object
+        :param bot: the bot
+        :param monitor: the approval monitor
+        :param leader_elector: only the leader handles keel notifications (and telegram updates without sharding)
+        :param queue: queues shared by all replicas, to hand over work to the replica responsible for it
+        :param shard_coordinator: telegram updates are handled by the replica the chat is assigned to, if set
+        """
         self.config = config
         WebsocketServer.bot = bot
+        WebsocketServer.monitor = monitor
+        WebsocketServer.leader_elector = leader_elector
+        WebsocketServer.shard_coordinator = shard_coordinator
+        WebsocketServer.queue = queue
 
     async def start(self):
         host = "0.0.0.0"  # self.config.SERVER_HOST.value,
@@ -36,14 +62,96 @@ class WebsocketServer:
         )
         await site.start()
 
+        if WebsocketServer.queue is not None:
+            # runs forever
+            return await self._take_handed_over_work()
+
         # wait forever
         return await asyncio.Event().wait()
 
+    @staticmethod
+    async def _take_handed_over_work():
+        """
+        Handles the telegram updates of the chats this replica is responsible for and, while this replica is
+        the leader, keel notifications, which were received by any replica
+        """
+        queue = WebsocketServer.queue
+        while True:
+            await asyncio.sleep(CLUSTER_QUEUE_POLL_INTERVAL)
+            try:
+                updates = await asyncio.to_thread(
+                    queue.take, TELEGRAM_UPDATE_QUEUE, CLUSTER_QUEUE_BATCH_SIZE, WebsocketServer._is_responsible)
+                for data in updates:
+                    await WebsocketServer.bot.on_webhook_update(data)
+
+                leader_elector = WebsocketServer.leader_elector
+                if leader_elector is None or not leader_elector.is_leader:
+                    continue
+                notifications = await asyncio.to_thread(
+                    queue.take, KEEL_NOTIFICATION_QUEUE, CLUSTER_QUEUE_BATCH_SIZE, lambda key: True)
+                for data in notifications:
+                    await WebsocketServer._handle_notification(data)
+            except Exception as ex:
+                LOGGER.exception(ex)
+
+    @staticmethod
+    def _is_responsible(routing_key: Optional[str]) -> bool:
+        """
+        :param routing_key: chat (or user) id of a telegram update
+        :return: True if this replica handles the telegram update
+        """
+        if WebsocketServer.shard_coordinator is not None:
+            # the replica that sent the messages of a chat is the only one that can update them
+            return routing_key is None or WebsocketServer.shard_coordinator.owns_chat(routing_key)
+        if WebsocketServer.leader_elector is not None:
+            return WebsocketServer.leader_elector.is_leader
+        return True
+
+    @staticmethod
+    async def _handle_notification(data: dict):
+        """
+        Sends a keel notification to all chats and refreshes the approvals it affects
+        :param data: notification data
+        """
+        identifier = data.get("identifier", "")
+        if identifier != "":
+            # refresh affected approvals right away instead of waiting for the next monitor run
+            WebsocketServer.monitor.on_notification(identifier)
+        await WebsocketServer.bot.on_notification(data)
+
     def _create_app(self) -> web.Application:
         app = web.Application(middlewares=[])
         app.add_routes(routes)
+        webhook_path = WebsocketServer.bot.webhook_path
+        if webhook_path is not None:
+            app.router.add_post(webhook_path, WebsocketServer.telegram_update)
         return app
 
+    @staticmethod
+    async def telegram_update(request: web.Request) -> Response:
+        """
+        Receives telegram updates, if the bot is configured to use a webhook
+        """
+        token = request.headers.get(TELEGRAM_SECRET_TOKEN_HEADER)
+        if not WebsocketServer.bot.is_valid_webhook_secret_token(token):
+            LOGGER.warning("Received telegram update with invalid secret token")
+            return Response(status=403, text="Invalid secret token")
+
+        try:
+            data = await request.json()
+        except ValueError:
+            LOGGER.error("Received telegram update with invalid body")
+            return Response(status=400, text="Invalid request body")
+
+        if WebsocketServer.queue is not None:
+            # conversation state (f.ex. reply keyboard selections) and the order of the updates of a chat
+            # are only kept within a replica, so all updates of a chat are handled by the same one
+            routing_key = get_routing_key(Update.de_json(data, None))
+            await asyncio.to_thread(WebsocketServer.queue.put, TELEGRAM_UPDATE_QUEUE, routing_key, data)
+            return Response(text="OK")
+        await WebsocketServer.bot.on_webhook_update(data)
+        return Response(text="OK")
+
     # @app.route('/', methods=['GET', 'POST'])
     # @app.route('/<path:path>', methods=['GET', 'POST'])
     # @routes.get(ENDPOINT_WEBHOOK)
@@ -60,5 +168,10 @@ class WebsocketServer:
             return Response(text="Request body is empty!")
 
         data = json.loads(body)
-        await WebsocketServer.bot.on_notification(data)
+        leader_elector = WebsocketServer.leader_elector
+        if leader_elector is not None and not leader_elector.is_leader:
+            LOGGER.debug("Not the leader, handing over notification")
+            await asyncio.to_thread(WebsocketServer.queue.put, KEEL_NOTIFICATION_QUEUE, None, data)
+            return Response(text="OK")
+        await WebsocketServer._handle_notification(data)
         return Response(text="OK")
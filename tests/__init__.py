@@ -1,5 +1,10 @@
+import copy
+import json
+import os
 import unittest
+from typing import List
 
+from keel_telegram_bot.client.approval import Approval
 from keel_telegram_bot.config import Config
 
 
@@ -13,3 +18,94 @@ class TestBase(unittest.TestCase):
             YamlSource("keel-telegram-bot.yaml", "./tests/")
         ]
     )
+
+
+DEMO_REQUESTS_PATH = os.path.join(os.path.dirname(__file__), "client", "demo_requests")
+
+APPROVAL_TEMPLATE = {
+    "id": "48d6da3e-e4c9-4d12-8562-b7975e805d80",
+    "identifier": "deployment/local-path-storage/local-path-provisioner:v0.0.19",
+    "currentVersion": "v0.0.17",
+    "newVersion": "v0.0.19",
+    "votesRequired": 1,
+    "votesReceived": 0,
+    "deadline": "2020-12-18 23:16:14.811933+00:00",
+    "message": "New image is available for resource local-path-storage/local-path-provisioner (v0.0.17 -> v0.0.19).",
+    "provider": "kubernetes",
+    "event": "image_update",
+    "digest": "sha256:3b4f4b3",
+    "archived": False,
+    "voters": [],
+    "rejected": False,
+    "createdAt": "2020-12-11 23:16:14.811933+00:00",
+    "updatedAt": "2020-12-11 23:16:14.811933+00:00",
+}
+
+
+def create_approval(id: str, **fields) -> Approval:
+    """
+    Creates an approval based on APPROVAL_TEMPLATE
+    :param id: approval id, also used as the resource name of the identifier
+    :param fields: fields to override, in their api representation
+    :return: the approval
+    """
+    return Approval.from_dict({
+        **copy.deepcopy(APPROVAL_TEMPLATE),
+        "id": id,
+        "identifier": f"deployment/default/{id}:v0.0.19",
+        **fields,
+    })
+
+
+def load_demo_request(name: str) -> List[dict]:
+    with open(os.path.join(DEMO_REQUESTS_PATH, name)) as f:
+        return json.load(f)
+
+
+def create_resource_dicts(count: int) -> List[dict]:
+    """
+    Creates a realistic list of resource dicts by repeating the demo request with unique identifiers
+    :param count: number of resources
+    :return: list of resource dicts, like they are returned by the keel api
+    """
+    demo = load_demo_request("resources.json")
+    result = []
+    for i in range(count):
+        item = copy.deepcopy(demo[i % len(demo)])
+        item["name"] = f"{item['name']}-{i}"
+        item["identifier"] = f"{item['kind']}/{item['namespace']}/{item['name']}"
+        result.append(item)
+    return result
+
+
+def create_tracked_image_dicts(count: int) -> List[dict]:
+    """
+    Creates a realistic list of tracked image dicts by repeating the demo request with unique images
+    :param count: number of tracked images
+    :return: list of tracked image dicts, like they are returned by the keel api
+    """
+    demo = load_demo_request("tracked-images.json")
+    result = []
+    for i in range(count):
+        item = copy.deepcopy(demo[i % len(demo)])
+        item["image"] = f"{item['image']}-{i}"
+        result.append(item)
+    return result
+
+
+def create_approval_dicts(count: int) -> List[dict]:
+    """
+    Creates a list of approval dicts in all possible states
+    :param count: number of approvals
+    :return: list of approval dicts, like they are returned by the keel api
+    """
+    result = []
+    for i in range(count):
+        item = copy.deepcopy(APPROVAL_TEMPLATE)
+        item["id"] = f"{i:08d}-e4c9-4d12-8562-b7975e805d80"
+        item["identifier"] = f"deployment/namespace-{i % 20}/app-{i}:v0.0.19"
+        item["archived"] = i % 4 == 1
+        item["rejected"] = i % 4 == 2
+        item["votesReceived"] = 1 if i % 4 == 3 else 0
+        result.append(item)
+    return result
@@ -0,0 +1,143 @@
+import gzip
+import json
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from unittest.mock import patch
+
+import requests
+
+from keel_telegram_bot.client.api_client import KeelApiClient
+from keel_telegram_bot.client.resilience import CircuitBreaker, CircuitState
+from keel_telegram_bot.stats import KEEL_UNCHANGED_PAYLOAD_COUNTER, KEEL_RESPONSE_WIRE_BYTES_COUNTER, \
+    KEEL_RESPONSE_DECODED_BYTES_COUNTER
+from tests import TestBase, create_approval_dicts, create_resource_dicts
+
+
+def _create_response(data) -> requests.Response:
+    response = requests.Response()
+    response.url = "http://localhost:9300/v1/approvals"
+    response.status_code = 200
+    response._content = json.dumps(data).encode("utf-8")
+    return response
+
+
+class ApiClientSnapshotTest(TestBase):
+
+    def setUp(self):
+        self.client = KeelApiClient("localhost", 9300, False, "user", "password")
+
+    def _get_approvals(self, data, **kwargs):
+        with patch.object(self.client, "_send_request", return_value=_create_response(data)):
+            return self.client.get_approvals(**kwargs)
+
+    def test_unchanged_payload_returns_previous_snapshot(self):
+        data = create_approval_dicts(10)
+        counter = KEEL_UNCHANGED_PAYLOAD_COUNTER.labels(endpoint="/v1/approvals")
+        hits = counter._value.get()
+
+        first = self._get_approvals(data)
+        second = self._get_approvals(data)
+
+        self.assertEqual(10, len(first))
+        self.assertIs(first, second)
+        self.assertEqual(hits + 1, counter._value.get())
+
+    def test_changed_payload_is_decoded(self):
+        data = create_approval_dicts(10)
+        first = self._get_approvals(data)
+
+        data[0]["votesReceived"] = 1
+        second = self._get_approvals(data)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(1, second[0].votesReceived)
+
+    def test_filtered_approvals_do_not_modify_snapshot(self):
+        data = create_approval_dicts(8)
+
+        pending = self._get_approvals(data, rejected=False, archived=False)
+        everything = self._get_approvals(data)
+
+        self.assertEqual(4, len(pending))
+        self.assertEqual(8, len(everything))
+
+
+class ApiClientCircuitBreakerTest(TestBase):
+
+    def test_invalid_probe_releases_half_open_circuit(self):
+        # an url requests refuses to send
+        client = KeelApiClient("[invalid", 9300, False, "user", "password")
+        client._circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        client._circuit_breaker.before_request()
+        client._circuit_breaker.on_failure()
+        self.assertEqual(CircuitState.Open, client._circuit_breaker.state)
+
+        self.assertRaises(requests.exceptions.InvalidURL, client.get_approvals)
+
+        # the next request is let through as another probe
+        client._circuit_breaker.before_request()
+        self.assertEqual(CircuitState.HalfOpen, client._circuit_breaker.state)
+
+
+class _KeelStandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves the same payload for every GET request, gzip compressed if the client accepts it
+    """
+    payload = b"[]"
+
+    def do_GET(self):
+        body = self.payload
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ApiClientCompressionTest(TestBase):
+    COUNT = 5000
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = create_resource_dicts(cls.COUNT)
+        _KeelStandInHandler.payload = json.dumps(cls.data).encode("utf-8")
+        cls.server = HTTPServer(("127.0.0.1", 0), _KeelStandInHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.client = KeelApiClient("127.0.0.1", self.server.server_port, False, "user", "password")
+
+    def _measure(self, func):
+        wire = KEEL_RESPONSE_WIRE_BYTES_COUNTER.labels(endpoint="/v1/resources")
+        decoded = KEEL_RESPONSE_DECODED_BYTES_COUNTER.labels(endpoint="/v1/resources")
+        wire_before, decoded_before = wire._value.get(), decoded._value.get()
+        result = func()
+        return result, wire._value.get() - wire_before, decoded._value.get() - decoded_before
+
+    def test_compressed_response(self):
+        resources, wire_bytes, decoded_bytes = self._measure(self.client.get_resources)
+
+        self.assertEqual(self.COUNT, len(resources))
+        self.assertEqual(self.data[-1]["identifier"], resources[-1].identifier)
+        self.assertEqual(len(_KeelStandInHandler.payload), decoded_bytes)
+        self.assertLess(wire_bytes, decoded_bytes / 5)
+        print(f"Transferred {self.COUNT} resources: {wire_bytes / 1024:.0f} KiB on the wire, "
+              f"{decoded_bytes / 1024:.0f} KiB decoded ({100 - wire_bytes * 100 / decoded_bytes:.1f}% saved)")
+
+    def test_compressed_stream(self):
+        resources, wire_bytes, decoded_bytes = self._measure(lambda: list(self.client.iter_resources()))
+
+        self.assertEqual(self.COUNT, len(resources))
+        self.assertEqual(len(_KeelStandInHandler.payload), decoded_bytes)
+        self.assertLess(wire_bytes, decoded_bytes / 5)
@@ -0,0 +1,48 @@
+from keel_telegram_bot.client.index import SnapshotIndex, SnapshotIndexCache
+from keel_telegram_bot.client.resource import Resource
+from keel_telegram_bot.util import RESOURCE_INDEX_KEYS, filter_resources, take_and_count
+from tests import TestBase, load_demo_request
+
+
+class SnapshotIndexTest(TestBase):
+
+    def setUp(self):
+        self.items = [Resource.from_dict(item) for item in load_demo_request("resources.json")]
+        self.index = SnapshotIndex(self.items, RESOURCE_INDEX_KEYS)
+
+    def test_lookup_matches_scan(self):
+        self.assertEqual([x for x in self.items if x.namespace == "keel"], self.index.lookup(namespace="keel"))
+        self.assertEqual([x for x in self.items if x.kind == "statefulset"], self.index.lookup(kind="statefulset"))
+        self.assertEqual([x for x in self.items if x.raw_policy.startswith("glob:")], self.index.lookup(policy="glob"))
+        self.assertEqual(
+            [x for x in self.items if "quay.io/metallb/speaker:v0.14.5" in x.images],
+            self.index.lookup(image="metallb/speaker"),
+        )
+
+    def test_lookup_combines_criteria(self):
+        expected = [x for x in self.items if x.namespace == "prometheus" and x.kind == "deployment"]
+
+        self.assertTrue(len(expected) > 0)
+        self.assertEqual(expected, self.index.lookup(namespace="prometheus", kind="deployment", policy=None))
+
+    def test_lookup_without_criteria(self):
+        self.assertIs(self.items, self.index.lookup(namespace=None))
+
+    def test_lookup_unknown_value(self):
+        self.assertEqual([], self.index.lookup(namespace="does-not-exist"))
+
+    def test_cache_is_built_once_per_snapshot(self):
+        cache = SnapshotIndexCache(RESOURCE_INDEX_KEYS)
+        self.assertIsNone(cache.current)
+
+        index = cache.get(self.items)
+        self.assertIs(index, cache.current)
+
+        self.assertIs(index, cache.get(self.items))
+        self.assertIsNot(index, cache.get(list(self.items)))
+
+    def test_take_and_count(self):
+        selected, total = take_and_count(iter(self.items), lambda x: filter_resources(x, None, False, 3))
+
+        self.assertEqual(self.items[:3], selected)
+        self.assertEqual(len(self.items), total)
@@ -0,0 +1,59 @@
+from keel_telegram_bot.client.resilience import CircuitBreaker, CircuitState, KeelUnavailableError, backoff_delays
+from tests import TestBase
+
+
+class CircuitBreakerTest(TestBase):
+
+    def setUp(self):
+        self._now = 0.0
+        self._states = []
+        self._breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout=30,
+            on_state_change=self._states.append,
+            clock=lambda: self._now,
+        )
+
+    def _fail(self):
+        self._breaker.before_request()
+        self._breaker.on_failure()
+
+    def test_opens_after_threshold(self):
+        self._fail()
+        self.assertEqual(CircuitState.Closed, self._breaker.state)
+        self._fail()
+        self.assertEqual(CircuitState.Open, self._breaker.state)
+        self.assertRaises(KeelUnavailableError, self._breaker.before_request)
+
+    def test_success_resets_failures(self):
+        self._fail()
+        self._breaker.before_request()
+        self._breaker.on_success()
+        self._fail()
+        self.assertEqual(CircuitState.Closed, self._breaker.state)
+
+    def test_half_open_probe(self):
+        self._fail()
+        self._fail()
+        self._now = 31
+
+        # only a single probe is let through
+        self._breaker.before_request()
+        self.assertEqual(CircuitState.HalfOpen, self._breaker.state)
+        self.assertRaises(KeelUnavailableError, self._breaker.before_request)
+
+        self._breaker.on_success()
+        self.assertEqual(CircuitState.Closed, self._breaker.state)
+        self.assertEqual([CircuitState.Open, CircuitState.HalfOpen, CircuitState.Closed], self._states)
+
+    def test_failed_probe_opens_again(self):
+        self._fail()
+        self._fail()
+        self._now = 31
+        self._fail()
+        self.assertEqual(CircuitState.Open, self._breaker.state)
+        self._now = 40
+        self.assertRaises(KeelUnavailableError, self._breaker.before_request)
+
+    def test_backoff_delays(self):
+        delays = list(backoff_delays(4, base=0.5, maximum=2, rand=lambda: 1.0))
+        self.assertEqual([0.5, 1.0, 2.0, 2.0], delays)
@@ -0,0 +1,41 @@
+import json
+
+from keel_telegram_bot.client.stream import iter_json_array
+from tests import TestBase
+
+
+def _chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class StreamTest(TestBase):
+
+    def test_all_chunk_sizes(self):
+        data = [{"name": "äöü €", "values": [1, 2.5, None, True]}, 12345, "text, with ] and [", [], {}]
+        payload = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+        for size in range(1, len(payload) + 1):
+            self.assertEqual(data, list(iter_json_array(_chunked(payload, size))), f"chunk size {size}")
+
+    def test_empty(self):
+        self.assertEqual([], list(iter_json_array([b"[", b" ]"])))
+        self.assertEqual([], list(iter_json_array([b"nu", b"ll"])))
+        self.assertEqual([], list(iter_json_array([b" null\n"])))
+
+    def test_is_lazy(self):
+        consumed = []
+
+        def chunks():
+            for chunk in _chunked(json.dumps(list(range(100))).encode("utf-8"), 4):
+                consumed.append(chunk)
+                yield chunk
+
+        items = iter_json_array(chunks())
+
+        self.assertEqual([0, 1], [next(items), next(items)])
+        self.assertLess(len(consumed), 3)
+
+    def test_invalid(self):
+        for payload in [b"{}", b"[1 2]", b"[1,", b"[1] 2", b"[{\"a\": }]"]:
+            with self.assertRaises(ValueError, msg=payload):
+                list(iter_json_array(_chunked(payload, 2)))
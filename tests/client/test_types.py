@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from keel_telegram_bot.client.types import Policy, SemverPolicy, SemverPolicyType, GlobPolicy, RegexPolicy, \
+    NeverPolicy, PollSchedule
+from tests import TestBase
+
+
+class TypesTest(TestBase):
+
+    def test_policy_from_value_is_shared(self):
+        self.assertIs(Policy.from_value("regexp:^1\\."), Policy.from_value("regexp:^1\\."))
+        self.assertIs(Policy.from_value("major"), Policy.from_value("major"))
+
+    def test_policy_from_value_types(self):
+        self.assertIsInstance(Policy.from_value("glob:1.*"), GlobPolicy)
+        self.assertIsInstance(Policy.from_value("regexp:^1\\."), RegexPolicy)
+        self.assertIsInstance(Policy.from_value("never"), NeverPolicy)
+        self.assertIsInstance(Policy.from_value("minor"), SemverPolicy)
+        self.assertEqual(Policy.from_value("unknown"), SemverPolicy(SemverPolicyType.NNone))
+
+    def test_policy_equality(self):
+        self.assertEqual(Policy.from_value("all"), SemverPolicy(SemverPolicyType.All))
+        self.assertNotEqual(Policy.from_value("all"), SemverPolicy(SemverPolicyType.NNone))
+        self.assertNotEqual(Policy.from_value("glob:all"), Policy.from_value("regexp:all"))
+        self.assertEqual(hash(Policy.from_value("patch")), hash(SemverPolicy(SemverPolicyType.Patch)))
+
+    def test_poll_schedule_from_value(self):
+        schedule = PollSchedule.from_value("@every 24h")
+        self.assertIs(schedule, PollSchedule.from_value("@every 24h"))
+        self.assertEqual(schedule, PollSchedule.from_value("24h"))
+        self.assertEqual(timedelta(hours=24), schedule.interval)
+        self.assertEqual("@every 24h", str(schedule))
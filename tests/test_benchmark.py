@@ -0,0 +1,328 @@
+import json
+import os
+import timeit
+import tracemalloc
+import unittest
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Callable, Dict
+
+from keel_telegram_bot.client import parse_api_datetime
+from keel_telegram_bot.client.approval import Approval
+from keel_telegram_bot.client.resource import Resource
+from keel_telegram_bot.client.stream import iter_json_array
+from keel_telegram_bot.client.tracked_image import TrackedImage
+from keel_telegram_bot.client.types import Provider, Policy, Trigger
+from keel_telegram_bot.util import group_approvals_by_state, filter_resources, resource_to_str
+from tests import TestBase, create_approval_dicts, create_resource_dicts, create_tracked_image_dicts
+
+# timing benchmarks depend on the machine, they are only run if this environment variable is set
+benchmark = unittest.skipUnless(os.environ.get("KEEL_TELEGRAM_BOT_BENCHMARK"),
+                                "set KEEL_TELEGRAM_BOT_BENCHMARK=1 to run timing benchmarks")
+
+
+def measure_bytes_per_object(data: List[dict], factory: Callable[[dict], object]) -> float:
+    """
+    Measures the memory retained by the objects created from the given data,
+    after the decoded response itself has been released
+    :param data: list of dicts to convert
+    :param factory: function converting a single dict
+    :return: average number of bytes retained per object
+    """
+    payload = json.dumps(data)
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        response = json.loads(payload)
+        result = [factory(item) for item in response]
+        del response
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(result) == len(data)
+    return (after - before) / len(data)
+
+
+def measure_peak_bytes(func: Callable[[], object]) -> int:
+    """
+    Measures the peak memory allocated while running the given function
+    :param func: the function to measure
+    :return: peak number of bytes allocated in addition to the memory in use before
+    """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert result is not None
+    return peak - before
+
+
+def measure_seconds(func: Callable[[], object], number: int = 5, repeat: int = 3) -> float:
+    """
+    Measures the best average runtime of the given function
+    :param func: the function to measure
+    :param number: number of executions per measurement
+    :param repeat: number of measurements
+    :return: best average runtime in seconds
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+# the models as they were before they were slotted, frozen and interned, to compare against
+@dataclass
+class LegacyApproval:
+    id: str
+    archived: bool
+    provider: Provider
+    identifier: str
+    event: str
+    message: str
+    currentVersion: str
+    newVersion: str
+    digest: str
+    votesRequired: int
+    votesReceived: int
+    voters: List[str]
+    rejected: bool
+    deadline: datetime.date
+    createdAt: datetime.date
+    updatedAt: datetime.date
+
+    @staticmethod
+    def from_dict(data: dict):
+        return LegacyApproval(
+            id=data["id"],
+            archived=data["archived"],
+            provider=Provider(data["provider"]),
+            identifier=data["identifier"],
+            event=data["event"],
+            message=data["message"],
+            currentVersion=data["currentVersion"],
+            newVersion=data["newVersion"],
+            digest=data["digest"],
+            votesRequired=data["votesRequired"],
+            votesReceived=data["votesReceived"],
+            voters=data["voters"],
+            rejected=data["rejected"],
+            deadline=parse_api_datetime(data["deadline"]),
+            createdAt=parse_api_datetime(data["createdAt"]),
+            updatedAt=parse_api_datetime(data["updatedAt"]),
+        )
+
+
+@dataclass
+class LegacyK8SStatus:
+    replicas: int
+    updated_replicas: int
+    ready_replicas: int
+    available_replicas: int
+    unavailable_replicas: int
+
+    @staticmethod
+    def from_dict(data: dict):
+        return LegacyK8SStatus(
+            replicas=data["replicas"],
+            updated_replicas=data["updatedReplicas"],
+            ready_replicas=data["readyReplicas"],
+            available_replicas=data["availableReplicas"],
+            unavailable_replicas=data["unavailableReplicas"],
+        )
+
+
+@dataclass
+class LegacyResource:
+    provider: Provider
+    identifier: str
+    name: str
+    namespace: str
+    kind: str
+    policy: Policy
+    images: List[str]
+    labels: Dict[str, str]
+    annotations: Dict[str, str]
+    status: LegacyK8SStatus
+
+    @staticmethod
+    def from_dict(data: dict):
+        return LegacyResource(
+            provider=Provider.from_value(data["provider"]),
+            identifier=data["identifier"],
+            name=data["name"],
+            namespace=data["namespace"],
+            kind=data["kind"],
+            policy=Policy.from_value(data["policy"]),
+            images=data["images"],
+            labels=data["labels"],
+            annotations=data["annotations"],
+            status=LegacyK8SStatus.from_dict(data["status"]),
+        )
+
+
+@dataclass
+class LegacyTrackedImage:
+    image: str
+    trigger: Trigger
+    poll_schedule: str
+    provider: str
+    namespace: str
+    policy: Policy
+    registry: str
+
+    @staticmethod
+    def from_dict(d: dict):
+        return LegacyTrackedImage(
+            image=d["image"],
+            trigger=Trigger.from_value(d["trigger"]),
+            poll_schedule=d["pollSchedule"],
+            provider=d["provider"],
+            namespace=d["namespace"],
+            policy=Policy.from_value(d["policy"]),
+            registry=d["registry"],
+        )
+
+
+class ModelMemoryBenchmark(TestBase):
+    COUNT = 5000
+
+    def assert_smaller_than_legacy(self, data: List[dict], factory: Callable[[dict], object],
+                                   legacy_factory: Callable[[dict], object]):
+        bytes_per_object = measure_bytes_per_object(data, factory)
+        bytes_per_legacy_object = measure_bytes_per_object(data, legacy_factory)
+        print(f"{factory.__qualname__}: {bytes_per_legacy_object:.0f} -> {bytes_per_object:.0f} bytes/object")
+        self.assertLess(bytes_per_object, bytes_per_legacy_object)
+
+    def test_resource_memory(self):
+        self.assert_smaller_than_legacy(create_resource_dicts(self.COUNT), Resource.from_dict,
+                                        LegacyResource.from_dict)
+
+    def test_tracked_image_memory(self):
+        self.assert_smaller_than_legacy(create_tracked_image_dicts(self.COUNT), TrackedImage.from_dict,
+                                        LegacyTrackedImage.from_dict)
+
+    def test_approval_memory(self):
+        self.assert_smaller_than_legacy(create_approval_dicts(self.COUNT), Approval.from_dict,
+                                        LegacyApproval.from_dict)
+
+
+class ModelDecodingBenchmark(TestBase):
+    COUNT = 5000
+
+    def filter_active(self, data: List[dict]) -> List[Approval]:
+        # equivalent to KeelApiClient.get_approvals(rejected=False, archived=False)
+        items = [Approval.from_dict(item) for item in data]
+        return [x for x in items if not x.rejected and not x.archived]
+
+    def test_approval_filter_does_not_decode_dates(self):
+        items = self.filter_active(create_approval_dicts(self.COUNT))
+
+        self.assertEqual(self.COUNT // 2, len(items))
+        self.assertTrue(all(x._deadline is None for x in items))
+
+    @benchmark
+    def test_approval_filter_decoding(self):
+        data = create_approval_dicts(self.COUNT)
+
+        def filter_active():
+            return self.filter_active(data)
+
+        def filter_active_and_render():
+            return [(x.deadline, x.createdAt, x.updatedAt) for x in filter_active()]
+
+        filter_seconds = measure_seconds(filter_active)
+        render_seconds = measure_seconds(filter_active_and_render)
+        print(f"Approvals ({self.COUNT}): filter {filter_seconds * 1000:.1f}ms, "
+              f"filter + date access {render_seconds * 1000:.1f}ms")
+        # parsing the dates is cheap compared to the rest of the decoding, allow for some noise
+        self.assertLess(filter_seconds, render_seconds * 1.25)
+
+
+class ApprovalGroupingBenchmark(TestBase):
+    COUNT = 10000
+
+    @benchmark
+    def test_group_approvals_by_state(self):
+        items = [Approval.from_dict(item) for item in create_approval_dicts(self.COUNT)]
+
+        def group():
+            return group_approvals_by_state(items, lambda x: not x.identifier.startswith("deployment/namespace-1/"))
+
+        def decode():
+            return [Approval.from_dict(item) for item in create_approval_dicts(self.COUNT)]
+
+        seconds = measure_seconds(group)
+        groups = group()
+        print(f"Grouping {self.COUNT} approvals: {seconds * 1000:.1f}ms "
+              f"(pending: {len(groups.pending)}, approved: {len(groups.approved)}, "
+              f"rejected: {len(groups.rejected)}, archived: {len(groups.archived)})")
+        self.assertEqual((2500, 2500, 2500, 2000),
+                         tuple(map(len, [groups.pending, groups.approved, groups.rejected, groups.archived])))
+        # a single pass over the approvals is cheap compared to decoding them
+        self.assertLess(seconds, measure_seconds(decode, number=1))
+
+
+class ListResourcesBenchmark(TestBase):
+    COUNT = 10000
+
+    @benchmark
+    def test_list_resources_with_limit(self):
+        items = [Resource.from_dict(item) for item in create_resource_dicts(self.COUNT)]
+
+        def list_resources():
+            # equivalent to "/resources -l 10"
+            return "\n\n".join(map(resource_to_str, filter_resources(items, None, False, limit=10)))
+
+        def list_resources_filtered():
+            # equivalent to "/resources -f keel -l 10"
+            return "\n\n".join(map(resource_to_str, filter_resources(items, "keel", False, limit=10)))
+
+        def list_all_resources():
+            return "\n\n".join(map(resource_to_str, filter_resources(items, None, False, limit=None)))
+
+        seconds = measure_seconds(list_resources)
+        filtered_seconds = measure_seconds(list_resources_filtered)
+        all_seconds = measure_seconds(list_all_resources, number=1)
+        print(f"Listing resources ({self.COUNT}, limit 10): {seconds * 1000:.2f}ms, "
+              f"with filter {filtered_seconds * 1000:.2f}ms, without limit {all_seconds * 1000:.2f}ms")
+        # only the listed resources are rendered
+        self.assertLess(seconds, all_seconds / 10)
+        self.assertLess(filtered_seconds, all_seconds)
+
+
+class StreamingDecodingBenchmark(TestBase):
+    COUNT = 10000
+    CHUNK_SIZE = 64 * 1024
+
+    def test_resources_peak_memory(self):
+        payload = json.dumps(create_resource_dicts(self.COUNT)).encode("utf-8")
+        # like the chunks received from the socket
+        chunks = [payload[i:i + self.CHUNK_SIZE] for i in range(0, len(payload), self.CHUNK_SIZE)]
+        del payload
+
+        def decode_all():
+            content = b"".join(chunks)
+            return filter_resources([Resource.from_dict(item) for item in json.loads(content)], None, False, 10)
+
+        def stream_limited():
+            return filter_resources(map(Resource.from_dict, iter_json_array(chunks)), None, False, 10)
+
+        def stream_all():
+            return list(map(Resource.from_dict, iter_json_array(chunks)))
+
+        decode_all_bytes = measure_peak_bytes(decode_all)
+        stream_limited_bytes = measure_peak_bytes(stream_limited)
+        stream_all_bytes = measure_peak_bytes(stream_all)
+        print(f"Peak memory decoding {self.COUNT} resources "
+              f"({sum(map(len, chunks)) / 1024 / 1024:.1f} MiB): "
+              f"full response {decode_all_bytes / 1024 / 1024:.1f} MiB, "
+              f"streamed (limit 10) {stream_limited_bytes / 1024 / 1024:.2f} MiB, "
+              f"streamed (all kept) {stream_all_bytes / 1024 / 1024:.1f} MiB")
+        # only a single chunk and the listed resources are kept in memory
+        self.assertLess(stream_limited_bytes, decode_all_bytes / 10)
+        # the decoded response is never held as a whole
+        self.assertLess(stream_all_bytes, decode_all_bytes)
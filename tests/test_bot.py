@@ -1,5 +1,9 @@
+import asyncio
+
 from keel_telegram_bot import util
-from tests import TestBase
+from keel_telegram_bot.client.resource import Resource
+from keel_telegram_bot.client.tracked_image import TrackedImage
+from tests import TestBase, load_demo_request, create_approval
 
 
 class BotTest(TestBase):
@@ -86,3 +90,152 @@ class BotTest(TestBase):
         result = util._is_filtered_for(filters, chat_id, identifier)
 
         self.assertFalse(result)
+
+    def test_group_approvals_by_state(self):
+        pending = create_approval("pending")
+        approved = create_approval("approved", votesReceived=1)
+        rejected = create_approval("rejected", rejected=True)
+        archived = create_approval("archived", archived=True)
+        rejected_archived = create_approval("rejected_archived", archived=True, rejected=True)
+        filtered = create_approval("filtered")
+
+        result = util.group_approvals_by_state(
+            [pending, approved, rejected, archived, rejected_archived, filtered],
+            lambda x: x.id != "filtered"
+        )
+
+        self.assertEqual([pending], result.pending)
+        self.assertEqual([approved], result.approved)
+        self.assertEqual([rejected, rejected_archived], result.rejected)
+        self.assertEqual([archived, rejected_archived], result.archived)
+
+    def test_diff_by_key(self):
+        unchanged = create_approval("unchanged")
+        removed = create_approval("removed")
+        voted_old = create_approval("voted")
+        voted_new = create_approval("voted", votesReceived=1)
+        archived_old = create_approval("archived")
+        archived_new = create_approval("archived", archived=True)
+        added = create_approval("added")
+
+        result = util.diff_by_key(
+            [unchanged, removed, voted_old, archived_old],
+            [unchanged, voted_new, archived_new, added],
+            key=lambda x: x.id,
+            fields=["votesReceived", "archived", "rejected"],
+        )
+
+        self.assertEqual([added], result.added)
+        self.assertEqual([removed], result.removed)
+        self.assertEqual(2, len(result.changed))
+        self.assertEqual(voted_new, result.changed[0].new)
+        self.assertEqual({"votesReceived"}, result.changed[0].fields)
+        self.assertEqual(archived_old, result.changed[1].old)
+        self.assertEqual({"archived"}, result.changed[1].fields)
+
+    def test_filter_new_by_key(self):
+        a = [create_approval("a"), create_approval("b")]
+        b = [create_approval("b"), create_approval("c")]
+
+        result = util.filter_new_by_key(a, b, key=lambda x: x.id)
+
+        self.assertEqual(["c"], list(map(lambda x: x.id, result)))
+
+    def test_identifier_without_version(self):
+        self.assertEqual("deployment/default/myapp", util.identifier_without_version("deployment/default/myapp:1.5.5"))
+        self.assertEqual("deployment/default/myapp", util.identifier_without_version("deployment/default/myapp"))
+        self.assertEqual("registry:5000/myapp", util.identifier_without_version("registry:5000/myapp:1.5.5"))
+
+    def test_create_identifier_matcher(self):
+        glob = util.create_identifier_matcher("deployment/default/*")
+        self.assertTrue(glob("deployment/default/myapp:1.5.5"))
+        self.assertFalse(glob("deployment/other/myapp:1.5.5"))
+
+        regex = util.create_identifier_matcher("default/my", regex=True)
+        self.assertTrue(regex("deployment/default/myapp:1.5.5"))
+        self.assertFalse(regex("deployment/default/otherapp:1.5.5"))
+
+        everything = util.create_identifier_matcher(None)
+        self.assertTrue(everything("deployment/other/myapp:1.5.5"))
+
+    def test_run_concurrently(self):
+        running = 0
+        max_running = 0
+
+        async def func(item: int):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            if item % 3 == 0:
+                raise ValueError(item)
+
+        result = asyncio.run(util.run_concurrently(func, range(10), limit=3))
+
+        self.assertEqual(3, max_running)
+        self.assertEqual(list(range(10)), [item for item, _ in result])
+        self.assertEqual([0, 3, 6, 9], [item for item, ex in result if ex is not None])
+
+    def test_approval_with_vote(self):
+        approval = create_approval("a")
+
+        result = approval.with_vote("john")
+
+        self.assertEqual(0, approval.votesReceived)
+        self.assertEqual(1, result.votesReceived)
+        self.assertEqual(("john",), result.voters)
+        self.assertTrue(result.archived)
+        self.assertIs(result, result.with_vote("john"))
+        self.assertEqual(approval.deadline, result.deadline)
+
+    def test_approval_with_rejection(self):
+        approval = create_approval("a")
+
+        result = approval.with_rejection("john")
+
+        self.assertTrue(result.rejected)
+        self.assertFalse(result.archived)
+        self.assertEqual(0, result.votesReceived)
+        self.assertEqual(("john",), result.voters)
+
+    def test_take(self):
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        result = util.take(items(), lambda x: x % 2 == 0, limit=3)
+
+        self.assertEqual([0, 2, 4], result)
+        self.assertEqual(list(range(5)), consumed)
+        self.assertEqual(list(range(5)), util.take(range(5), None, None))
+
+    def test_filter_resources(self):
+        items = [Resource.from_dict(item) for item in load_demo_request("resources.json")]
+
+        tracked = util.filter_resources(items, None, tracked=True, limit=None)
+        self.assertTrue(all(map(lambda x: x.policy.value != "none", tracked)))
+        self.assertLess(len(tracked), len(items))
+
+        result = util.filter_resources(items, "^keel$", tracked=False, limit=None)
+        self.assertTrue(len(result) > 0)
+        self.assertTrue(all(map(lambda x: x.namespace == "keel" or x.name == "keel", result)))
+
+        self.assertEqual(items[:2], util.filter_resources(items, None, tracked=False, limit=2))
+
+    def test_filter_tracked_images(self):
+        items = [TrackedImage.from_dict(item) for item in load_demo_request("tracked-images.json")]
+
+        self.assertEqual(items[:3], util.filter_tracked_images(items, None, limit=3))
+        result = util.filter_tracked_images(items, "keel", limit=None)
+        self.assertTrue(len(result) > 0)
+        self.assertTrue(all(map(lambda x: "keel" in x.image or "keel" in x.namespace, result)))
+
+    def test_image_repository(self):
+        self.assertEqual("metallb/speaker", util.image_repository("quay.io/metallb/speaker:v0.14.5"))
+        self.assertEqual("squat/kilo", util.image_repository("squat/kilo:0.6.0"))
+        self.assertEqual("nginx", util.image_repository("nginx"))
+        self.assertEqual("myapp", util.image_repository("localhost:5000/myapp:1.0@sha256:3b4f4b3"))
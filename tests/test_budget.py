@@ -0,0 +1,60 @@
+import asyncio
+
+from keel_telegram_bot.bot import selection_budget
+from keel_telegram_bot.budget import Budget, BudgetExceededError, budget, current_budget, limit_timeout, \
+    telegram_timeouts, bounded_budget
+from tests import TestBase
+
+
+class BudgetTest(TestBase):
+
+    def test_no_budget(self):
+        self.assertIsNone(current_budget())
+        self.assertEqual((5, 5), limit_timeout((5, 5)))
+        self.assertEqual({}, telegram_timeouts())
+
+    def test_budget_shrinks_timeouts(self):
+        with budget("test", 2):
+            connect_timeout, read_timeout = limit_timeout((1, 5))
+            self.assertEqual(1, connect_timeout)
+            self.assertLessEqual(read_timeout, 2)
+            self.assertLessEqual(telegram_timeouts()["read_timeout"], 2)
+        self.assertIsNone(current_budget())
+
+    def test_budget_exceeded(self):
+        now = [0.0]
+        b = Budget("test", 2, clock=lambda: now[0])
+        self.assertEqual(2, b.check())
+        now[0] = 3
+        with self.assertRaises(BudgetExceededError) as context:
+            b.check()
+        self.assertEqual("test", context.exception.name)
+
+    def test_bounded_budget_cancels(self):
+        async def run():
+            async with bounded_budget("test", 0.05):
+                await asyncio.sleep(10)
+
+        with self.assertRaises(BudgetExceededError) as context:
+            asyncio.run(run())
+        self.assertEqual("test", context.exception.name)
+
+    def test_selection_budget(self):
+        budgets = []
+
+        async def callback():
+            budgets.append(current_budget())
+
+        wrapped = selection_budget("test", 10, callback)
+
+        # a later selection gets a budget of its own
+        asyncio.run(wrapped())
+        self.assertEqual("test", budgets[-1].name)
+
+        # an immediate selection keeps the budget of the command
+        async def run():
+            with budget("command", 10):
+                await wrapped()
+
+        asyncio.run(run())
+        self.assertEqual("command", budgets[-1].name)
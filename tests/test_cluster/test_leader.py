@@ -0,0 +1,108 @@
+import asyncio
+import os
+import tempfile
+from unittest.mock import Mock, AsyncMock
+
+from keel_telegram_bot.bot import KeelTelegramBot
+from keel_telegram_bot.client.api_client import KeelApiClient
+from keel_telegram_bot.client.approval import Approval
+from keel_telegram_bot.cluster.leader import LeaderElector
+from keel_telegram_bot.cluster.lease import SqliteLeaseBackend, LeaseBackend
+from keel_telegram_bot.monitoring.monitor import Monitor
+from tests import TestBase, create_approval_dicts
+
+
+class LeaderElectorTest(TestBase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        # the monotonic clock of both replicas and the wall clock used by the lease database
+        self.now = 1000.0
+        backend = SqliteLeaseBackend(os.path.join(self._directory.name, "lease.sqlite"), clock=lambda: self.now)
+        self.a = LeaderElector(backend, "leader", "a", lease_duration=15, clock=lambda: self.now)
+        self.b = LeaderElector(backend, "leader", "b", lease_duration=15, clock=lambda: self.now)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_single_leader(self):
+        self.assertTrue(self.a.try_acquire())
+        self.assertFalse(self.b.try_acquire())
+        self.assertTrue(self.a.is_leader)
+        self.assertFalse(self.b.is_leader)
+
+    def test_takeover_when_leader_dies(self):
+        self.a.try_acquire()
+        # the leader stops renewing
+        self.now += 10
+        self.assertFalse(self.b.try_acquire())
+        self.now += 5
+        self.assertFalse(self.a.is_leader)
+        self.assertTrue(self.b.try_acquire())
+
+    def test_takeover_after_stop(self):
+        self.a.try_acquire()
+        self.a.stop()
+        self.assertFalse(self.a.is_leader)
+        self.assertTrue(self.b.try_acquire())
+
+    def test_keeps_leading_until_expiry_if_renewal_fails(self):
+        backend = Mock(spec=LeaseBackend)
+        backend.try_acquire.return_value = True
+        elector = LeaderElector(backend, "leader", "a", lease_duration=15, clock=lambda: self.now)
+        listener = Mock()
+        elector.add_listener(listener)
+        self.assertTrue(elector.try_acquire())
+
+        backend.try_acquire.side_effect = OSError("database is locked")
+        self.now += 5
+        self.assertTrue(elector.try_acquire())
+        self.now += 10
+        self.assertFalse(elector.try_acquire())
+
+        self.assertEqual([((True,),), ((False,),)], listener.call_args_list)
+
+
+class MonitorLeadershipTest(TestBase):
+
+    def _create_monitor(self, elector: LeaderElector) -> (Monitor, Mock, Mock):
+        api_client = Mock(spec=KeelApiClient)
+        bot = Mock(spec=KeelTelegramBot)
+        bot.update_messages = AsyncMock()
+        bot.close_messages = AsyncMock()
+        bot.needs_deadline_update.return_value = False
+        bot.on_new_pending_approval = AsyncMock()
+        bot.get_tracked_approval_ids.return_value = set()
+        monitor = Monitor(self.config, api_client, bot, leader_elector=elector)
+        return monitor, api_client, bot
+
+    def test_follower_does_not_notify(self):
+        elector = Mock(spec=LeaderElector)
+        elector.is_leader = False
+        monitor, api_client, bot = self._create_monitor(elector)
+        approvals = [Approval.from_dict(x) for x in create_approval_dicts(4)]
+
+        api_client.get_approvals.return_value = []
+        asyncio.run(monitor._run())
+        api_client.get_approvals.return_value = approvals
+        asyncio.run(monitor._run())
+
+        api_client.get_approvals.assert_not_called()
+        bot.on_new_pending_approval.assert_not_called()
+
+    def test_new_leader_notifies(self):
+        elector = Mock(spec=LeaderElector)
+        elector.is_leader = False
+        monitor, api_client, bot = self._create_monitor(elector)
+        approvals = [Approval.from_dict(x) for x in create_approval_dicts(4)]
+        asyncio.run(monitor._run())
+
+        elector.is_leader = True
+        api_client.get_approvals.return_value = approvals[:1]
+        # the first run as leader establishes the baseline
+        asyncio.run(monitor._run())
+        api_client.get_approvals.return_value = approvals
+        asyncio.run(monitor._run())
+
+        # index 3 is pending too, archived and rejected approvals are not notified
+        bot.on_new_pending_approval.assert_awaited_once_with(approvals[3])
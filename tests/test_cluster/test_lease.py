@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+from keel_telegram_bot.cluster.lease import SqliteLeaseBackend
+from tests import TestBase
+
+
+class SqliteLeaseBackendTest(TestBase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.now = 1000.0
+        self.backend = SqliteLeaseBackend(os.path.join(self._directory.name, "lease.sqlite"), clock=lambda: self.now)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_only_one_holder(self):
+        self.assertTrue(self.backend.try_acquire("leader", "a", duration=10))
+        self.assertFalse(self.backend.try_acquire("leader", "b", duration=10))
+        self.assertEqual("a", self.backend.get_holder("leader"))
+
+    def test_renew(self):
+        self.assertTrue(self.backend.try_acquire("leader", "a", duration=10))
+        self.now += 8
+        self.assertTrue(self.backend.try_acquire("leader", "a", duration=10))
+        self.now += 8
+        self.assertFalse(self.backend.try_acquire("leader", "b", duration=10))
+
+    def test_takeover_after_expiry(self):
+        self.assertTrue(self.backend.try_acquire("leader", "a", duration=10))
+        self.now += 10
+        self.assertIsNone(self.backend.get_holder("leader"))
+        self.assertTrue(self.backend.try_acquire("leader", "b", duration=10))
+        self.assertEqual("b", self.backend.get_holder("leader"))
+
+    def test_release(self):
+        self.assertTrue(self.backend.try_acquire("leader", "a", duration=10))
+        # only the holder can release a lease
+        self.backend.release("leader", "b")
+        self.assertEqual("a", self.backend.get_holder("leader"))
+        self.backend.release("leader", "a")
+        self.assertTrue(self.backend.try_acquire("leader", "b", duration=10))
+
+    def test_shared_between_instances(self):
+        other = SqliteLeaseBackend(self.backend._file_path, clock=lambda: self.now)
+        self.assertTrue(self.backend.try_acquire("leader", "a", duration=10))
+        self.assertFalse(other.try_acquire("leader", "b", duration=10))
+        # leases with different names are independent
+        self.assertTrue(other.try_acquire("other", "b", duration=10))
@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+from keel_telegram_bot.cluster.queue import SqliteQueueBackend
+from tests import TestBase
+
+
+class SqliteQueueBackendTest(TestBase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.now = 1000.0
+        self.backend = SqliteQueueBackend(os.path.join(self._directory.name, "cluster.sqlite"), max_age=60,
+                                          clock=lambda: self.now)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_entries_are_taken_once(self):
+        other = SqliteQueueBackend(self.backend._file_path, max_age=60, clock=lambda: self.now)
+        for i in range(3):
+            self.backend.put("queue", None, {"i": i})
+
+        self.assertEqual([{"i": 0}, {"i": 1}], other.take("queue", 2, lambda key: True))
+        self.assertEqual([{"i": 2}], self.backend.take("queue", 2, lambda key: True))
+        self.assertEqual([], other.take("queue", 2, lambda key: True))
+
+    def test_only_accepted_keys_are_taken(self):
+        self.backend.put("queue", "a", {"i": 0})
+        self.backend.put("queue", "b", {"i": 1})
+        self.backend.put("queue", "a", {"i": 2})
+
+        self.assertEqual([{"i": 0}, {"i": 2}], self.backend.take("queue", 10, lambda key: key == "a"))
+        self.assertEqual([{"i": 1}], self.backend.take("queue", 10, lambda key: True))
+
+    def test_queues_are_independent(self):
+        self.backend.put("a", None, {"i": 0})
+
+        self.assertEqual([], self.backend.take("b", 10, lambda key: True))
+        self.assertEqual([{"i": 0}], self.backend.take("a", 10, lambda key: True))
+
+    def test_old_entries_are_dropped(self):
+        self.backend.put("queue", None, {"i": 0})
+        self.now += 60
+
+        self.assertEqual([], self.backend.take("queue", 10, lambda key: True))
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import tempfile
+from unittest.mock import Mock, patch, AsyncMock
+
+from keel_telegram_bot.bot import KeelTelegramBot
+from keel_telegram_bot.client.api_client import KeelApiClient
+from keel_telegram_bot.client.approval import Approval
+from keel_telegram_bot.cluster.membership import SqliteMembershipBackend, MembershipBackend
+from keel_telegram_bot.cluster.ring import HashRing
+from keel_telegram_bot.cluster.shard import ShardCoordinator
+from keel_telegram_bot.const import TELEGRAM_MESSAGES_PER_SECOND
+from keel_telegram_bot.monitoring.monitor import Monitor
+from tests import TestBase, create_approval_dicts
+
+CHAT_IDS = [str(-100000000000 - i) for i in range(1000)]
+
+
+class HashRingTest(TestBase):
+
+    def test_empty(self):
+        self.assertIsNone(HashRing([], virtual_nodes=64).get_owner("1"))
+
+    def test_chats_are_spread_evenly(self):
+        ring = HashRing(["a", "b", "c"], virtual_nodes=64)
+        counts = {}
+        for chat_id in CHAT_IDS:
+            owner = ring.get_owner(chat_id)
+            counts[owner] = counts.get(owner, 0) + 1
+
+        self.assertEqual({"a", "b", "c"}, set(counts))
+        for count in counts.values():
+            self.assertGreater(count, len(CHAT_IDS) / 3 * 0.6)
+
+    def test_only_chats_of_changed_members_move(self):
+        before = HashRing(["a", "b", "c"], virtual_nodes=64)
+        after = HashRing(["a", "b", "c", "d"], virtual_nodes=64)
+
+        for chat_id in CHAT_IDS:
+            old_owner = before.get_owner(chat_id)
+            new_owner = after.get_owner(chat_id)
+            if old_owner != new_owner:
+                self.assertEqual("d", new_owner)
+
+        # independent of the order members are given in
+        other = HashRing(["d", "c", "b", "a"], virtual_nodes=64)
+        self.assertEqual([after.get_owner(x) for x in CHAT_IDS], [other.get_owner(x) for x in CHAT_IDS])
+
+
+class ShardCoordinatorTest(TestBase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.now = 1000.0
+        self.path = os.path.join(self._directory.name, "membership.sqlite")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _create_coordinator(self, identity: str) -> ShardCoordinator:
+        backend = SqliteMembershipBackend(self.path, clock=lambda: self.now)
+        return ShardCoordinator(backend, identity, heartbeat_timeout=15, clock=lambda: self.now)
+
+    def _owners(self, *coordinators: ShardCoordinator):
+        return [[x.identity for x in coordinators if x.owns_chat(chat_id)] for chat_id in CHAT_IDS]
+
+    def test_owns_all_chats_alone(self):
+        a = self._create_coordinator("a")
+        self.assertTrue(all(a.owns_chat(x) for x in CHAT_IDS))
+        a.refresh()
+        self.assertTrue(all(a.owns_chat(x) for x in CHAT_IDS))
+
+    def test_rebalance_on_join_and_leave(self):
+        a = self._create_coordinator("a")
+        b = self._create_coordinator("b")
+        a.refresh()
+        b.refresh()
+        a.refresh()
+
+        # every chat is served by exactly one replica
+        owners = self._owners(a, b)
+        self.assertTrue(all(len(x) == 1 for x in owners))
+        self.assertIn(["a"], owners)
+        self.assertIn(["b"], owners)
+
+        b.stop()
+        a.refresh()
+        self.assertTrue(all(a.owns_chat(x) for x in CHAT_IDS))
+
+    def test_rebalance_when_member_dies(self):
+        a = self._create_coordinator("a")
+        b = self._create_coordinator("b")
+        b.refresh()
+        a.refresh()
+        self.assertEqual({"a", "b"}, a.members)
+
+        # b stops sending heartbeats
+        self.now += 15
+        a.refresh()
+        self.assertEqual({"a"}, a.members)
+
+    def test_converges_after_one_heartbeat_interval(self):
+        a = self._create_coordinator("a")
+        b = self._create_coordinator("b")
+        listener = Mock()
+        a.add_listener(listener)
+
+        a.refresh()
+        self.assertFalse(a.is_converged)
+        b.refresh()
+        self.now += 5
+        a.refresh()
+
+        self.assertTrue(a.is_converged)
+        listener.assert_called_once_with(frozenset({"a", "b"}))
+
+    def test_keeps_assignment_if_backend_fails(self):
+        backend = Mock(spec=MembershipBackend)
+        backend.get_members.return_value = ["a", "b"]
+        a = ShardCoordinator(backend, "a", heartbeat_timeout=15)
+        a.refresh()
+
+        backend.heartbeat.side_effect = OSError("database is locked")
+        a.refresh()
+        self.assertEqual({"a", "b"}, a.members)
+
+
+class BotShardingTest(TestBase):
+
+    def test_notifies_own_chats_only(self):
+        shard_coordinator = Mock(spec=ShardCoordinator)
+        shard_coordinator.owns_chat.side_effect = lambda chat_id: str(chat_id) == "12345678"
+        bot = KeelTelegramBot(self.config, Mock(spec=KeelApiClient), shard_coordinator)
+        approval = Approval.from_dict(create_approval_dicts(1)[0])
+
+        with patch("keel_telegram_bot.bot.send_message", new_callable=AsyncMock) as send_message:
+            send_message.return_value = Mock(chat_id=12345678, message_id=1)
+            asyncio.run(bot.on_new_pending_approval(approval))
+            asyncio.run(bot._outbox_flusher.flush())
+
+        send_message.assert_awaited_once()
+        self.assertEqual("12345678", str(send_message.await_args.args[1]))
+        self.assertEqual({approval.id}, bot.get_tracked_approval_ids(approval.identifier))
+
+    def test_rate_limit_is_shared(self):
+        shard_coordinator = Mock(spec=ShardCoordinator)
+        bot = KeelTelegramBot(self.config, Mock(spec=KeelApiClient), shard_coordinator)
+        listener = shard_coordinator.add_listener.call_args.args[0]
+
+        listener(frozenset({"a", "b", "c"}))
+
+        self.assertAlmostEqual(TELEGRAM_MESSAGES_PER_SECOND / 3, bot._rate_limiter._rate)
+        self.assertEqual(TELEGRAM_MESSAGES_PER_SECOND // 3, bot._rate_limiter._burst)
+
+
+class MonitorShardingTest(TestBase):
+
+    def test_waits_for_membership_to_converge(self):
+        shard_coordinator = Mock(spec=ShardCoordinator)
+        shard_coordinator.is_converged = False
+        api_client = Mock(spec=KeelApiClient)
+        monitor = Monitor(self.config, api_client, Mock(spec=KeelTelegramBot), shard_coordinator=shard_coordinator)
+
+        asyncio.run(monitor._run())
+        api_client.get_approvals.assert_not_called()
+
+        shard_coordinator.is_converged = True
+        api_client.get_approvals.return_value = []
+        asyncio.run(monitor._run())
+        api_client.get_approvals.assert_called_once()
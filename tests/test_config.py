@@ -0,0 +1,113 @@
+import os
+import re
+
+from container_app_conf.source.env_source import EnvSource
+
+from keel_telegram_bot.config import Config, DerivedConfig
+from tests import TestBase
+
+
+class ConfigTest(TestBase):
+
+    def tearDown(self):
+        os.environ.pop(EnvSource.env_key(Config.TELEGRAM_CHAT_IDS), None)
+        os.environ.pop(EnvSource.env_key(Config.KEEL_PORT), None)
+        self.config.reload()
+
+    def test_config_is_loaded_once(self):
+        derived = self.config.derived
+
+        self.assertIs(self.config, Config())
+        self.assertIs(derived, Config().derived)
+        self.assertEqual(frozenset({"myadminuser", "myotheradminuser"}), derived.admin_usernames)
+        self.assertEqual(frozenset({"12345678", "87654321"}), derived.chat_ids)
+
+    def test_reload(self):
+        os.environ[EnvSource.env_key(Config.TELEGRAM_CHAT_IDS)] = "11111111"
+
+        self.assertTrue(self.config.reload())
+
+        self.assertEqual(["11111111"], self.config.TELEGRAM_CHAT_IDS.value)
+        self.assertEqual(frozenset({"11111111"}), self.config.derived.chat_ids)
+        self.assertEqual(("11111111",), self.config.derived.ordered_chat_ids)
+
+    def test_invalid_reload_keeps_current_config(self):
+        derived = self.config.derived
+        os.environ[EnvSource.env_key(Config.KEEL_PORT)] = "not a port"
+
+        self.assertFalse(self.config.reload())
+
+        self.assertEqual(9300, self.config.KEEL_PORT.value)
+        self.assertIs(derived, self.config.derived)
+
+    def test_derived_filters(self):
+        derived = DerivedConfig(
+            admin_usernames=frozenset(),
+            chat_ids=frozenset({"1", "2"}),
+            ordered_chat_ids=("1", "2"),
+            filters={"1": (re.compile(".*satisfactory.*"),)},
+        )
+
+        self.assertTrue(derived.is_filtered_for(1, "deployment/default/other:1.0.0"))
+        self.assertFalse(derived.is_filtered_for("1", "deployment/default/satisfactory:1.0.0"))
+        self.assertFalse(derived.is_filtered_for(2, "deployment/default/other:1.0.0"))
+
+    def test_replicas_require_webhook(self):
+        os.environ[EnvSource.env_key(Config.CLUSTER_LEASE_FILE)] = "/tmp/lease.sqlite"
+        try:
+            # the test configuration receives updates by polling
+            self.assertFalse(self.config.reload())
+            self.assertIsNone(self.config.CLUSTER_LEASE_FILE.value)
+
+            os.environ[EnvSource.env_key(Config.TELEGRAM_WEBHOOK_URL)] = "https://keel-telegram-bot.example.com"
+            os.environ[EnvSource.env_key(Config.TELEGRAM_WEBHOOK_SECRET_TOKEN)] = "secret"
+            self.assertTrue(self.config.reload())
+        finally:
+            os.environ.pop(EnvSource.env_key(Config.CLUSTER_LEASE_FILE), None)
+            os.environ.pop(EnvSource.env_key(Config.TELEGRAM_WEBHOOK_URL), None)
+            os.environ.pop(EnvSource.env_key(Config.TELEGRAM_WEBHOOK_SECRET_TOKEN), None)
+
+    def test_concurrent_updates_range(self):
+        os.environ[EnvSource.env_key(Config.TELEGRAM_CONCURRENT_UPDATES)] = "0"
+        try:
+            self.assertFalse(self.config.reload())
+            self.assertEqual(8, self.config.TELEGRAM_CONCURRENT_UPDATES.value)
+        finally:
+            os.environ.pop(EnvSource.env_key(Config.TELEGRAM_CONCURRENT_UPDATES), None)
+
+    def test_reload_restores_defaults(self):
+        os.environ[EnvSource.env_key(Config.MONITOR_CHECKPOINT_FILE)] = "/tmp/checkpoint.json"
+        try:
+            self.assertTrue(self.config.reload())
+            self.assertEqual("/tmp/checkpoint.json", self.config.MONITOR_CHECKPOINT_FILE.value)
+        finally:
+            os.environ.pop(EnvSource.env_key(Config.MONITOR_CHECKPOINT_FILE), None)
+
+        self.assertTrue(self.config.reload())
+        self.assertIsNone(self.config.MONITOR_CHECKPOINT_FILE.value)
+
+    def test_sharded_replicas_require_own_checkpoint(self):
+        env = {
+            Config.CLUSTER_MEMBERSHIP_FILE: "/tmp/membership.sqlite",
+            Config.TELEGRAM_WEBHOOK_URL: "https://keel-telegram-bot.example.com",
+            Config.TELEGRAM_WEBHOOK_SECRET_TOKEN: "secret",
+            Config.MONITOR_CHECKPOINT_FILE: "/tmp/checkpoint.json",
+        }
+        for entry, value in env.items():
+            os.environ[EnvSource.env_key(entry)] = value
+        self.addCleanup(self.config.reload)
+        try:
+            # shared by all replicas
+            self.assertFalse(self.config.reload())
+
+            # the default identity is not stable across restarts
+            os.environ[EnvSource.env_key(Config.MONITOR_CHECKPOINT_FILE)] = "/tmp/checkpoint-{identity}.json"
+            self.assertFalse(self.config.reload())
+
+            os.environ[EnvSource.env_key(Config.CLUSTER_IDENTITY)] = "replica-0"
+            self.assertTrue(self.config.reload())
+            self.assertEqual("/tmp/checkpoint-replica-0.json",
+                             self.config.get_replica_file(self.config.MONITOR_CHECKPOINT_FILE))
+        finally:
+            for entry in list(env) + [Config.CLUSTER_IDENTITY]:
+                os.environ.pop(EnvSource.env_key(entry), None)
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import Mock, patch, AsyncMock
+
+from keel_telegram_bot.bot import KeelTelegramBot
+from keel_telegram_bot.client.api_client import KeelApiClient
+from keel_telegram_bot.client.approval import Approval
+from keel_telegram_bot.monitoring.checkpoint import MonitorCheckpoint, CHECKPOINT_VERSION
+from keel_telegram_bot.monitoring.monitor import Monitor, APPROVAL_DIFF_FIELDS
+from tests import TestBase, create_approval_dicts
+
+
+class CheckpointTest(TestBase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._file_path = os.path.join(self._directory.name, "checkpoint.json")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _create_checkpoint(self, write_interval: float = 0) -> MonitorCheckpoint:
+        return MonitorCheckpoint(self._file_path, fields=["votesReceived", "voters"], write_interval=write_interval)
+
+    def test_load_missing(self):
+        self.assertIsNone(self._create_checkpoint().load())
+
+    def test_roundtrip(self):
+        # GIVEN
+        checkpoint = self._create_checkpoint()
+        item = SimpleNamespace(id="1", identifier="a", votesReceived=1, voters=("user1",), message="not persisted")
+
+        # WHEN
+        checkpoint.update([item])
+        checkpoint.flush()
+        records = self._create_checkpoint().load()
+
+        # THEN
+        self.assertEqual([SimpleNamespace(id="1", identifier="a", votesReceived=1, voters=("user1",))], records)
+
+    def test_writes_are_batched(self):
+        # GIVEN
+        checkpoint = self._create_checkpoint(write_interval=3600)
+        checkpoint.update([SimpleNamespace(id="1", identifier="a", votesReceived=0, voters=())])
+        checkpoint.flush(force=True)
+
+        # WHEN
+        checkpoint.update([SimpleNamespace(id="2", identifier="b", votesReceived=0, voters=())])
+        checkpoint.flush()
+
+        # THEN
+        self.assertEqual(["1"], list(map(lambda x: x.id, self._create_checkpoint().load())))
+        checkpoint.flush(force=True)
+        self.assertEqual(["2"], list(map(lambda x: x.id, self._create_checkpoint().load())))
+
+    def test_ignores_unknown_version(self):
+        with open(self._file_path, "w") as f:
+            json.dump({"version": CHECKPOINT_VERSION + 1, "items": []}, f)
+
+        self.assertIsNone(self._create_checkpoint().load())
+
+    def test_approval_removed_while_down(self):
+        # GIVEN
+        approvals = [Approval.from_dict(x) for x in create_approval_dicts(2)]
+        checkpoint = MonitorCheckpoint(self._file_path, fields=APPROVAL_DIFF_FIELDS, write_interval=0)
+        checkpoint.update(approvals)
+        checkpoint.flush()
+
+        api_client = Mock(spec=KeelApiClient)
+        bot = KeelTelegramBot(self.config, api_client)
+        bot._register_message(12345678, 1, approvals[1].id, approvals[1].identifier)
+        monitor = Monitor(self.config, api_client, bot)
+        monitor._checkpoint = checkpoint
+        monitor._old = checkpoint.load()
+
+        # WHEN
+        api_client.get_approvals.return_value = approvals[:1]
+        with patch("keel_telegram_bot.bot.send_message", new_callable=AsyncMock):
+            asyncio.run(monitor._run())
+
+        # THEN
+        self.assertEqual(set(), bot.get_tracked_approval_ids(approvals[1].identifier))
@@ -0,0 +1,40 @@
+from keel_telegram_bot.monitoring.interval import AdaptiveInterval
+from tests import TestBase
+
+
+class AdaptiveIntervalTest(TestBase):
+
+    def setUp(self):
+        self._now = 0.0
+        self._interval = AdaptiveInterval(
+            base=60, minimum=10, maximum=300, activity_window=120, idle_runs=2,
+            clock=lambda: self._now
+        )
+
+    def test_starts_with_base(self):
+        self.assertEqual(60, self._interval.current)
+
+    def test_pending_uses_minimum(self):
+        self.assertEqual(10, self._interval.on_run(changed=False, pending=True))
+        self.assertEqual(60, self._interval.on_run(changed=False, pending=False))
+
+    def test_backs_off_when_idle(self):
+        self.assertEqual(60, self._interval.on_run(changed=False, pending=False))
+        self.assertEqual(120, self._interval.on_run(changed=False, pending=False))
+        self.assertEqual(240, self._interval.on_run(changed=False, pending=False))
+        self.assertEqual(300, self._interval.on_run(changed=False, pending=False))
+        self.assertEqual(300, self._interval.on_run(changed=False, pending=False))
+
+        # a change resets the backoff
+        self.assertEqual(60, self._interval.on_run(changed=True, pending=False))
+
+    def test_activity_uses_minimum_for_a_while(self):
+        self.assertEqual(10, self._interval.on_activity())
+        self._now = 100
+        self.assertEqual(10, self._interval.on_run(changed=False, pending=False))
+        self._now = 200
+        self.assertEqual(60, self._interval.on_run(changed=False, pending=False))
+
+    def test_base_is_clamped(self):
+        interval = AdaptiveInterval(base=5, minimum=10, maximum=300, activity_window=120)
+        self.assertEqual(10, interval.current)
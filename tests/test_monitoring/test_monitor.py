@@ -0,0 +1,113 @@
+import asyncio
+import time
+from datetime import datetime, timezone, timedelta
+from unittest.mock import Mock, patch, AsyncMock
+
+from keel_telegram_bot.bot import KeelTelegramBot
+from keel_telegram_bot.client.api_client import KeelApiClient
+from keel_telegram_bot.client.approval import Approval
+from keel_telegram_bot.monitoring.monitor import Monitor, NOTIFICATION_DEBOUNCE_SECONDS
+from keel_telegram_bot.util import deadline_remaining_bucket
+from tests import TestBase, APPROVAL_TEMPLATE, create_approval
+
+
+def _create_approval(deadline: datetime) -> Approval:
+    return Approval.from_dict({**APPROVAL_TEMPLATE, "deadline": deadline.isoformat()})
+
+
+class MonitorMessageTest(TestBase):
+
+    def setUp(self):
+        self.api_client = Mock(spec=KeelApiClient)
+        self.bot = KeelTelegramBot(self.config, self.api_client)
+        self.monitor = Monitor(self.config, self.api_client, self.bot)
+
+    def _run(self, approvals):
+        self.api_client.get_approvals.return_value = approvals
+        with patch.object(type(self.bot), "bot", new_callable=Mock) as bot:
+            bot.edit_message_text = AsyncMock()
+            asyncio.run(self.monitor._run())
+        return bot.edit_message_text
+
+    def test_deadline_bucket(self):
+        now = datetime.now(tz=timezone.utc)
+        self.assertEqual(0, deadline_remaining_bucket(now - timedelta(seconds=1)))
+        self.assertEqual(1, deadline_remaining_bucket(now + timedelta(seconds=30)))
+        self.assertEqual(5 * 60, deadline_remaining_bucket(now + timedelta(minutes=5, seconds=30)))
+        self.assertEqual(2 * 3600, deadline_remaining_bucket(now + timedelta(hours=2, minutes=5)))
+        self.assertEqual(3 * 86400, deadline_remaining_bucket(now + timedelta(days=3, hours=2)))
+
+    def test_countdown_is_updated(self):
+        approval = _create_approval(datetime.now(tz=timezone.utc) + timedelta(hours=2, minutes=30))
+        self.monitor._old = [approval]
+        self.bot._register_message(12345678, 1, approval.id, approval.identifier)
+        # the message was sent with the remaining time rendered an hour ago
+        self.bot._rendered_deadlines[approval.id] = 3 * 3600
+
+        # the snapshot didn't change
+        edit_message_text = self._run(self.monitor._old)
+
+        edit_message_text.assert_awaited_once()
+        self.assertIn("(2h", edit_message_text.await_args.args[0])
+        self.assertIsNotNone(edit_message_text.await_args.kwargs["reply_markup"])
+        self.assertFalse(self.bot.needs_deadline_update(approval))
+
+    def test_expired_message_is_closed(self):
+        approval = _create_approval(datetime.now(tz=timezone.utc) - timedelta(seconds=1))
+        self.monitor._old = [approval]
+        self.bot._register_message(12345678, 1, approval.id, approval.identifier)
+        self.bot._rendered_deadlines[approval.id] = 60
+
+        edit_message_text = self._run([approval])
+
+        edit_message_text.assert_awaited_once()
+        self.assertIn("(expired)", edit_message_text.await_args.args[0])
+        # without the inline keyboard
+        self.assertNotIn("reply_markup", edit_message_text.await_args.kwargs)
+        self.assertEqual(set(), self.bot.get_tracked_approval_ids(approval.identifier))
+
+    def test_removed_message_is_closed(self):
+        approval = _create_approval(datetime.now(tz=timezone.utc) + timedelta(hours=1))
+        self.monitor._old = [approval]
+        self.bot._register_message(12345678, 1, approval.id, approval.identifier)
+
+        edit_message_text = self._run([])
+
+        edit_message_text.assert_awaited_once()
+        self.assertNotIn("reply_markup", edit_message_text.await_args.kwargs)
+        self.assertEqual(set(), self.bot.get_tracked_approval_ids(approval.identifier))
+
+    def test_notifications_are_debounced(self):
+        self.monitor._timer = Mock()
+        self.monitor._next_run_at = time.monotonic() + 60
+        with patch.object(self.monitor, "_schedule_next_run") as schedule_next_run:
+            # each notification postpones the refresh
+            self.monitor.on_notification("deployment/default/a:v1")
+            self.assertEqual(NOTIFICATION_DEBOUNCE_SECONDS, schedule_next_run.call_args.args[0])
+            self.monitor.on_notification("deployment/default/b:v1")
+            self.assertEqual(NOTIFICATION_DEBOUNCE_SECONDS, schedule_next_run.call_args.args[0])
+
+            # but not indefinitely
+            self.monitor._first_notification_at -= 60
+            self.monitor.on_notification("deployment/default/c:v1")
+            self.assertEqual(0, schedule_next_run.call_args.args[0])
+
+    def test_notification_only_refreshes_affected_approvals(self):
+        deadline = (datetime.now(tz=timezone.utc) + timedelta(hours=1)).isoformat()
+        a = create_approval("a", deadline=deadline)
+        b = create_approval("b", deadline=deadline)
+        self.monitor._old = [a, b]
+        self.monitor._poll_due_at = time.monotonic() + 60
+        self.bot._register_message(12345678, 1, a.id, a.identifier)
+        self.bot._register_message(12345678, 2, b.id, b.identifier)
+        self.monitor._notified_identifiers = {"deployment/default/a:v0.0.20"}
+
+        a_voted = create_approval("a", deadline=deadline, votesReceived=1)
+        b_voted = create_approval("b", deadline=deadline, votesReceived=1)
+        edit_message_text = self._run([a_voted, b_voted])
+
+        edit_message_text.assert_awaited_once()
+        self.assertEqual(1, edit_message_text.await_args.kwargs["message_id"])
+        # the change of "b" is left to the next complete poll
+        self.assertCountEqual([a_voted, b], self.monitor._old)
+        self.assertTrue(self.monitor._refreshed_since_poll)
@@ -0,0 +1,270 @@
+import asyncio
+import os
+import tempfile
+import time
+from unittest.mock import Mock, patch, AsyncMock
+
+from container_app_conf.source.env_source import EnvSource
+from telegram.error import RetryAfter, Forbidden, TimedOut
+
+from keel_telegram_bot.bot import KeelTelegramBot
+from keel_telegram_bot.bot.outbox import Outbox, OutboxFlusher
+from keel_telegram_bot.bot.rate_limiter import RateLimiter
+from keel_telegram_bot.client.api_client import KeelApiClient
+from keel_telegram_bot.client.approval import Approval
+from keel_telegram_bot.config import Config
+from keel_telegram_bot.const import OUTBOX_KIND_NOTIFICATION, OUTBOX_KIND_APPROVAL, \
+    TELEGRAM_MESSAGE_LENGTH_LIMIT, OUTBOX_RETRY_BACKOFF
+from tests import TestBase, create_approval_dicts
+
+
+class OutboxTest(TestBase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._directory.name, "outbox.sqlite")
+        self.now = 1000.0
+        self.outbox = Outbox(self.path, clock=lambda: self.now)
+
+    def tearDown(self):
+        self.outbox.close()
+        self._directory.cleanup()
+
+    def test_entries_survive_restart(self):
+        self.outbox.enqueue("notification", {"chat_id": 1, "text": "a"})
+        self.outbox.enqueue("notification", {"chat_id": 2, "text": "b"})
+        self.outbox.close()
+
+        self.outbox = Outbox(self.path, clock=lambda: self.now)
+        entries = self.outbox.get_due(10)
+
+        self.assertEqual([{"chat_id": 1, "text": "a"}, {"chat_id": 2, "text": "b"}], [x.payload for x in entries])
+        self.assertEqual(2, len(self.outbox))
+
+    def test_shared_file_is_refused(self):
+        with self.assertRaises(ValueError):
+            Outbox(self.path)
+
+        self.outbox.close()
+        self.outbox = Outbox(self.path)
+
+    def test_complete(self):
+        ids = [self.outbox.enqueue("notification", {"text": str(i)}) for i in range(3)]
+        self.outbox.complete(ids[:2])
+
+        self.assertEqual([ids[2]], [x.id for x in self.outbox.get_due(10)])
+
+    def test_reschedule(self):
+        entry_id = self.outbox.enqueue("notification", {})
+        self.outbox.reschedule(entry_id, "timed out", delay=10)
+
+        self.assertEqual([], self.outbox.get_due(10))
+        self.now += 10
+        entry = self.outbox.get_due(10)[0]
+        self.assertEqual(1, entry.attempts)
+        self.assertEqual("timed out", entry.last_error)
+
+    def test_dead_letter(self):
+        entry_id = self.outbox.enqueue("notification", {"text": "a"})
+        self.outbox.dead_letter(entry_id, "chat not found")
+
+        self.assertEqual(0, len(self.outbox))
+        dead_letters = self.outbox.get_dead_letters()
+        self.assertEqual([(entry_id, {"text": "a"}, "chat not found")],
+                         [(x.id, x.payload, x.last_error) for x in dead_letters])
+
+
+class OutboxFlusherTest(TestBase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.outbox = Outbox(":memory:", clock=lambda: self.now)
+        self.deliver = AsyncMock()
+        self.rate_limiter = Mock(spec=RateLimiter)
+        self.rate_limiter.acquire = AsyncMock()
+        self.flusher = OutboxFlusher(
+            self.outbox, self.deliver, self.rate_limiter,
+            batch_size=2, max_attempts=3, retry_backoff=1, retry_backoff_max=10, poll_interval=0.01,
+        )
+
+    def tearDown(self):
+        self.outbox.close()
+
+    def test_flush_in_batches(self):
+        for i in range(3):
+            self.outbox.enqueue("notification", {"text": str(i)})
+
+        self.assertEqual(2, asyncio.run(self.flusher.flush()))
+        self.assertEqual(1, asyncio.run(self.flusher.flush()))
+        self.assertEqual(0, len(self.outbox))
+        self.assertEqual(["0", "1", "2"], [x.args[0].payload["text"] for x in self.deliver.await_args_list])
+
+    def test_retry_with_backoff(self):
+        self.outbox.enqueue("notification", {})
+        self.deliver.side_effect = TimedOut()
+
+        asyncio.run(self.flusher.flush())
+        self.now += 0.5
+        self.assertEqual(0, asyncio.run(self.flusher.flush()))
+        self.now += 0.5
+        asyncio.run(self.flusher.flush())
+        # the backoff doubles
+        self.now += 1
+        self.assertEqual(0, asyncio.run(self.flusher.flush()))
+        self.now += 1
+        asyncio.run(self.flusher.flush())
+
+        self.assertEqual(3, self.deliver.await_count)
+        self.assertEqual(0, len(self.outbox))
+        self.assertEqual(1, len(self.outbox.get_dead_letters()))
+
+    def test_rate_limited_by_telegram(self):
+        self.outbox.enqueue("notification", {})
+        self.outbox.enqueue("notification", {})
+        self.deliver.side_effect = [RetryAfter(5), None, None]
+
+        asyncio.run(self.flusher.flush())
+        self.assertEqual(1, self.deliver.await_count)
+        self.assertEqual(2, len(self.outbox))
+        self.rate_limiter.pause.assert_called_once_with(5)
+        self.now += 5
+        asyncio.run(self.flusher.flush())
+
+        self.assertEqual(0, len(self.outbox))
+        self.assertEqual([], self.outbox.get_dead_letters())
+
+    def test_permanent_error_is_dead_lettered_right_away(self):
+        self.outbox.enqueue("notification", {})
+        self.deliver.side_effect = Forbidden("bot was kicked from the group chat")
+
+        asyncio.run(self.flusher.flush())
+
+        self.assertEqual(0, len(self.outbox))
+        self.assertEqual(1, self.outbox.get_dead_letters()[0].attempts)
+
+    def test_run_is_woken_up(self):
+        async def run():
+            task = asyncio.create_task(self.flusher.run())
+            await asyncio.sleep(0)
+            self.outbox.enqueue("notification", {})
+            self.flusher.notify()
+            for _ in range(100):
+                if self.deliver.await_count > 0:
+                    break
+                await asyncio.sleep(0.01)
+            task.cancel()
+
+        asyncio.run(run())
+
+        self.deliver.assert_awaited_once()
+
+
+class RateLimiterTest(TestBase):
+
+    def test_rate(self):
+        now = 0.0
+        sleeps = []
+
+        async def sleep(seconds: float):
+            nonlocal now
+            sleeps.append(seconds)
+            now += seconds
+
+        async def run():
+            limiter = RateLimiter(rate=10, burst=2, clock=lambda: now, sleep=sleep)
+            for _ in range(4):
+                await limiter.acquire()
+            limiter.pause(5)
+            await limiter.acquire()
+
+        asyncio.run(run())
+
+        self.assertAlmostEqual(0.2, sum(sleeps[:2]))
+        self.assertAlmostEqual(5, sleeps[2])
+
+
+class BotOutboxTest(TestBase):
+
+    def test_approval_message_is_registered_after_delivery(self):
+        bot = KeelTelegramBot(self.config, Mock(spec=KeelApiClient))
+        approval = Approval.from_dict(create_approval_dicts(1)[0])
+
+        with patch("keel_telegram_bot.bot.send_message", new_callable=AsyncMock) as send_message:
+            # one message per configured chat, the first one fails
+            send_message.side_effect = [TimedOut(), Mock(chat_id=87654321, message_id=2)]
+            asyncio.run(bot.on_new_pending_approval(approval))
+            # enqueueing doesn't send anything
+            send_message.assert_not_awaited()
+
+            asyncio.run(bot._outbox_flusher.flush())
+
+        self.assertEqual(2, send_message.await_count)
+        self.assertEqual({approval.id}, bot.get_tracked_approval_ids(approval.identifier))
+        # the failed message is kept for a retry
+        self.assertEqual(1, len(bot._outbox))
+
+    def test_outbox_is_not_persisted_next_to_checkpoint(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        os.environ[EnvSource.env_key(Config.MONITOR_CHECKPOINT_FILE)] = os.path.join(directory.name, "checkpoint.json")
+        self.addCleanup(self.config.reload)
+        self.addCleanup(os.environ.pop, EnvSource.env_key(Config.MONITOR_CHECKPOINT_FILE), None)
+        self.config.reload()
+
+        bot = KeelTelegramBot(self.config, Mock(spec=KeelApiClient))
+        bot._outbox.close()
+
+        # the directory of the checkpoint might be shared by multiple replicas
+        self.assertEqual([], os.listdir(directory.name))
+
+    def test_long_message_parts_are_sent_once(self):
+        bot = KeelTelegramBot(self.config, Mock(spec=KeelApiClient))
+        approval = Approval.from_dict(create_approval_dicts(1)[0])
+        bot._outbox.enqueue(OUTBOX_KIND_APPROVAL, {
+            "chat_id": 12345678,
+            "text": "a" * (TELEGRAM_MESSAGE_LENGTH_LIMIT + 1),
+            "menu": bot.create_approval_notification_menu(approval).to_dict(),
+            "approval_id": approval.id,
+            "approval_identifier": approval.identifier,
+        })
+
+        with patch("keel_telegram_bot.bot.send_message", new_callable=AsyncMock) as send_message:
+            # the second part fails the first time
+            send_message.side_effect = [Mock(chat_id=12345678, message_id=1), TimedOut(),
+                                        Mock(chat_id=12345678, message_id=2)]
+            asyncio.run(bot._outbox_flusher.flush())
+            now = time.time() + OUTBOX_RETRY_BACKOFF
+            bot._outbox._clock = lambda: now
+            asyncio.run(bot._outbox_flusher.flush())
+
+        self.assertEqual([TELEGRAM_MESSAGE_LENGTH_LIMIT, 1, 1], [len(x.args[2]) for x in send_message.await_args_list])
+        # only the last part has the inline keyboard, which is updated later on
+        self.assertEqual([False, True, True], [x.kwargs["menu"] is not None for x in send_message.await_args_list])
+        self.assertEqual({2}, bot._message_map[f"{approval.id}_{approval.identifier}"][12345678])
+        self.assertEqual(0, len(bot._outbox))
+
+    def test_message_registered_during_update(self):
+        bot = KeelTelegramBot(self.config, Mock(spec=KeelApiClient))
+        approval = Approval.from_dict(create_approval_dicts(1)[0])
+        bot._register_message(12345678, 1, approval.id, approval.identifier)
+
+        async def edit_message_text(*args, **kwargs):
+            # the outbox flusher delivers another message in the meantime
+            bot._register_message(87654321, 2, approval.id, approval.identifier)
+            bot._register_message(12345678, 3, approval.id, approval.identifier)
+
+        with patch.object(type(bot), "bot", new_callable=Mock) as telegram_bot:
+            telegram_bot.edit_message_text = AsyncMock(side_effect=edit_message_text)
+            asyncio.run(bot.update_messages([approval]))
+
+        telegram_bot.edit_message_text.assert_awaited_once()
+        self.assertEqual({12345678: {1, 3}, 87654321: {2}}, bot._message_map[f"{approval.id}_{approval.identifier}"])
+
+    def test_notification_is_queued(self):
+        bot = KeelTelegramBot(self.config, Mock(spec=KeelApiClient))
+
+        asyncio.run(bot.on_notification({"identifier": "deployment/default/app:1.0.0", "name": "update"}))
+
+        entries = bot._outbox.get_due(10)
+        self.assertEqual([OUTBOX_KIND_NOTIFICATION] * 2, [x.kind for x in entries])
+        self.assertEqual({12345678, 87654321}, {int(x.payload["chat_id"]) for x in entries})
@@ -0,0 +1,125 @@
+import asyncio
+from unittest.mock import Mock, patch, AsyncMock
+
+from keel_telegram_bot.bot import KeelTelegramBot
+from keel_telegram_bot.const import BUTTON_DATA_APPROVE
+from keel_telegram_bot.bot.refresh import CoalescingRefresher
+from keel_telegram_bot.client.api_client import KeelApiClient
+from keel_telegram_bot.client.approval import Approval
+from tests import TestBase, create_approval_dicts, create_approval
+
+
+class CoalescingRefresherTest(TestBase):
+
+    def test_coalesces_keys(self):
+        calls = []
+
+        async def refresh(keys):
+            calls.append(keys)
+
+        async def run():
+            refresher = CoalescingRefresher(refresh, delay=0.01)
+            refresher.mark_dirty("a")
+            refresher.mark_dirty("b")
+            refresher.mark_dirty("a")
+            await refresher.flush()
+
+        asyncio.run(run())
+
+        self.assertEqual([{"a", "b"}], calls)
+
+    def test_keys_marked_during_refresh_are_refreshed_again(self):
+        calls = []
+
+        async def run():
+            refresher = None
+
+            async def refresh(keys):
+                calls.append(keys)
+                if len(calls) == 1:
+                    refresher.mark_dirty("c")
+
+            refresher = CoalescingRefresher(refresh, delay=0)
+            refresher.mark_dirty("a")
+            await refresher.flush()
+            self.assertEqual(set(), refresher.pending)
+
+        asyncio.run(run())
+
+        self.assertEqual([{"a"}, {"c"}], calls)
+
+    def test_failing_refresh_does_not_stop_later_refreshes(self):
+        calls = []
+
+        async def refresh(keys):
+            calls.append(keys)
+            raise ValueError("refresh failed")
+
+        async def run():
+            refresher = CoalescingRefresher(refresh, delay=0)
+            refresher.mark_dirty("a")
+            await refresher.flush()
+            refresher.mark_dirty("b")
+            await refresher.flush()
+
+        asyncio.run(run())
+
+        self.assertEqual([{"a"}, {"b"}], calls)
+
+
+class BulkActionRefreshTest(TestBase):
+
+    def test_only_affected_messages_are_refreshed(self):
+        api_client = Mock(spec=KeelApiClient)
+        bot = KeelTelegramBot(self.config, api_client)
+        items = [Approval.from_dict(x) for x in create_approval_dicts(4)]
+        update = Mock()
+        update.effective_chat.id = 12345678
+
+        async def run():
+            with patch("keel_telegram_bot.bot.send_message", new_callable=AsyncMock):
+                await bot._run_bulk_approval_action(
+                    update, Mock(), items, pattern="*/app-1:*", regex=False, voter="me",
+                    action="approve", action_past="Approved", func=api_client.approve,
+                )
+            return bot._message_refresher.pending
+
+        pending = asyncio.run(run())
+
+        self.assertEqual({items[1].id}, pending)
+        api_client.approve.assert_called_once_with(items[1].id, items[1].identifier, "me")
+        api_client.get_approvals.assert_not_called()
+
+
+class ClickRefreshTest(TestBase):
+
+    def test_only_clicked_message_is_updated_optimistically(self):
+        api_client = Mock(spec=KeelApiClient)
+        bot = KeelTelegramBot(self.config, api_client)
+        approval = create_approval("a")
+        bot._register_message(12345678, 1, approval.id, approval.identifier)
+        bot._register_message(87654321, 2, approval.id, approval.identifier)
+        bot._approvals[approval.id] = approval
+
+        update = Mock()
+        update.callback_query.data = BUTTON_DATA_APPROVE
+        update.effective_message.text = f"Id: {approval.id}\nIdentifier: {approval.identifier}"
+        update.effective_message.chat_id = 12345678
+        update.effective_message.message_id = 1
+        context = Mock()
+        context.bot.answer_callback_query = AsyncMock()
+
+        async def run():
+            with patch.object(type(bot), "bot", new_callable=Mock) as telegram_bot:
+                telegram_bot.edit_message_text = AsyncMock()
+                await bot._inline_keyboard_click_callback(update, context)
+            return telegram_bot.edit_message_text
+
+        edit_message_text = asyncio.run(run())
+
+        edit_message_text.assert_awaited_once()
+        self.assertEqual(12345678, edit_message_text.await_args.kwargs["chat_id"])
+        self.assertEqual(1, edit_message_text.await_args.kwargs["message_id"])
+        # the messages in all chats are reconciled with keel by the refresh
+        self.assertEqual({approval.id}, bot._message_refresher.pending)
+        self.assertIs(approval, bot._approvals[approval.id])
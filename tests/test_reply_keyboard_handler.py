@@ -0,0 +1,68 @@
+from keel_telegram_bot.bot.reply_keyboard_handler import ExpiringStore, ReplyKeyboardHandler
+from tests import TestBase
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ExpiringStoreTest(TestBase):
+
+    def test_evicts_least_recently_used(self):
+        store = ExpiringStore(max_size=2, ttl=60)
+        store.put("a", 1)
+        store.put("b", 2)
+        store.get("a")
+        store.put("c", 3)
+
+        self.assertEqual(2, len(store))
+        self.assertIn("a", store)
+        self.assertNotIn("b", store)
+        self.assertEqual(3, store.get("c"))
+
+    def test_evicts_idle_entries(self):
+        clock = FakeClock()
+        store = ExpiringStore(max_size=10, ttl=60, clock=clock)
+        store.put("a", 1)
+        store.put("b", 2)
+
+        clock.now = 50
+        store.get("a")
+        clock.now = 100
+
+        self.assertEqual(1, store.get("a"))
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(1, len(store))
+
+    def test_pop(self):
+        store = ExpiringStore(max_size=10, ttl=60)
+        store.put("a", 1)
+
+        self.assertEqual(1, store.pop("a"))
+        self.assertIsNone(store.pop("a"))
+
+
+class ReplyKeyboardHandlerTest(TestBase):
+
+    def test_awaiting_response_is_per_instance(self):
+        a = ReplyKeyboardHandler()
+        b = ReplyKeyboardHandler()
+
+        a.await_response(user_id="1", options=["x"], callback_data={}, callback=None)
+
+        self.assertIn("1", a.awaiting_response)
+        self.assertNotIn("1", b.awaiting_response)
+
+    def test_abandoned_selections_expire(self):
+        clock = FakeClock()
+        handler = ReplyKeyboardHandler(max_pending=10, timeout=60, clock=clock)
+
+        handler.await_response(user_id="1", options=["x"], callback_data={}, callback=None)
+        clock.now = 61
+
+        self.assertEqual(0, len(handler.awaiting_response))
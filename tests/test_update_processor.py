@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime
+
+from telegram import Update, Message, Chat, User
+
+from keel_telegram_bot.bot.update_processor import SerializingUpdateProcessor, get_serialization_key
+from keel_telegram_bot.stats import UPDATE_QUEUE_DEPTH_GAUGE
+from tests import TestBase
+
+
+def _create_update(update_id: int, chat_id: int) -> Update:
+    user = User(id=chat_id, first_name="user", is_bot=False)
+    chat = Chat(id=chat_id, type=Chat.PRIVATE)
+    message = Message(message_id=update_id, date=datetime.now(), chat=chat, from_user=user, text="/resources")
+    return Update(update_id=update_id, message=message)
+
+
+class SerializingUpdateProcessorTest(TestBase):
+
+    def test_serialization_key(self):
+        self.assertEqual("chat:1", get_serialization_key(_create_update(1, chat_id=1)))
+        self.assertIsNone(get_serialization_key(Update(update_id=1)))
+        self.assertIsNone(get_serialization_key("custom update"))
+
+    def test_same_chat_is_processed_in_order(self):
+        events = []
+
+        async def handle(name: str, delay: float):
+            events.append(f"start {name}")
+            await asyncio.sleep(delay)
+            events.append(f"end {name}")
+
+        async def run():
+            processor = SerializingUpdateProcessor(max_concurrent_updates=4, max_pending_updates=16)
+            update_1 = _create_update(1, chat_id=1)
+            update_2 = _create_update(2, chat_id=1)
+            await asyncio.gather(
+                processor.process_update(update_1, handle("1", 0.05)),
+                processor.process_update(update_2, handle("2", 0)),
+            )
+            self.assertEqual(0, processor.queue_depth("chat:1"))
+
+        asyncio.run(run())
+
+        self.assertEqual(["start 1", "end 1", "start 2", "end 2"], events)
+
+    def test_different_chats_are_processed_concurrently(self):
+        events = []
+
+        async def run():
+            processor = SerializingUpdateProcessor(max_concurrent_updates=4, max_pending_updates=16)
+            slow_started = asyncio.Event()
+            fast_done = asyncio.Event()
+
+            async def slow():
+                slow_started.set()
+                # only finishes if the other chat is not blocked by this one
+                await asyncio.wait_for(fast_done.wait(), timeout=1)
+                events.append("slow")
+
+            async def fast():
+                await slow_started.wait()
+                events.append("fast")
+                fast_done.set()
+
+            await asyncio.gather(
+                processor.process_update(_create_update(1, chat_id=1), slow()),
+                processor.process_update(_create_update(2, chat_id=2), fast()),
+            )
+
+        asyncio.run(run())
+
+        self.assertEqual(["fast", "slow"], events)
+
+    def test_busy_chat_does_not_block_other_chats(self):
+        events = []
+
+        async def run():
+            processor = SerializingUpdateProcessor(max_concurrent_updates=2, max_pending_updates=16)
+            release = asyncio.Event()
+
+            async def blocked(name: str):
+                await release.wait()
+                events.append(name)
+
+            async def other():
+                events.append("other")
+                release.set()
+
+            # more updates of the same chat than updates can be processed concurrently
+            tasks = [
+                asyncio.create_task(processor.process_update(_create_update(i, chat_id=1), blocked(str(i))))
+                for i in range(4)
+            ]
+            await asyncio.sleep(0)
+            self.assertEqual(4, processor.queue_depth("chat:1"))
+            self.assertEqual(4, UPDATE_QUEUE_DEPTH_GAUGE.labels(key="chat:1")._value.get())
+
+            await asyncio.wait_for(processor.process_update(_create_update(10, chat_id=2), other()), timeout=1)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+
+        self.assertEqual(["other", "0", "1", "2", "3"], events)
+
+    def test_concurrency_limit(self):
+        running = 0
+        max_running = 0
+
+        async def handle():
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        async def run():
+            processor = SerializingUpdateProcessor(max_concurrent_updates=2, max_pending_updates=16)
+            await asyncio.gather(*[
+                processor.process_update(_create_update(i, chat_id=i), handle())
+                for i in range(6)
+            ])
+
+        asyncio.run(run())
+
+        self.assertEqual(2, max_running)
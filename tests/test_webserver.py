@@ -0,0 +1,120 @@
+import asyncio
+import json
+from unittest.mock import Mock, AsyncMock
+
+from aiohttp.test_utils import TestServer, TestClient
+
+from keel_telegram_bot.bot import KeelTelegramBot
+from keel_telegram_bot.cluster.leader import LeaderElector
+from keel_telegram_bot.cluster.queue import QueueBackend
+from keel_telegram_bot.cluster.shard import ShardCoordinator
+from keel_telegram_bot.const import TELEGRAM_SECRET_TOKEN_HEADER, KEEL_NOTIFICATION_QUEUE, CLUSTER_QUEUE_POLL_INTERVAL, \
+    TELEGRAM_UPDATE_QUEUE
+from keel_telegram_bot.monitoring.monitor import Monitor
+from keel_telegram_bot.webserver import WebsocketServer
+from tests import TestBase
+
+
+class WebserverTest(TestBase):
+
+    def setUp(self):
+        self.bot = Mock(spec=KeelTelegramBot)
+        self.bot.webhook_path = "/telegram"
+        self.bot.is_valid_webhook_secret_token.side_effect = lambda token: token == "secret"
+        self.bot.on_webhook_update = AsyncMock()
+        self.bot.on_notification = AsyncMock()
+        self.server = WebsocketServer(self.config, self.bot, Mock(spec=Monitor))
+
+    def _post(self, path: str, headers: dict, data: str) -> int:
+        async def run():
+            async with TestClient(TestServer(self.server._create_app())) as client:
+                response = await client.post(path, headers=headers, data=data)
+                return response.status
+
+        return asyncio.run(run())
+
+    def _take_handed_over_work(self):
+        async def run():
+            with self.assertRaises(TimeoutError):
+                async with asyncio.timeout(CLUSTER_QUEUE_POLL_INTERVAL * 1.5):
+                    await self.server._take_handed_over_work()
+
+        asyncio.run(run())
+
+    def test_telegram_update(self):
+        status = self._post("/telegram", {TELEGRAM_SECRET_TOKEN_HEADER: "secret"}, '{"update_id": 1}')
+
+        self.assertEqual(200, status)
+        self.bot.on_webhook_update.assert_awaited_once_with({"update_id": 1})
+
+    def test_telegram_update_with_invalid_secret_token(self):
+        self.assertEqual(403, self._post("/telegram", {TELEGRAM_SECRET_TOKEN_HEADER: "wrong"}, '{"update_id": 1}'))
+        self.assertEqual(403, self._post("/telegram", {}, '{"update_id": 1}'))
+        self.bot.on_webhook_update.assert_not_awaited()
+
+    def test_telegram_update_with_invalid_body(self):
+        self.assertEqual(400, self._post("/telegram", {TELEGRAM_SECRET_TOKEN_HEADER: "secret"}, "not json"))
+
+    def test_no_telegram_route_when_polling(self):
+        self.bot.webhook_path = None
+
+        self.assertEqual(404, self._post("/telegram", {TELEGRAM_SECRET_TOKEN_HEADER: "secret"}, "{}"))
+
+    def test_keel_notification_handed_over_to_leader(self):
+        elector = Mock(spec=LeaderElector)
+        monitor = Mock(spec=Monitor)
+        queue = Mock(spec=QueueBackend)
+        self.server = WebsocketServer(self.config, self.bot, monitor, elector, queue)
+        body = '{"identifier": "deployment/default/app:1.0.0"}'
+
+        elector.is_leader = False
+        self.assertEqual(200, self._post("/", {}, body))
+        self.bot.on_notification.assert_not_awaited()
+        queue.put.assert_called_once_with(KEEL_NOTIFICATION_QUEUE, None, {"identifier": "deployment/default/app:1.0.0"})
+
+        elector.is_leader = True
+        self.assertEqual(200, self._post("/", {}, body))
+        self.bot.on_notification.assert_awaited_once()
+        monitor.on_notification.assert_called_once_with("deployment/default/app:1.0.0")
+
+    def test_leader_takes_handed_over_notifications(self):
+        elector = Mock(spec=LeaderElector)
+        elector.is_leader = True
+        monitor = Mock(spec=Monitor)
+        queue = Mock(spec=QueueBackend)
+        self.server = WebsocketServer(self.config, self.bot, monitor, elector, queue)
+
+        queue.take.side_effect = lambda name, limit, accept: \
+            [{"identifier": "deployment/default/app:1.0.0"}] if name == KEEL_NOTIFICATION_QUEUE else []
+        self._take_handed_over_work()
+
+        self.bot.on_notification.assert_awaited_once_with({"identifier": "deployment/default/app:1.0.0"})
+        monitor.on_notification.assert_called_once_with("deployment/default/app:1.0.0")
+
+    def test_telegram_updates_are_handled_by_chat_owner(self):
+        shard_coordinator = Mock(spec=ShardCoordinator)
+        shard_coordinator.owns_chat.side_effect = lambda chat_id: chat_id == "1"
+        queue = Mock(spec=QueueBackend)
+        self.server = WebsocketServer(self.config, self.bot, Mock(spec=Monitor), None, queue, shard_coordinator)
+        update = {"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 2, "type": "private"}}}
+
+        status = self._post("/telegram", {TELEGRAM_SECRET_TOKEN_HEADER: "secret"}, json.dumps(update))
+
+        self.assertEqual(200, status)
+        self.bot.on_webhook_update.assert_not_awaited()
+        queue.put.assert_called_once_with(TELEGRAM_UPDATE_QUEUE, "2", update)
+
+        accepted = []
+
+        def take(name, limit, accept):
+            if name != TELEGRAM_UPDATE_QUEUE:
+                return []
+            accepted.extend(map(accept, ["1", "2", None]))
+            return [update]
+
+        queue.take.side_effect = take
+        self._take_handed_over_work()
+
+        # updates without a chat can be handled by any replica
+        self.assertEqual([True, False, True], accepted)
+        self.bot.on_webhook_update.assert_awaited_once_with(update)